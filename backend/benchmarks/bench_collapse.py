@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Compare collapsing results per domain in the collector with an ordinary
+top-k search and with post-filtering every scored hit in Python, and check
+the collapsed groups and their hits against the latter, and the counts
+when collapse_counts is on.
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean, quantiles
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic_corpus import build_index
+from benchmarks.bench_maxscore import make_queries
+from query_engine.app.ranking import BM25Ranker
+
+
+def post_filter(ranker, plan, groups, per_group):
+    """Score every match, then group by domain: the reference result"""
+    column = ranker.column_cache.column(ranker.searcher, "domain")
+    hits = {}
+    for hit in ranker.searcher.search(plan.query, limit=None):
+        ordinal = column.ordinals[hit.docnum]
+        key = ordinal if ordinal >= 0 else -1 - hit.docnum
+        hits.setdefault(key, []).append((round(hit.score, 9), hit.docnum))
+    ranked = sorted(hits.items(), key=lambda item: (-item[1][0][0], item[1][0][1]))[:groups]
+    return [(key, len(group), group[:per_group]) for key, group in ranked]
+
+
+def replay(queries, search):
+    latencies, outputs = [], []
+    for plan in queries:
+        start = time.perf_counter()
+        outputs.append(search(plan))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, outputs
+
+
+def summarize(name, latencies):
+    cuts = quantiles(latencies, n=100)
+    print(f"{name:<22} mean {mean(latencies):7.2f} ms   p50 {cuts[49]:7.2f} ms   p95 {cuts[94]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark collector-level collapsing per domain')
+    parser.add_argument('--index-path', default=str(Path(tempfile.gettempdir()) / 'nayuta-bench-index'))
+    parser.add_argument('--docs', type=int, default=20000, help='Synthetic corpus size')
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--limit', type=int, default=10, help='Groups per query')
+    args = parser.parse_args()
+
+    ix = build_index(args.index_path, num_docs=args.docs)
+    ranker = BM25Ranker(args.index_path)
+    plans = [ranker.planner.plan(q, ranker.stats) for q in make_queries(ix, args.queries)]
+    print(f"{args.docs} docs, {len(plans)} queries, top {args.limit} groups")
+
+    def collapsed(per_group, counts):
+        def search(plan):
+            results, _ = ranker._search(plan, args.limit, collapse=("domain", per_group, counts))
+            return [(group.key, group.count, [(round(score, 9), docnum) for score, docnum in group.hits])
+                    for group in results.groups]
+        return search
+
+    replay(plans[:10], collapsed(1, False))
+    topk_ms, _ = replay(plans, lambda plan: ranker._search(plan, args.limit))
+    summarize("top-k", topk_ms)
+    mismatches = runs = 0
+    for per_group in (1, 3):
+        post_ms, reference = replay(plans, lambda plan: post_filter(ranker, plan, args.limit, per_group))
+        for counts in (False, True):
+            collapse_ms, groups = replay(plans, collapsed(per_group, counts))
+            for found, expected in zip(groups, reference):
+                if found != [(key, count if counts else None, hits) for key, count, hits in expected]:
+                    mismatches += 1
+            runs += len(plans)
+            summarize(f"collapse {per_group}/group" + (" +counts" if counts else ""), collapse_ms)
+        summarize(f"post-filter {per_group}/group", post_ms)
+    print(f"group mismatches: {mismatches}/{runs}")
+    ranker.close()
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark path queries on a synthetic power-law link graph: bidirectional
+BFS against a one-sided BFS with a dict and a deque (the previous
+implementation), k-shortest paths and 2-hop reachability. Path lengths of
+the two BFS variants are compared for every pair.
+"""
+
+import sys
+import time
+import random
+import argparse
+from collections import deque
+from pathlib import Path
+from statistics import mean, quantiles
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic_graph import generate_edges
+from services.graph_algorithms import csr, shortest_path, k_shortest_paths, bfs_levels
+
+
+def one_sided_bfs(offsets, targets, source, target):
+    """Breadth-first search from source with parent pointers in a dict"""
+    parents = {source: -1}
+    queue = deque([source])
+    while queue:
+        current = queue.popleft()
+        if current == target:
+            path = []
+            while current >= 0:
+                path.append(current)
+                current = parents[current]
+            return path[::-1]
+        for neighbor in targets[offsets[current]:offsets[current + 1]].tolist():
+            if neighbor not in parents:
+                parents[neighbor] = current
+                queue.append(neighbor)
+    return None
+
+
+def measure(fn, pairs):
+    latencies, results = [], []
+    for source, target in pairs:
+        start = time.perf_counter()
+        results.append(fn(source, target))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, results
+
+
+def summarize(name, latencies):
+    cuts = quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"{name:<20} mean {mean(latencies):8.2f} ms   p50 {cuts[49]:8.2f} ms   p95 {cuts[94]:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark shortest-path and reachability queries')
+    parser.add_argument('--nodes', type=int, default=1000000)
+    parser.add_argument('--degree', type=float, default=8.0, help='Mean out-degree')
+    parser.add_argument('--pairs', type=int, default=50)
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+
+    sources, targets = generate_edges(args.nodes, args.degree)
+    out_offsets, out_targets = csr(args.nodes, sources, targets)
+    in_offsets, in_sources = csr(args.nodes, targets, sources)
+    print(f"{args.nodes} nodes, {len(sources)} edges, {args.pairs} random pairs")
+
+    rng = random.Random(9)
+    pairs = [(rng.randrange(args.nodes), rng.randrange(args.nodes)) for _ in range(args.pairs)]
+
+    bidirectional_ms, paths = measure(
+        lambda s, t: shortest_path(out_offsets, out_targets, in_offsets, in_sources, s, t), pairs)
+    one_sided_ms, reference = measure(lambda s, t: one_sided_bfs(out_offsets, out_targets, s, t), pairs)
+    k_ms, _ = measure(
+        lambda s, t: k_shortest_paths(out_offsets, out_targets, in_offsets, in_sources, s, t, args.k),
+        pairs[:10])
+    reach_ms, _ = measure(lambda s, t: bfs_levels(out_offsets, out_targets, s, 2), pairs)
+
+    mismatches = sum(1 for a, b in zip(paths, reference) if (a is None) != (b is None) or (a and len(a) != len(b)))
+    found = [len(path) - 1 for path in paths if path is not None]
+    print(f"paths found for {len(found)}/{len(pairs)} pairs, mean {mean(found) if found else 0:.1f} hops")
+    summarize("bidirectional", bidirectional_ms)
+    summarize("one-sided (dict)", one_sided_ms)
+    summarize(f"k={args.k} shortest", k_ms)
+    summarize("reachable 2 hops", reach_ms)
+    print(f"speedup              {mean(one_sided_ms) / mean(bidirectional_ms):.1f}x")
+    print(f"length mismatches: {mismatches}/{len(pairs)}")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
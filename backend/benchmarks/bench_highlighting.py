@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Measure the cost of formatting a page of results three ways:
+
+- retokenize: Whoosh's default highlighter, which re-analyzes each hit's
+  stored content (how snippets were built before)
+- pinpoint: fragments built from the character offsets stored in the
+  content postings
+- cached: pinpoint with the snippet cache warm, as for a repeated query
+  or paging back
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean, quantiles
+from whoosh.highlight import Highlighter
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic_corpus import build_index, sample_terms
+from query_engine.app.ranking import BM25Ranker
+
+
+def format_page(ranker, plan, limit, highlighter, use_cache):
+    results, _ = ranker._search(plan, limit)
+    results.highlighter = highlighter
+    start = time.perf_counter()
+    terms = ranker.highlight_terms(plan) if use_cache else None
+    ranker._format_results(results[:limit], {}, terms=terms)
+    return (time.perf_counter() - start) * 1000
+
+
+def summarize(name, latencies, baseline):
+    cuts = quantiles(latencies, n=100)
+    print(f"{name:<11} mean {mean(latencies):7.2f} ms   p50 {cuts[49]:7.2f} ms   "
+          f"p95 {cuts[94]:7.2f} ms   {baseline / mean(latencies):5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark snippet highlighting per results page')
+    parser.add_argument('--index-path', default=str(Path(tempfile.gettempdir()) / 'nayuta-bench-index'))
+    parser.add_argument('--docs', type=int, default=20000, help='Synthetic corpus size')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    ix = build_index(args.index_path, num_docs=args.docs)
+    ranker = BM25Ranker(args.index_path)
+    terms = sample_terms(ix, args.queries * 2, seed=9)
+    plans = [ranker.planner.plan(f"{terms[i * 2]} OR {terms[i * 2 + 1]}", ranker.stats)
+             for i in range(args.queries)]
+
+    retokenize = [format_page(ranker, plan, args.limit, Highlighter(), False) for plan in plans]
+    pinpoint = [format_page(ranker, plan, args.limit, ranker.highlighter(), False) for plan in plans]
+    for plan in plans:
+        format_page(ranker, plan, args.limit, ranker.highlighter(), True)
+    cached = [format_page(ranker, plan, args.limit, ranker.highlighter(), True) for plan in plans]
+
+    print(f"{args.docs} docs, {len(plans)} queries, {args.limit} results per page (formatting only)")
+    baseline = mean(retokenize)
+    summarize("retokenize", retokenize, baseline)
+    summarize("pinpoint", pinpoint, baseline)
+    summarize("cached", cached, baseline)
+    ranker.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Compare the Whoosh collector with the NumPy impact index on common
+multi-term keyword queries, and check the impact index ranks exactly like
+BM25F (same documents, same order, same scores).
+"""
+
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean, quantiles
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic_corpus import build_index, sample_terms
+from query_engine.app.ranking import BM25Ranker
+from query_engine.app.impact_index import ImpactIndex
+
+
+def make_queries(ix, count, seed=5):
+    rng = random.Random(seed)
+    terms = sample_terms(ix, count * 4, seed=seed)
+    queries = []
+    for i in range(count):
+        words = terms[i * 4:i * 4 + rng.randint(2, 4)]
+        # Half conjunctive (the parser default), half explicit disjunctions
+        queries.append(" OR ".join(words) if i % 2 else " ".join(words))
+    return queries
+
+
+def replay(ranker, queries, engine, limit):
+    latencies, tops = [], []
+    for q in queries:
+        plan = ranker.planner.plan(q, ranker.stats)
+        start = time.perf_counter()
+        results, _ = ranker._search(plan, limit, engine=engine)
+        latencies.append((time.perf_counter() - start) * 1000)
+        tops.append([(round(score, 9), docnum) for score, docnum in results.top_n])
+    return latencies, tops
+
+
+def summarize(name, latencies):
+    cuts = quantiles(latencies, n=100)
+    print(f"{name:<16} mean {mean(latencies):7.2f} ms   p50 {cuts[49]:7.2f} ms   p95 {cuts[94]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the NumPy impact index against the Whoosh collector')
+    parser.add_argument('--index-path', default=str(Path(tempfile.gettempdir()) / 'nayuta-bench-index'))
+    parser.add_argument('--docs', type=int, default=20000, help='Synthetic corpus size')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    ix = build_index(args.index_path, num_docs=args.docs)
+    ranker = BM25Ranker(args.index_path)
+    queries = make_queries(ix, args.queries)
+
+    # Time a cold build, then the load every other worker does
+    shutil.rmtree(ranker.impact_path, ignore_errors=True)
+    start = time.perf_counter()
+    ImpactIndex.build(ranker.searcher, ranker.impact_path)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    ranker._impact_index()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    replay(ranker, queries[:10], "whoosh", args.limit)
+    whoosh_ms, whoosh_tops = replay(ranker, queries, "whoosh", args.limit)
+    impact_ms, impact_tops = replay(ranker, queries, "impact", args.limit)
+
+    mismatches = sum(1 for a, b in zip(whoosh_tops, impact_tops) if a != b)
+    print(f"{args.docs} docs, {len(queries)} queries, top {args.limit}")
+    print(f"impact index     {ranker.impact.nbytes / 2 ** 20:.1f} MiB, built in {build_s:.1f} s, "
+          f"mapped in {load_ms:.1f} ms")
+    summarize("whoosh", whoosh_ms)
+    summarize("impact", impact_ms)
+    print(f"speedup          {mean(whoosh_ms) / mean(impact_ms):.2f}x")
+    print(f"top-{args.limit} mismatches: {mismatches}/{len(queries)}")
+    ranker.close()
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
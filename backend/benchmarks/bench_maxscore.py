@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Compare the Whoosh collector with the block-max MaxScore engine on common
+multi-term keyword queries, and check both return the same top k. With
+--static-rank-weight, a synthetic PageRank is blended into both.
+
+Both engines are warmed up on one query set and timed on another that
+shares none of its terms, so nothing the timed queries read was loaded
+for them in advance.
+"""
+
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean, quantiles
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic_corpus import build_index, sample_terms
+from query_engine.app.ranking import BM25Ranker
+from query_engine.app.impact_index import ImpactIndex
+from query_engine.app.static_rank import StaticRank, FORMULAS
+
+
+def make_queries(ix, count, seed=5, part=None):
+    rng = random.Random(seed)
+    terms = sample_terms(ix, count * 4, seed=seed, part=part)
+    queries = []
+    for i in range(count):
+        words = terms[i * 4:i * 4 + rng.randint(2, 4)]
+        # Half conjunctive (the parser default), half explicit disjunctions
+        queries.append(" OR ".join(words) if i % 2 else " ".join(words))
+    return queries
+
+
+def replay(ranker, queries, engine, limit):
+    latencies, tops = [], []
+    for q in queries:
+        plan = ranker.planner.plan(q, ranker.stats)
+        start = time.perf_counter()
+        results, _ = ranker._search(plan, limit, engine=engine)
+        latencies.append((time.perf_counter() - start) * 1000)
+        tops.append([(round(score, 9), docnum) for score, docnum in results.top_n])
+    return latencies, tops
+
+
+def summarize(name, latencies):
+    cuts = quantiles(latencies, n=100)
+    print(f"{name:<16} mean {mean(latencies):7.2f} ms   p50 {cuts[49]:7.2f} ms   p95 {cuts[94]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark block-max MaxScore against the Whoosh collector')
+    parser.add_argument('--index-path', default=str(Path(tempfile.gettempdir()) / 'nayuta-bench-index'))
+    parser.add_argument('--docs', type=int, default=20000, help='Synthetic corpus size')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--static-rank-weight', type=float, default=0.0)
+    parser.add_argument('--static-rank-formula', default='log', choices=FORMULAS)
+    args = parser.parse_args()
+
+    ix = build_index(args.index_path, num_docs=args.docs)
+    ranker = BM25Ranker(args.index_path)
+    warmup = make_queries(ix, args.queries, part=(0, 2))
+    queries = make_queries(ix, args.queries, part=(1, 2))
+
+    # Scores and block maxima are computed once per generation, into the impact index
+    shutil.rmtree(ranker.impact_path, ignore_errors=True)
+    start = time.perf_counter()
+    ImpactIndex.build(ranker.searcher, ranker.impact_path)
+    build_s = time.perf_counter() - start
+    ranker._impact_index()
+
+    if args.static_rank_weight:
+        # Heavy-tailed like real PageRank
+        rng = random.Random(1)
+        pagerank = {fields["url"]: rng.paretovariate(1.5) for _, fields in ranker.searcher.reader().iter_docs()}
+        ranker._publish_static_rank(StaticRank.from_pagerank(ranker.searcher, pagerank, args.static_rank_weight,
+                                                             args.static_rank_formula))
+        ranker.refresh()
+
+    replay(ranker, warmup, "whoosh", args.limit)
+    replay(ranker, warmup, "maxscore", args.limit)
+    whoosh_ms, whoosh_tops = replay(ranker, queries, "whoosh", args.limit)
+    maxscore_ms, maxscore_tops = replay(ranker, queries, "maxscore", args.limit)
+    repeat_ms, _ = replay(ranker, queries, "maxscore", args.limit)
+
+    mismatches = sum(1 for a, b in zip(whoosh_tops, maxscore_tops) if a != b)
+    print(f"{args.docs} docs, {len(queries)} queries, top {args.limit}")
+    print(f"impact index     {ranker.impact.nbytes / 2 ** 20:.1f} MiB, built in {build_s:.1f} s")
+    summarize("whoosh", whoosh_ms)
+    summarize("maxscore", maxscore_ms)
+    summarize("maxscore (again)", repeat_ms)
+    print(f"speedup          {mean(whoosh_ms) / mean(maxscore_ms):.2f}x")
+    print(f"top-{args.limit} mismatches: {mismatches}/{len(queries)}")
+    ranker.close()
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Replay operator-heavy queries against the planned and unplanned query paths.
+
+The unplanned path is how queries ran before the planner: every operator,
+phrase and exclusion ANDed into one scored query and re-parsed per request.
+The planned path is BM25Ranker.query, which memoizes plans, orders clauses
+by selectivity and applies constraints as cached filter masks.
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean, quantiles
+from whoosh import sorting
+from whoosh.query import And
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic_corpus import build_index, sample_terms
+from query_engine.app.ranking import BM25Ranker
+
+
+def make_queries(ix, count, seed=11):
+    rng = random.Random(seed)
+    terms = sample_terms(ix, count * 4, seed=seed)
+    with ix.reader() as reader:
+        domains = list(reader.field_terms("domain"))
+    sections = ["docs", "blog", "wiki", "news", "guide", "api"]
+
+    templates = [
+        lambda t: f'{t[0]} {t[1]} site:{rng.choice(domains)} -{t[2]}',
+        lambda t: f'"{t[0]} {t[1]}" {t[2]} filetype:pdf',
+        lambda t: f'{t[0]} {t[1]} inurl:{rng.choice(sections)} daterange:2023-01-01..2024-06-30',
+        lambda t: f'intitle:{t[0]} {t[1]} -{t[2]} -{t[3]}',
+        lambda t: f'{t[0]} {t[1]} {t[2]} site:{rng.choice(domains)} filetype:html',
+    ]
+    return [templates[i % len(templates)](terms[i * 4:i * 4 + 4]) for i in range(count)]
+
+
+def run_unplanned(ranker, query_str, limit):
+    parser = ranker.advanced_parser
+    parsed, query, filters = parser.parse_and_build(query_str)
+    query = And([query] + [q for _, q in filters]) if filters else query
+    results = ranker.searcher.search(query, limit=limit, terms=True, sortedby=sorting.ScoreFacet())
+    return ranker._format_results(results[:limit], {}, False)
+
+
+def run_planned(ranker, query_str, limit):
+    return ranker.query(query_str, limit=limit)[0]
+
+
+def replay(fn, ranker, queries, rounds, limit):
+    latencies = []
+    for _ in range(rounds):
+        for q in queries:
+            start = time.perf_counter()
+            fn(ranker, q, limit)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(name, latencies):
+    cuts = quantiles(latencies, n=100)
+    print(f"{name:<10} mean {mean(latencies):7.2f} ms   p50 {cuts[49]:7.2f} ms   "
+          f"p95 {cuts[94]:7.2f} ms   p99 {cuts[98]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the query planner on operator-heavy queries')
+    parser.add_argument('--index-path', default=str(Path(tempfile.gettempdir()) / 'nayuta-bench-index'))
+    parser.add_argument('--docs', type=int, default=20000, help='Synthetic corpus size')
+    parser.add_argument('--queries', type=int, default=100, help='Distinct queries to replay')
+    parser.add_argument('--rounds', type=int, default=5, help='Times the query set is replayed')
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    ix = build_index(args.index_path, num_docs=args.docs)
+    ranker = BM25Ranker(args.index_path)
+    queries = make_queries(ix, args.queries)
+
+    # Warm the OS page cache so neither side pays for cold reads
+    replay(run_unplanned, ranker, queries[:10], 1, args.limit)
+
+    unplanned = replay(run_unplanned, ranker, queries, args.rounds, args.limit)
+    planned = replay(run_planned, ranker, queries, args.rounds, args.limit)
+
+    print(f"{args.docs} docs, {len(queries)} queries x {args.rounds} rounds")
+    summarize("unplanned", unplanned)
+    summarize("planned", planned)
+    print(f"speedup    {mean(unplanned) / mean(planned):.2f}x mean")
+    ranker.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compare "more like this" from the MinHash/LSH signatures (estimated, and
+re-ranked by exact Jaccard) with Whoosh's more_like, which runs an OR query
+over each page's key terms.
+
+Synthetic pages share no more than common words, so edited copies of the
+source pages (mirrors, syndicated articles) are added as a second segment,
+which also exercises building signatures for new segments only. Recall of
+every method is measured against an exact Jaccard scan over all documents.
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean, quantiles
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic_corpus import build_index
+from query_engine.app.ranking import BM25Ranker
+from services.similarity_index import term_set, jaccard
+
+
+def add_variants(ix, searcher, docnums, variants, rng):
+    """Index copies of each page with 5-40% of their words replaced"""
+    words = searcher.stored_fields(0)["content"].split()
+    writer = ix.writer()
+    for docnum in docnums:
+        page = searcher.stored_fields(docnum)
+        for n in range(variants):
+            edit = 0.05 + 0.35 * n / max(variants - 1, 1)
+            content = [rng.choice(words) if rng.random() < edit else word for word in page["content"].split()]
+            writer.add_document(**dict(page, url=f"{page['url']}?variant={n}", content=" ".join(content)))
+    writer.commit()
+
+
+def replay(urls, fn):
+    latencies, outputs = [], []
+    for url in urls:
+        start = time.perf_counter()
+        outputs.append(fn(url))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, outputs
+
+
+def summarize(name, latencies):
+    cuts = quantiles(latencies, n=100)
+    print(f"{name:<18} mean {mean(latencies):8.2f} ms   p50 {cuts[49]:8.2f} ms   p95 {cuts[94]:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark related-document lookups')
+    parser.add_argument('--index-path', default=str(Path(tempfile.gettempdir()) / 'nayuta-related-index'))
+    parser.add_argument('--docs', type=int, default=20000, help='Synthetic corpus size')
+    parser.add_argument('--pages', type=int, default=50, help='Source pages to look up')
+    parser.add_argument('--variants', type=int, default=5, help='Edited copies of each source page')
+    parser.add_argument('--min-recall', type=float, default=0.8,
+                        help='Fail below this recall of the re-ranked lookups')
+    args = parser.parse_args()
+
+    ix = build_index(args.index_path, num_docs=args.docs)
+    rng = random.Random(3)
+    docnums = rng.sample(range(args.docs), args.pages)
+    ranker = BM25Ranker(args.index_path)
+    start = time.perf_counter()
+    ranker._similarity_index()
+    print(f"{args.docs} docs, signatures built in {time.perf_counter() - start:.2f} s")
+
+    add_variants(ix, ranker.searcher, docnums, args.variants, rng)
+    ranker.refresh()
+    start = time.perf_counter()
+    ranker._similarity_index()
+    searcher = ranker.searcher
+    print(f"{args.pages * args.variants} variants added, signatures updated in {time.perf_counter() - start:.2f} s")
+    urls = [searcher.stored_fields(docnum)["url"] for docnum in docnums]
+    limit = args.variants
+
+    # Exact neighbours: Jaccard against every document's term set
+    sets = [term_set(searcher.schema, searcher.stored_fields(docnum))
+            for docnum in range(searcher.doc_count_all())]
+    truth = []
+    for docnum in docnums:
+        scored = sorted(((jaccard(sets[docnum], other), -i) for i, other in enumerate(sets) if i != docnum),
+                        reverse=True)[:limit]
+        truth.append({-i for _, i in scored})
+
+    def more_like(url):
+        docnum = searcher.document_number(url=url)
+        return [hit.docnum for hit in searcher.more_like(docnum, "content", top=limit)]
+
+    def related(exact):
+        def lookup(url):
+            results, _ = ranker.related(url, limit, exact=exact)
+            return [result["docnum"] for result in results]
+        return lookup
+
+    lsh_ms, approximate = replay(urls, related(False))
+    exact_ms, reranked = replay(urls, related(True))
+    more_like_ms, similar = replay(urls, more_like)
+    summarize("lsh", lsh_ms)
+    summarize("lsh + re-rank", exact_ms)
+    summarize("whoosh more_like", more_like_ms)
+
+    def recall(outputs):
+        return mean(len(expected & set(found)) / len(expected) for expected, found in zip(truth, outputs))
+
+    print(f"recall@{limit}: lsh {recall(approximate):.2f}, lsh + re-rank {recall(reranked):.2f}, "
+          f"more_like {recall(similar):.2f}")
+    ranker.close()
+    ix.close()
+    return 0 if recall(reranked) >= args.min_recall else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Compare the cost of building a 100-result /search page three ways:
+
+- validated: every field, then SearchResponse validation and FastAPI's
+  jsonable_encoder + json.dumps (how /search responded before)
+- direct: every field, serialized straight to JSON
+- projected: fields=url,title,score, serialized straight to JSON
+
+Wall-clock and CPU time cover the ranker call and serialization; the
+serialization step is also timed on its own for the same pages.
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import mean
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.synthetic_corpus import build_index, sample_terms
+from query_engine.app.ranking import BM25Ranker
+from query_engine.app.main import SearchResponse, format_results, dump_json
+
+
+def validated(ranker, q, limit):
+    results, parsed = ranker.query(q, limit=limit)
+    payload = {"results": format_results(results), "query_time": 0.0,
+               "total_hits": len(results), "parsed_query": parsed}
+    return json.dumps(jsonable_encoder(SearchResponse.model_validate(payload))).encode("utf-8")
+
+
+def direct(ranker, q, limit):
+    results, parsed = ranker.query(q, limit=limit)
+    return dump_json({"results": format_results(results), "query_time": 0.0,
+                      "total_hits": len(results), "parsed_query": parsed})
+
+
+def projected(ranker, q, limit):
+    results, parsed = ranker.query(q, limit=limit, fields=["url", "title", "score"])
+    return dump_json({"results": results, "query_time": 0.0,
+                      "total_hits": len(results), "parsed_query": parsed})
+
+
+def measure(fn, ranker, queries, limit):
+    wall, cpu = [], []
+    for q in queries:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        fn(ranker, q, limit)
+        wall.append((time.perf_counter() - wall_start) * 1000)
+        cpu.append((time.process_time() - cpu_start) * 1000)
+    return mean(wall), mean(cpu)
+
+
+def serialize_only(ranker, queries, limit):
+    pages = []
+    for q in queries:
+        results, parsed = ranker.query(q, limit=limit)
+        pages.append({"results": format_results(results), "query_time": 0.0,
+                      "total_hits": len(results), "parsed_query": parsed})
+    timings = {}
+    for name, fn in (("validated", lambda p: json.dumps(jsonable_encoder(SearchResponse.model_validate(p)))),
+                     ("direct", dump_json)):
+        start = time.process_time()
+        for page in pages:
+            fn(page)
+        timings[name] = (time.process_time() - start) * 1000 / len(pages)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /search response building on large pages')
+    parser.add_argument('--index-path', default=str(Path(tempfile.gettempdir()) / 'nayuta-bench-index'))
+    parser.add_argument('--docs', type=int, default=20000, help='Synthetic corpus size')
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    ix = build_index(args.index_path, num_docs=args.docs)
+    ranker = BM25Ranker(args.index_path)
+    # Frequent terms so every query fills the page
+    queries = sample_terms(ix, args.queries, seed=3)
+
+    for fn in (validated, direct, projected):
+        fn(ranker, queries[0], args.limit)
+
+    print(f"{args.docs} docs, {len(queries)} queries, {args.limit} results per page")
+    baseline = None
+    for name, fn in (("validated", validated), ("direct", direct), ("projected", projected)):
+        wall, cpu = measure(fn, ranker, queries, args.limit)
+        baseline = baseline or wall
+        print(f"{name:<10} wall {wall:8.2f} ms   cpu {cpu:8.2f} ms   {baseline / wall:5.2f}x")
+    timings = serialize_only(ranker, queries, args.limit)
+    print(f"serialization only: validated {timings['validated']:.2f} ms cpu, "
+          f"direct {timings['direct']:.2f} ms cpu ({timings['validated'] / timings['direct']:.1f}x)")
+    ranker.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Replay logged queries against a running query engine and report
+throughput and latency percentiles.
+
+Two load models:
+
+- --qps N: open loop. Requests are scheduled at a fixed rate whether or
+  not earlier ones have finished, and latency is measured from the
+  scheduled time, so a stalled server shows up as queueing delay instead
+  of silently lowering the offered load.
+- --concurrency N (without --qps): closed loop, N clients sending
+  back-to-back.
+
+Start the API first (e.g. ./dev.sh or uvicorn query_engine.app.main:app),
+then run e.g.:
+
+    python benchmarks/replay_query_log.py --qps 50 --duration 60
+"""
+
+import sys
+import time
+import argparse
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from pathlib import Path
+from statistics import quantiles
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import config
+from services.query_log import read_entries
+
+
+def search_url(base_url, entry):
+    """The /search request for a log entry, with every param it was logged with"""
+    params = {"q": entry["q"]}
+    for key, value in (entry.get("params") or {}).items():
+        if value is not None:
+            params[key] = str(value).lower() if isinstance(value, bool) else value
+    return f"{base_url.rstrip('/')}/search?{urllib.parse.urlencode(params)}"
+
+
+def send(url, timeout):
+    """Return (ok, status) for one GET"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            return True, response.status
+    except urllib.error.HTTPError as e:
+        return False, e.code
+    except Exception:
+        return False, None
+
+
+def run_open_loop(urls, qps, workers, timeout):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def fire(url, scheduled):
+        ok, status = send(url, timeout)
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            (latencies if ok else errors).append(elapsed if ok else status)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i, url in enumerate(urls):
+            scheduled = start + i / qps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(fire, url, scheduled)
+    return latencies, errors, time.perf_counter() - start
+
+
+def run_closed_loop(urls, concurrency, timeout):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    pending = iter(urls)
+    start = time.perf_counter()
+
+    def client():
+        while True:
+            with lock:
+                url = next(pending, None)
+            if url is None:
+                return
+            sent = time.perf_counter()
+            ok, status = send(url, timeout)
+            elapsed = time.perf_counter() - sent
+            with lock:
+                (latencies if ok else errors).append(elapsed if ok else status)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def report(latencies, errors, wall):
+    total = len(latencies) + len(errors)
+    print(f"{total} requests in {wall:.2f} s: {total / wall:.1f} req/s, "
+          f"{len(latencies) / wall:.1f} ok/s, {len(errors)} errors")
+    if errors:
+        by_status = {}
+        for status in errors:
+            by_status[status] = by_status.get(status, 0) + 1
+        print("  errors by status: " + ", ".join(f"{k}: {v}" for k, v in sorted(by_status.items(), key=str)))
+    if len(latencies) >= 2:
+        cuts = quantiles([latency * 1000 for latency in latencies], n=100, method="inclusive")
+        print(f"  latency p50 {cuts[49]:.2f} ms   p95 {cuts[94]:.2f} ms   p99 {cuts[98]:.2f} ms   "
+              f"max {max(latencies) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay the query log against a running query engine')
+    parser.add_argument('--log', default=str(config.LOGGING["QUERY_LOG"]), help='Query log to replay')
+    parser.add_argument('--base-url', default=f'http://127.0.0.1:{config.QUERY_ENGINE["PORT"]}')
+    parser.add_argument('--qps', type=float, help='Open-loop request rate')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Closed-loop clients, or the worker cap with --qps')
+    parser.add_argument('--duration', type=float, help='Seconds to run, cycling the log if needed')
+    parser.add_argument('--max-queries', type=int, help='Replay at most this many queries')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--no-rotated', action='store_true', help='Ignore rotated log files')
+    args = parser.parse_args()
+
+    entries = [entry for entry in read_entries(args.log, not args.no_rotated) if not entry.get("error")]
+    if not entries:
+        print(f"No queries found in {args.log}")
+        return 1
+    urls = [search_url(args.base_url, entry) for entry in entries]
+
+    if args.duration:
+        if not args.qps:
+            parser.error("--duration needs --qps")
+        count = int(args.duration * args.qps)
+        urls = list(islice(cycle(urls), count))
+    if args.max_queries:
+        urls = urls[:args.max_queries]
+
+    if args.qps:
+        print(f"Replaying {len(urls)} queries from {args.log} at {args.qps:g} qps")
+        latencies, errors, wall = run_open_loop(urls, args.qps, max(args.concurrency, 1), args.timeout)
+    else:
+        print(f"Replaying {len(urls)} queries from {args.log} with {args.concurrency} clients")
+        latencies, errors, wall = run_closed_loop(urls, max(args.concurrency, 1), args.timeout)
+    report(latencies, errors, wall)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Synthetic crawl corpus for benchmarks.
+
+Documents follow a Zipfian vocabulary so term frequencies look like real
+text, and URLs, domains, dates and links are spread over a fixed set of
+sites so operators such as site: and filetype: have realistic selectivity.
+"""
+
+import os
+import sys
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from whoosh.index import create_in, exists_in, open_dir
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from indexer.schema.document_schema import schema, url_fields
+
+SYLLABLES = ["ka", "ri", "to", "na", "yu", "se", "mi", "ro", "da", "ne", "po", "lu",
+             "shi", "ten", "gra", "vel", "cor", "pin", "dex", "mon", "tal", "bri"]
+SECTIONS = ["docs", "blog", "wiki", "news", "guide", "api", "forum", "papers"]
+EXTENSIONS = ["html", "html", "html", "htm", "pdf", "php", ""]
+
+
+def make_vocabulary(size, rng):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_domains(count, rng):
+    bases = [f"{''.join(rng.choice(SYLLABLES) for _ in range(3))}.{rng.choice(['com', 'org', 'net', 'io'])}"
+             for _ in range(count)]
+    return [f"{rng.choice(['www', 'docs', 'blog', 'en'])}.{base}" for base in bases] + bases
+
+
+def generate_documents(num_docs, seed=42, vocabulary_size=20000, num_domains=60):
+    """Yield synthetic documents with the fields the crawler produces"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    domains = make_domains(num_domains, rng)
+    domain_weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(domains))]
+    start = datetime(2023, 1, 1)
+
+    urls = []
+    for i in range(num_docs):
+        domain = rng.choices(domains, domain_weights)[0]
+        slug = "-".join(rng.choices(vocabulary[:2000], k=rng.randint(1, 3)))
+        extension = rng.choice(EXTENSIONS)
+        path = f"/{rng.choice(SECTIONS)}/{slug}-{i}" + (f".{extension}" if extension else "/")
+        urls.append(f"https://{domain}{path}")
+
+    for i, url in enumerate(urls):
+        content_length = rng.randint(80, 600)
+        content = " ".join(rng.choices(vocabulary, weights, k=content_length))
+        title = " ".join(rng.choices(vocabulary[:5000], weights[:5000], k=rng.randint(3, 8))).title()
+        # Links favour a small set of popular pages, like real crawls
+        links = {urls[int(len(urls) * rng.random() ** 3)] for _ in range(rng.randint(0, 12))}
+        yield {
+            "url": url,
+            "title": title,
+            "content": content,
+            "links": ",".join(sorted(links)),
+            "crawled_at": start + timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+        }
+
+
+def build_index(index_path, num_docs=20000, seed=42):
+    """Create (or reuse) a synthetic index at index_path and return it"""
+    if os.path.exists(index_path) and exists_in(index_path):
+        ix = open_dir(index_path)
+        if ix.doc_count_all() == num_docs and ix.schema == schema:
+            return ix
+        ix.close()
+
+    os.makedirs(index_path, exist_ok=True)
+    ix = create_in(index_path, schema)
+    writer = ix.writer(limitmb=256)
+    for doc in generate_documents(num_docs, seed):
+        writer.add_document(**doc, **url_fields(doc["url"]))
+    writer.commit()
+    return ix
+
+
+def sample_terms(ix, count, seed=7, min_df=2, fieldname="content", part=None):
+    """
+    Pick query terms across the frequency range of the built index.
+
+    part=(i, n) only picks every n-th term by frequency, starting at the
+    i-th, so samples with different i share no terms.
+    """
+    rng = random.Random(seed)
+    with ix.reader() as reader:
+        terms = [(text, reader.doc_frequency(fieldname, text))
+                 for text in reader.field_terms(fieldname)]
+    terms = [text for text, df in sorted(terms, key=lambda t: -t[1]) if df >= min_df]
+    if part is not None:
+        terms = terms[part[0]::part[1]]
+    # Mix frequent head terms with mid-frequency ones
+    head = terms[:200]
+    mid = terms[200:5000] or head
+    return [rng.choice(head) if i % 2 else rng.choice(mid) for i in range(count)]
@@ -0,0 +1,37 @@
+"""
+Synthetic link graphs for graph benchmarks.
+
+Out-degrees are geometric and link targets follow a power law, so a few
+pages collect most in-links while many have none, like a real crawl. A
+share of pages has no out-links at all (dangling nodes). Edges are unique
+and free of self-links, matching what LinkGraph stores.
+"""
+
+import numpy as np
+
+
+def generate_edges(num_nodes, avg_degree=8.0, dangling=0.1, skew=2.0, seed=42):
+    """Return (sources, targets) as int64 arrays sorted by source then target"""
+    rng = np.random.default_rng(seed)
+    degrees = rng.geometric(1.0 / avg_degree, size=num_nodes)
+    degrees[rng.random(num_nodes) < dangling] = 0
+    sources = np.repeat(np.arange(num_nodes, dtype=np.int64), degrees)
+    # Popularity is a random permutation of rank, so hubs are spread across ids
+    popularity = rng.permutation(num_nodes)
+    targets = popularity[(num_nodes * rng.random(len(sources)) ** skew).astype(np.int64)]
+    keys = np.unique(sources * num_nodes + targets)
+    sources, targets = keys // num_nodes, keys % num_nodes
+    keep = sources != targets
+    return sources[keep], targets[keep]
+
+
+def perturb_edges(sources, targets, num_nodes, fraction=0.001, seed=7):
+    """Rewire a fraction of edges to random targets, like a small recrawl"""
+    rng = np.random.default_rng(seed)
+    targets = targets.copy()
+    changed = rng.random(len(targets)) < fraction
+    targets[changed] = rng.integers(0, num_nodes, int(changed.sum()))
+    keys = np.unique(sources * num_nodes + targets)
+    sources, targets = keys // num_nodes, keys % num_nodes
+    keep = sources != targets
+    return sources[keep], targets[keep]
@@ -49,7 +49,19 @@ class Config:
         "CORS_ORIGINS": os.getenv("CORS_ORIGINS", "*").split(","),
         "PAGE_SIZE": 10,
         "MAX_SUGGESTIONS": 5,
-        "SNIPPET_LENGTH": 150
+        "SNIPPET_LENGTH": 150,
+        "RETRIEVAL_ENGINE": os.getenv("RETRIEVAL_ENGINE", "whoosh"),  # whoosh | maxscore | impact
+        "STATIC_RANK_WEIGHT": float(os.getenv("STATIC_RANK_WEIGHT", "0.5")),  # 0 disables PageRank blending
+        "STATIC_RANK_FORMULA": os.getenv("STATIC_RANK_FORMULA", "log"),  # log | linear | power
+        "SEARCHER_POOL_SIZE": int(os.getenv("SEARCHER_POOL_SIZE", "4")),
+        "WORKERS": int(os.getenv("QUERY_WORKERS", "1")),  # processes started by query_engine.app.serve
+        "BATCH_MAX_QUERIES": 1000,
+        "WS_DEBOUNCE_MS": int(os.getenv("WS_DEBOUNCE_MS", "120")),
+        "PROFILE_MAX_PER_MINUTE": int(os.getenv("PROFILE_MAX_PER_MINUTE", "6")),  # profile=true requests
+        "PROFILE_TOP_FUNCTIONS": 15,
+        "WARMUP_TOP_QUERIES": int(os.getenv("WARMUP_TOP_QUERIES", "100")),  # from the query log
+        "WARMUP_TOP_TERMS": int(os.getenv("WARMUP_TOP_TERMS", "500")),  # per field, postings read at startup
+        "WARMUP_WAIT_SECONDS": float(os.getenv("WARMUP_WAIT_SECONDS", "300"))  # for graph analytics and static rank
     }
     
     # ================ SEARCH PROVIDERS ================
@@ -78,9 +90,24 @@ class Config:
         "CRAWLER_LOG": DATA_DIR / "logs/crawler.log",
         "INDEXER_LOG": DATA_DIR / "logs/indexer.log",
         "QUERY_LOG": DATA_DIR / "logs/query.log",
+        "QUERY_LOG_SAMPLE_RATE": float(os.getenv("QUERY_LOG_SAMPLE_RATE", "1.0")),  # 0 disables it
+        "SLOW_QUERY_LOG": DATA_DIR / "logs/slow_query.log",
+        "SLOW_QUERY_MS": float(os.getenv("SLOW_QUERY_MS", "250")),
+        "QUERY_LOG_QUEUE_SIZE": 10000,
         "MAX_SIZE_MB": 10,
         "BACKUP_COUNT": 3
     }
+
+    # ================ METRICS ================
+
+    METRICS = {
+        # Processes without an HTTP endpoint (the crawler) write *.prom
+        # files here, which the query engine's /metrics appends; so does
+        # each query engine worker when there are several
+        "TEXTFILE_DIR": Path(os.getenv("METRICS_TEXTFILE_DIR", DATA_DIR / "metrics")),
+        "TEXTFILE_INTERVAL": 10,  # Pages crawled between textfile writes
+        "WORKER_TEXTFILE_SECONDS": 5  # Between a worker's textfile writes
+    }
     
     # ================ SECURITY ================
 
@@ -88,7 +115,9 @@ class Config:
         "API_KEYS": {
             "SCRAPER_API": os.getenv("SCRAPER_API_KEY"),
             "GOOGLE_CSE": os.getenv("GOOGLE_CSE_KEY")
-        }
+        },
+        # Sent as X-Admin-Token to use admin-only features; unset disables them
+        "ADMIN_TOKEN": os.getenv("ADMIN_TOKEN")
     }
     
     @classmethod
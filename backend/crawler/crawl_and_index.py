@@ -11,9 +11,16 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from datetime import datetime
 from whoosh.index import create_in, open_dir
-from whoosh.fields import Schema, ID, TEXT, KEYWORD, DATETIME
 import time
 from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import config
+from indexer.schema.document_schema import schema, url_fields
+from services.metrics import metrics
+from services.link_graph import LinkGraph
+from services.similarity_index import SimilarityIndex
 
 # Configuration
 MAX_PAGES_PER_DOMAIN = 50  # Limit pages per domain
@@ -30,6 +37,22 @@ DEFAULT_SEED_URLS = [
     "https://developer.mozilla.org/en-US/docs/Web/JavaScript",
 ]
 
+# Exposed by the query engine's /metrics (Prometheus textfile convention)
+METRICS_FILE = Path(config.METRICS["TEXTFILE_DIR"]) / "crawler.prom"
+
+FETCH_SECONDS = metrics.histogram("nayuta_crawl_fetch_seconds", "Time to download a page")
+PARSE_SECONDS = metrics.histogram("nayuta_crawl_parse_seconds", "Time to extract content and links from a page")
+INDEX_SECONDS = metrics.histogram("nayuta_index_seconds", "Time spent indexing", ("stage",))
+PAGES = metrics.counter("nayuta_crawl_pages_total", "Pages visited by the crawler", ("result",))
+INDEXED_DOCUMENTS = metrics.counter("nayuta_indexed_documents_total", "Documents written to the index", ("result",))
+
+
+def write_metrics():
+    try:
+        metrics.write_textfile(METRICS_FILE)
+    except OSError as e:
+        print(f"  ✗ Error writing metrics to {METRICS_FILE}: {str(e)}")
+
 class SimpleCrawler:
     def __init__(self, seed_urls=None, max_pages=MAX_TOTAL_PAGES):
         self.seed_urls = seed_urls or DEFAULT_SEED_URLS
@@ -58,6 +81,7 @@ class SimpleCrawler:
         """Extract domain from URL"""
         return urlparse(url).netloc
     
+    @FETCH_SECONDS.timed()
     def fetch_page(self, url):
         """Fetch and parse a web page"""
         try:
@@ -69,6 +93,7 @@ class SimpleCrawler:
             print(f"  ✗ Error fetching {url}: {str(e)}")
             return None, None
     
+    @PARSE_SECONDS.timed()
     def extract_content(self, html, url):
         """Extract text content and links from HTML"""
         try:
@@ -139,13 +164,17 @@ class SimpleCrawler:
             # Fetch page
             html, final_url = self.fetch_page(url)
             if not html:
+                PAGES.inc(result="fetch_error")
                 continue
             
             # Extract content
             page_data = self.extract_content(html, final_url or url)
             if page_data:
+                PAGES.inc(result="ok")
                 self.crawled_data.append(page_data)
                 pages_crawled += 1
+                if pages_crawled % config.METRICS["TEXTFILE_INTERVAL"] == 0:
+                    write_metrics()
                 print(f"  ✓ Crawled: {page_data['title'][:60]}...")
                 
                 # Add new links to queue (but don't overwhelm)
@@ -154,11 +183,14 @@ class SimpleCrawler:
                     for link in new_links:
                         if link not in self.visited and len(self.to_visit) < 500:
                             self.to_visit.append(link)
+            else:
+                PAGES.inc(result="parse_error")
             
             # Be polite - delay between requests
             time.sleep(CRAWL_DELAY)
         
         print(f"\n✓ Crawl complete! Collected {len(self.crawled_data)} pages from {len(self.domain_counts)} domains")
+        write_metrics()
         return self.crawled_data
 
 
@@ -166,15 +198,6 @@ def index_documents(documents, index_path="whoosh_index"):
     """Index crawled documents into Whoosh"""
     print(f"\n📚 Indexing {len(documents)} documents into {index_path}...")
     
-    # Create schema
-    schema = Schema(
-        url=ID(stored=True, unique=True),
-        title=TEXT(stored=True),
-        content=TEXT(stored=True),
-        links=KEYWORD(stored=True, commas=True, scorable=False, lowercase=True),
-        crawled_at=DATETIME(stored=True)
-    )
-    
     # Create or open index
     if not os.path.exists(index_path):
         os.makedirs(index_path)
@@ -190,20 +213,36 @@ def index_documents(documents, index_path="whoosh_index"):
     
     for doc in documents:
         try:
-            writer.add_document(
-                url=doc['url'],
-                title=doc['title'],
-                content=doc['content'],
-                links=doc['links'],
-                crawled_at=doc['crawled_at']
-            )
+            with INDEX_SECONDS.time(stage="add"):
+                writer.add_document(
+                    url=doc['url'],
+                    title=doc['title'],
+                    content=doc['content'],
+                    links=doc['links'],
+                    crawled_at=doc['crawled_at'],
+                    **url_fields(doc['url'])
+                )
+            INDEXED_DOCUMENTS.inc(result="ok")
             indexed += 1
             if indexed % 10 == 0:
                 print(f"  Indexed {indexed}/{len(documents)} documents...")
         except Exception as e:
+            INDEXED_DOCUMENTS.inc(result="error")
             print(f"  ✗ Error indexing {doc['url']}: {str(e)}")
     
-    writer.commit()
+    with INDEX_SECONDS.time(stage="commit"):
+        writer.commit()
+
+    # Bring the saved link graph up to date; only the new segment is read
+    with INDEX_SECONDS.time(stage="link_graph"), ix.searcher() as searcher:
+        graph = LinkGraph.open_or_build(searcher, str(index_path).rstrip("/\\") + ".graph")
+    print(f"  ✓ Link graph: {graph.num_nodes} URLs, {graph.num_edges} links")
+
+    # MinHash signatures for /related, likewise only for the new segment
+    with INDEX_SECONDS.time(stage="similarity"), ix.searcher() as searcher:
+        similarity = SimilarityIndex.open_or_build(searcher, str(index_path).rstrip("/\\") + ".lsh")
+    print(f"  ✓ Similarity signatures: {similarity.doc_count_all} documents")
+    write_metrics()
     print(f"\n✓ Successfully indexed {indexed} documents!")
     return indexed
 
@@ -1,17 +1,8 @@
 import os
 import sys
 from whoosh.index import create_in
-from whoosh.fields import Schema, ID, TEXT, KEYWORD, DATETIME
 from datetime import datetime
-
-# Create schema
-schema = Schema(
-    url=ID(stored=True, unique=True),
-    title=TEXT(stored=True),
-    content=TEXT(stored=True),
-    links=KEYWORD(stored=True, commas=True, scorable=False, lowercase=True),
-    crawled_at=DATETIME(stored=True)
-)
+from schema.document_schema import schema, url_fields
 
 # Create index
 index_dir = "whoosh_index"
@@ -96,7 +87,7 @@ sample_docs = [
 ]
 
 for doc in sample_docs:
-    writer.add_document(**doc)
+    writer.add_document(**doc, **url_fields(doc["url"]))
 
 writer.commit()
 print(f"✓ Created test index with {len(sample_docs)} documents in {index_dir}")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Rebuild an existing Whoosh index with the current document schema.
+Stored fields are read back and re-indexed, so derived fields added to the
+schema are populated without crawling again.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+from whoosh.index import create_in, open_dir
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from indexer.schema.document_schema import schema, url_fields
+
+SOURCE_FIELDS = ("url", "title", "content", "links", "crawled_at")
+
+
+def reindex(index_path):
+    """Rebuild the index at index_path and return the number of documents"""
+    old_ix = open_dir(index_path)
+    with old_ix.reader() as reader:
+        documents = [
+            {k: v for k, v in fields.items() if k in SOURCE_FIELDS and v is not None}
+            for fields in reader.all_stored_fields()
+        ]
+    old_ix.close()
+
+    # Build into a sibling directory and swap, so a failure leaves the old index intact
+    parent = os.path.dirname(os.path.abspath(index_path))
+    tmp_path = tempfile.mkdtemp(prefix=".reindex-", dir=parent)
+    try:
+        ix = create_in(tmp_path, schema)
+        writer = ix.writer()
+        for doc in documents:
+            writer.add_document(**doc, **url_fields(doc.get("url", "")))
+        writer.commit()
+        ix.close()
+
+        shutil.rmtree(index_path)
+        os.rename(tmp_path, index_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    return len(documents)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Rebuild a Nayuta index with the current schema')
+    parser.add_argument('--index-path', default=str(Path(__file__).parent / 'whoosh_index'), help='Path to Whoosh index')
+    args = parser.parse_args()
+
+    count = reindex(args.index_path)
+    print(f"✓ Reindexed {count} documents in {args.index_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,35 @@
+import re
+from urllib.parse import urlparse, unquote
 from whoosh.fields import Schema, ID, TEXT, KEYWORD, DATETIME
 
 schema = Schema(
     url=ID(stored=True, unique=True),
     title=TEXT(stored=True),
-    content=TEXT(stored=True),
+    content=TEXT(stored=True, chars=True),  # character offsets let highlighting skip re-analysis
     links=KEYWORD(stored=True, commas=True, scorable=False, lowercase=True), 
-    crawled_at=DATETIME(stored=True)
-)
\ No newline at end of file
+    crawled_at=DATETIME(stored=True),
+    domain=ID(stored=True),
+    url_path_tokens=KEYWORD(lowercase=True, scorable=False),
+    extension=ID()
+)
+
+
+def url_fields(url):
+    """Derive the indexed domain, URL path token and extension fields from a URL"""
+    parsed = urlparse(url)
+    domain = (parsed.hostname or "").lower()
+    path = unquote(parsed.path).lower()
+
+    fields = {"domain": domain}
+
+    tokens = re.findall(r"[a-z0-9]+", f"{path} {unquote(parsed.query).lower()}")
+    if tokens:
+        fields["url_path_tokens"] = " ".join(tokens)
+
+    last_segment = path.rsplit("/", 1)[-1]
+    if "." in last_segment:
+        extension = last_segment.rsplit(".", 1)[1]
+        if extension.isalnum():
+            fields["extension"] = extension
+
+    return fields
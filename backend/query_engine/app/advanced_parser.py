@@ -1,8 +1,8 @@
 import re
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from whoosh.qparser import QueryParser, MultifieldParser
-from whoosh.query import Term, And, Or, Not, Phrase, DateRange
+from whoosh.query import Term, And, Or, Not, Phrase, DateRange, Wildcard, Regex
 
 
 class AdvancedQueryParser:
@@ -135,41 +135,17 @@ class AdvancedQueryParser:
             except:
                 pass
 
-        # Site filter (match domain in URL)
-        if parsed['site']:
-            # Use wildcard to match full domain
-            query_parts.append(Term('url', f"*{parsed['site']}*"))
-
-        # Filetype filter
-        if parsed['filetype']:
-            query_parts.append(Term('url', f"*.{parsed['filetype']}"))
-
         # Title filter
         if parsed['intitle']:
-            title_parser = QueryParser('title', schema=self.schema)
-            try:
-                title_query = title_parser.parse(parsed['intitle'])
+            title_query = self.build_title_query(parsed['intitle'])
+            if title_query is not None:
                 query_parts.append(title_query)
-            except:
-                pass
-
-        # URL filter
-        if parsed['inurl']:
-            query_parts.append(Term('url', f"*{parsed['inurl']}*"))
-
-        # Date range filter
-        if parsed['daterange'] and 'crawled_at' in self.schema:
-            try:
-                start_date = datetime.strptime(parsed['daterange']['start'], '%Y-%m-%d')
-                end_date = datetime.strptime(parsed['daterange']['end'], '%Y-%m-%d')
-                query_parts.append(DateRange('crawled_at', start_date, end_date))
-            except:
-                pass
 
         # Exact phrases
         for phrase in parsed['exact_phrases']:
-            phrase_query = Phrase('content', phrase.split())
-            query_parts.append(phrase_query)
+            phrase_query = self.build_phrase_query(phrase)
+            if phrase_query is not None:
+                query_parts.append(phrase_query)
 
         # Excluded terms (NOT query)
         for term in parsed['excluded_terms']:
@@ -185,13 +161,97 @@ class AdvancedQueryParser:
 
         return And(query_parts)
 
+    def build_title_query(self, text: str):
+        """Build the query for an intitle: operator, or None if it does not parse"""
+        title_parser = QueryParser('title', schema=self.schema)
+        try:
+            return title_parser.parse(text)
+        except:
+            return None
+
+    def build_phrase_query(self, phrase: str):
+        """
+        Build the query for an exact phrase, or None if nothing is left of it.
+
+        The words go through the content field's analyzer, like the indexed
+        text did, so punctuation, case and stopwords ("an", "the") do not
+        stop the phrase from matching.
+        """
+        words = list(self.schema['content'].process_text(phrase, mode='query'))
+        if not words:
+            return None
+        return Phrase('content', words)
+
+    def build_filters(self, parsed: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        """
+        Build the non-scoring filters (site:, filetype:, inurl:, daterange:).
+
+        These only restrict which documents can match, so they are applied as
+        a filter mask at collection time instead of being scored.
+
+        Returns:
+            List of (cache key, Whoosh query) tuples
+        """
+        filters = []
+
+        # Site filter (the domain or any of its subdomains)
+        if parsed['site']:
+            site = parsed['site']
+            if 'domain' in self.schema:
+                filters.append((f"site:{site}", Or([Term('domain', site), Wildcard('domain', f"*.{site}")])))
+            else:
+                filters.append((f"site:{site}", Wildcard('url', f"*{site}*")))
+
+        # Filetype filter
+        if parsed['filetype']:
+            filetype = parsed['filetype']
+            if 'extension' in self.schema:
+                filters.append((f"filetype:{filetype}", Term('extension', filetype)))
+            else:
+                filters.append((f"filetype:{filetype}", Wildcard('url', f"*.{filetype}")))
+
+        # URL filter (every token of the pattern must appear in the URL's host, path or query)
+        if parsed['inurl']:
+            inurl = parsed['inurl']
+            tokens = re.findall(r'[a-z0-9]+', inurl)
+            if 'url_path_tokens' in self.schema and tokens:
+                token_queries = [self._url_token_query(token) for token in tokens]
+                url_query = And(token_queries) if len(token_queries) > 1 else token_queries[0]
+                filters.append((f"inurl:{inurl}", url_query))
+            else:
+                filters.append((f"inurl:{inurl}", Wildcard('url', f"*{inurl}*")))
+
+        # Date range filter
+        if parsed['daterange'] and 'crawled_at' in self.schema:
+            try:
+                start_date = datetime.strptime(parsed['daterange']['start'], '%Y-%m-%d')
+                end_date = datetime.strptime(parsed['daterange']['end'], '%Y-%m-%d')
+                filters.append((
+                    f"daterange:{parsed['daterange']['start']}..{parsed['daterange']['end']}",
+                    DateRange('crawled_at', start_date, end_date)
+                ))
+            except:
+                pass
+
+        return filters
+
+    def _url_token_query(self, token: str):
+        """Match one inurl: token against the path and query tokens, or a whole token of the host"""
+        path_query = Term('url_path_tokens', token)
+        if 'domain' not in self.schema:
+            return path_query
+        # Hosts are indexed whole, but there are few of them, so scanning the domain lexicon is cheap
+        host_query = Regex('domain', rf'(.*[^a-z0-9])?{token}([^a-z0-9].*)?$')
+        return Or([path_query, host_query])
+
     def parse_and_build(self, query_str: str):
         """
         Convenience method to parse and build query in one step.
 
         Returns:
-            Tuple of (parsed_dict, whoosh_query)
+            Tuple of (parsed_dict, whoosh_query, filters)
         """
         parsed = self.parse(query_str)
         whoosh_query = self.build_whoosh_query(parsed)
-        return parsed, whoosh_query
+        filters = self.build_filters(parsed)
+        return parsed, whoosh_query, filters
@@ -0,0 +1,91 @@
+from typing import Dict, List, Tuple
+
+
+class CollectionStats:
+    """
+    Collection-level statistics for a single index generation.
+
+    Computed once when a searcher is opened and shared by the ranker and the
+    explainer, so per-hit work never has to re-read stored documents or ask
+    the reader for the same document frequency twice.
+    """
+
+    def __init__(self, searcher, fields=("title", "content"), B: float = 0.75, K1: float = 1.2):
+        self.searcher = searcher
+        self.generation = searcher.reader().generation()
+        self.doc_count = searcher.doc_count()
+        self.doc_count_all = searcher.doc_count_all()
+        self.B = B
+        self.K1 = K1
+
+        schema = searcher.schema
+        self.fields = [f for f in fields if f in schema and schema[f].scorable]
+
+        # Exact averages: total indexed tokens divided by document count
+        self.avg_field_lengths = {
+            fieldname: searcher.avg_field_length(fieldname, 0.0) or 0.0
+            for fieldname in self.fields
+        }
+
+        self._field_lengths: Dict[str, List[int]] = {}
+        self._term_stats: Dict[Tuple[str, str], Tuple[int, float]] = {}
+
+    def is_current(self, searcher) -> bool:
+        """Check whether these statistics belong to the given searcher's generation"""
+        return searcher.reader().generation() == self.generation
+
+    def avg_field_length(self, fieldname: str) -> float:
+        """Average number of indexed tokens in a field across the collection"""
+        return self.avg_field_lengths.get(fieldname, 0.0)
+
+    def doc_field_length(self, docnum: int, fieldname: str) -> int:
+        """Indexed length of a field in one document (the value BM25F scores with)"""
+        lengths = self._field_lengths.get(fieldname)
+        if lengths is None:
+            lengths = self._load_field_lengths(fieldname)
+        if 0 <= docnum < len(lengths):
+            return lengths[docnum]
+        return 0
+
+    def length_norm(self, docnum: int, fieldname: str) -> float:
+        """BM25 length normalisation factor: (1 - b) + b * |d| / avgdl"""
+        avgdl = self.avg_field_length(fieldname) or 1.0
+        return (1 - self.B) + self.B * self.doc_field_length(docnum, fieldname) / avgdl
+
+    def term_stats(self, fieldname: str, text: str) -> Tuple[int, float]:
+        """
+        Get (document frequency, idf) for a term, computing it at most once.
+
+        The idf is taken from the searcher's weighting model so it is the same
+        value BM25F uses when scoring.
+        """
+        key = (fieldname, text)
+        cached = self._term_stats.get(key)
+        if cached is not None:
+            return cached
+
+        if fieldname in self.searcher.schema:
+            df = self.searcher.doc_frequency(fieldname, text)
+            idf = self.searcher.idf(fieldname, text) if df > 0 else 0.0
+        else:
+            df, idf = 0, 0.0
+
+        cached = (df, idf)
+        self._term_stats[key] = cached
+        return cached
+
+    def doc_frequency(self, fieldname: str, text: str) -> int:
+        return self.term_stats(fieldname, text)[0]
+
+    def idf(self, fieldname: str, text: str) -> float:
+        return self.term_stats(fieldname, text)[1]
+
+    def _load_field_lengths(self, fieldname: str) -> List[int]:
+        """Read the per-document length column for a field in one pass"""
+        reader = self.searcher.reader()
+        lengths = [
+            reader.doc_field_length(docnum, fieldname, 0)
+            for docnum in range(self.doc_count_all)
+        ]
+        self._field_lengths[fieldname] = lengths
+        return lengths
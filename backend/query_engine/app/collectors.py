@@ -0,0 +1,268 @@
+from array import array
+from collections import defaultdict
+from heapq import heapify, heappop, heappush, heapreplace, nlargest
+from typing import Dict, List, Optional, Tuple
+from whoosh.collectors import ScoredCollector, TermsCollector, WrappingCollector
+
+
+# (fieldname, text, term frequency, score contribution)
+TermScore = Tuple[str, str, float, float]
+
+
+def term_text(text) -> str:
+    return text.decode("utf-8") if isinstance(text, bytes) else text
+
+
+class SearchCancelled(Exception):
+    """Raised inside a search whose caller no longer wants the results"""
+
+
+class CancellableCollector(WrappingCollector):
+    """
+    Aborts collection with SearchCancelled once ``cancel`` (a
+    threading.Event) is set, e.g. when a newer keystroke supersedes the
+    query. Wrap the scoring collector directly so every collected hit,
+    whatever wraps it, passes through the check.
+    """
+
+    def __init__(self, child, cancel):
+        WrappingCollector.__init__(self, child)
+        self.cancel = cancel
+
+    def collect(self, sub_docnum):
+        if self.cancel.is_set():
+            raise SearchCancelled()
+        return self.child.collect(sub_docnum)
+
+
+class TermScoreCollector(TermsCollector):
+    """
+    Records the per-field term frequency and score contribution of every
+    leaf term matcher while documents are being collected.
+
+    These are the exact values BM25F summed into each hit's score, so the
+    explainer can build a breakdown without re-reading stored content.
+    After collection only the entries for documents that made it into the
+    results are kept, as ``results.term_scores``.
+    """
+
+    def prepare(self, top_searcher, q, context):
+        TermsCollector.prepare(self, top_searcher, q, context)
+        self.docscores = defaultdict(list)
+
+    def collect(self, sub_docnum):
+        child = self.child
+        child.collect(sub_docnum)
+
+        global_docnum = child.offset + sub_docnum
+        for tm in self.termmatchers:
+            if tm.is_active() and tm.id() == sub_docnum:
+                term = tm.term()
+                self.termdocs[term].append(global_docnum)
+                self.docterms[global_docnum].append(term)
+                self.docscores[global_docnum].append(
+                    (term[0], term_text(term[1]), tm.weight(), tm.score())
+                )
+
+    def results(self):
+        r = TermsCollector.results(self)
+        kept: Dict[int, List[TermScore]] = {}
+        for _, docnum in r.top_n:
+            if docnum in self.docscores:
+                kept[docnum] = self.docscores[docnum]
+        r.term_scores = kept
+        return r
+
+
+class Group:
+    """
+    One collapsed group: its key (a column ordinal, or -1 - docnum for a
+    document without a value), the number of matching documents with that
+    key (None unless counted), and its best hits as (score, docnum), best
+    first.
+    """
+
+    __slots__ = ("key", "count", "hits")
+
+    def __init__(self, key: int, count: Optional[int], hits: List[Tuple[float, int]]):
+        self.key = key
+        self.count = count
+        self.hits = hits
+
+
+class CollapseCollector(ScoredCollector):
+    """
+    Collects the top ``limit`` groups of hits, grouping by a docnum-aligned
+    ordinal column (facets.Column.ordinals) as documents are scored and
+    keeping each group's best ``per_group`` hits. Groups are ranked by
+    their best hit; a document without a value is a group of its own.
+
+    With one hit per group only the current top groups are held, and the
+    weakest one's best score is the threshold for block skipping, as in
+    TopCollector, so collapsing costs about what a top-k search does. With
+    more hits per group, a group that only reaches the top late may have
+    had hits passed over, so every match is scored; memory is then bounded
+    by per_group hits for each column value and the ``limit`` best
+    documents without a value.
+
+    Exact per-group counts need every match, so ``counts`` turns skipping
+    off; without it groups have no count.
+
+    Matched terms, for highlighting, are looked up in the postings of the
+    query's terms for the returned hits only, rather than recorded for
+    every match as TermsCollector does. When nothing can be skipped that
+    leaves Whoosh free to preload OR queries on small indexes.
+
+    After collection ``results.groups`` lists the Groups best first, and
+    ``results.top_n`` holds their hits in that order.
+    """
+
+    def __init__(self, ordinals, num_values: int, limit: int = 10, per_group: int = 1, counts: bool = False,
+                 **kwargs):
+        ScoredCollector.__init__(self, **kwargs)
+        self.ordinals = ordinals
+        self.num_values = num_values
+        self.limit = limit
+        self.per_group = per_group
+        self.counting = counts
+        # Whether only the top groups are held, so documents can be passed over
+        self.topgroups = per_group == 1 and not counts
+
+    def prepare(self, top_searcher, q, context):
+        # Block skipping needs the union matcher tree rather than preloaded matches
+        ScoredCollector.prepare(self, top_searcher, q, context.set(needs_current=self.topgroups))
+        self.total = 0
+        self.counts = array("i", [0]) * self.num_values if self.counting else None
+        # Key -> min-heap of its best (score, 0 - docnum) hits; the key is
+        # the ordinal, or -1 - docnum for a document without a value
+        self.kept: Dict[int, list] = {}
+        # Min-heap of the best hits without a value, when every group is held
+        self.singles: list = []
+        # With top groups only: a min-heap of (best hit, key) to find the
+        # weakest group, and the lowest score that can still start a group
+        self.ranking: list = []
+        self.floor = float("-inf")
+        # Whether the floor may prune the matcher (scores must be final)
+        self.prune = self.topgroups and not top_searcher.weighting.use_final
+
+    def _use_block_quality(self):
+        return self.prune and self.matcher.supports_block_quality()
+
+    def computes_count(self):
+        return not self._use_block_quality()
+
+    def count(self):
+        return self.total
+
+    def _collect(self, global_docnum, score):
+        self.total += 1
+        # Compared like TopCollector's heap: higher scores, then lower docnums, win
+        item = (score, 0 - global_docnum)
+        ordinal = self.ordinals[global_docnum]
+        if self.topgroups:
+            self._keep_group(ordinal if ordinal >= 0 else -1 - global_docnum, item)
+        elif ordinal >= 0:
+            if self.counts is not None:
+                self.counts[ordinal] += 1
+            hits = self.kept.get(ordinal)
+            if hits is None:
+                self.kept[ordinal] = [item]
+            elif len(hits) < self.per_group:
+                heappush(hits, item)
+            elif item > hits[0]:
+                heapreplace(hits, item)
+        else:
+            singles = self.singles
+            if len(singles) < self.limit:
+                heappush(singles, item)
+            elif item > singles[0]:
+                heapreplace(singles, item)
+        return 0 - score
+
+    def _keep_group(self, key, item):
+        """Make item its group's hit if it beats the group's, keeping only the top groups"""
+        kept, ranking = self.kept, self.ranking
+        hits = kept.get(key)
+        if hits is not None:
+            if item <= hits[0]:
+                return
+            hits[0] = item
+        else:
+            if item[0] < self.floor:
+                return
+            if len(kept) >= self.limit:
+                weakest, weakest_key = self._weakest()
+                if item <= weakest:
+                    return
+                heappop(ranking)
+                del kept[weakest_key]
+            kept[key] = [item]
+        heappush(ranking, (item, key))
+        if len(ranking) > 4 * self.limit + 16:
+            # Drop superseded entries
+            ranking[:] = [(hits[0], group) for group, hits in kept.items()]
+            heapify(ranking)
+        if len(kept) >= self.limit:
+            self.floor = self._weakest()[0][0]
+            if self.prune:
+                self.minscore = self.floor
+
+    def _weakest(self):
+        """The weakest held group's (best hit, key), dropping superseded entries"""
+        ranking, kept = self.ranking, self.kept
+        while True:
+            item, key = ranking[0]
+            hits = kept.get(key)
+            if hits is not None and hits[0] == item:
+                return ranking[0]
+            heappop(ranking)
+
+    def results(self):
+        # Each group's best hit by key (-1 - docnum is -1 + its negated docnum)
+        best = {key: max(hits) for key, hits in self.kept.items()}
+        best.update((-1 + item[1], item) for item in self.singles)
+        groups = []
+        for key in nlargest(self.limit, best, key=best.__getitem__):
+            hits = sorted(self.kept[key], reverse=True) if key in self.kept else [best[key]]
+            if self.counts is None:
+                count = None
+            else:
+                count = self.counts[key] if key >= 0 else 1
+            groups.append(Group(key, count, [(score, 0 - negated) for score, negated in hits]))
+        r = self._results([hit for group in groups for hit in group.hits])
+        r.groups = groups
+        r.docterms = self._matched_terms([docnum for _, docnum in r.top_n])
+        r.termdocs = defaultdict(list)
+        for docnum, terms in r.docterms.items():
+            for term in terms:
+                r.termdocs[term].append(docnum)
+        r.termdocs = dict(r.termdocs)
+        return r
+
+    def _matched_terms(self, docnums):
+        """Docnum -> the query's (fieldname, text) terms it contains, from their postings"""
+        reader = self.top_searcher.reader()
+        schema = reader.schema
+        # Query.existing_terms() reuses its fieldname argument as a loop
+        # variable, dropping other fields' terms after the first leaf
+        terms = set()
+        for leaf in self.q.leaves():
+            for fieldname, text in leaf.expanded_terms(reader, phrases=True):
+                if fieldname in schema:
+                    term = (fieldname, schema[fieldname].to_bytes(text))
+                    if term in reader:
+                        terms.add(term)
+        docterms = {docnum: [] for docnum in docnums}
+        ordered = sorted(docterms)
+        for term in sorted(terms):
+            postings = reader.postings(*term)
+            for docnum in ordered:
+                if not postings.is_active():
+                    break
+                if postings.id() < docnum:
+                    postings.skip_to(docnum)
+                    if not postings.is_active():
+                        break
+                if postings.id() == docnum:
+                    docterms[docnum].append(term)
+        return docterms
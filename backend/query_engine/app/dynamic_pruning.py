@@ -0,0 +1,298 @@
+from bisect import bisect_left
+from heapq import heappush, heapreplace
+from typing import List, Optional, Tuple
+
+import numpy as np
+from whoosh.query import And, Or, Term
+from whoosh.searching import Results
+
+BLOCK_SIZE = 64
+
+
+def keyword_groups(query, fieldnames) -> Optional[Tuple[str, List[Tuple[Tuple[str, str], ...]]]]:
+    """
+    Reduce a plain keyword query to (mode, groups), where mode is "or" or
+    "and" and each group is a tuple of (fieldname, text) leaves whose scores
+    are summed. Returns None for anything else (phrases, prefixes, boosts).
+
+    Args:
+        query: Whoosh query
+        fieldnames: Fields the caller can score (any container)
+    """
+    query = query.normalize()
+    if isinstance(query, Term):
+        leaf = _leaf(query, fieldnames)
+        return ("or", [(leaf,)]) if leaf else None
+    if isinstance(query, Or):
+        leaves = [_leaf(q, fieldnames) for q in query.subqueries] if _plain_or(query) else [None]
+        return ("or", [(leaf,) for leaf in leaves]) if all(leaves) else None
+    if isinstance(query, And) and query.boost == 1.0:
+        groups = []
+        for sub in query.subqueries:
+            if isinstance(sub, Term):
+                leaves = [_leaf(sub, fieldnames)]
+            elif isinstance(sub, Or) and _plain_or(sub):
+                leaves = [_leaf(q, fieldnames) for q in sub.subqueries]
+            else:
+                return None
+            if not all(leaves):
+                return None
+            groups.append(tuple(leaves))
+        return ("and", groups)
+    return None
+
+
+def _plain_or(query) -> bool:
+    return query.boost == 1.0 and not query.minmatch and not query.scale
+
+
+def _leaf(query, fieldnames) -> Optional[Tuple[str, str]]:
+    if not isinstance(query, Term) or query.boost != 1.0:
+        return None
+    if query.fieldname not in fieldnames:
+        return None
+    return (query.fieldname, query.text)
+
+
+class ImpactPostings:
+    """
+    A term's (or term group's) postings with the exact BM25F score of each
+    posting precomputed, plus the last docnum and maximum score of every
+    block of BLOCK_SIZE postings so whole blocks can be skipped during
+    top-k search.
+
+    The arrays are kept as memoryviews, which index to plain ints and
+    floats as fast as array does, of the impact index's mapped files.
+    """
+
+    __slots__ = ("ids", "scores", "block_last", "block_max", "max_score")
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray, block_last: np.ndarray, block_max: np.ndarray):
+        self.ids = memoryview(ids)
+        self.scores = memoryview(scores)
+        self.block_last = memoryview(block_last)
+        self.block_max = memoryview(block_max)
+        self.max_score = float(block_max.max()) if len(block_max) else 0.0
+
+    @classmethod
+    def merge(cls, parts: List[Tuple[np.ndarray, np.ndarray]]) -> "ImpactPostings":
+        """Sum (docids, impacts) postings per document, in the order given, and split them into blocks"""
+        ids = np.concatenate([docids for docids, _ in parts])
+        scores = np.concatenate([impacts for _, impacts in parts])
+        order = np.argsort(ids, kind="stable")
+        ids, starts = np.unique(ids[order], return_index=True)
+        scores = np.add.reduceat(scores[order], starts) if len(ids) else scores
+        starts = np.arange(0, len(ids), BLOCK_SIZE)
+        block_last = ids[np.append(starts[1:], len(ids)) - 1] if len(ids) else ids
+        block_max = np.maximum.reduceat(scores, starts) if len(ids) else scores
+        return cls(ids, scores, block_last, block_max)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class MaxScoreEngine:
+    """
+    Top-k retrieval for plain keyword queries using block-max MaxScore,
+    over an ImpactIndex's postings and block maxima.
+
+    Disjunctions (``a OR b``) run MaxScore: terms whose combined maximum
+    cannot beat the current k-th score stop generating candidates and are
+    only probed for documents that can still make the top k. Conjunctions
+    (the default ``a b``) walk the rarest group and skip candidates whose
+    block maxima rule them out. Scores are the ones Whoosh's BM25F matcher
+    produces, so results match the Whoosh collector's top k. Scores and
+    block maxima are computed when the impact index is built; only groups
+    the index does not store merged are summed at query time.
+
+    With a StaticRank, each candidate's static value is known before its
+    postings are probed, so the threshold it has to beat is moved into text
+    score terms per candidate; whole lists become non-essential against the
+    largest static value.
+    """
+
+    def __init__(self, impact):
+        self.impact = impact
+
+    def supports(self, query) -> bool:
+        """True for Terms, and And/Or trees of them without boosts or scaling"""
+        return self._groups(query) is not None
+
+    def search(self, query, limit: int, static_rank=None, searcher=None) -> Results:
+        mode, groups = self._groups(query)
+        if mode == "or":
+            lists = [self._postings(leaves) for leaves in groups]
+            top = self._top_k_or([p for p in lists if len(p)], limit, static_rank)
+        else:
+            lists = [self._postings(leaves) for leaves in groups]
+            top = [] if any(len(p) == 0 for p in lists) else self._top_k_and(lists, limit, static_rank)
+        return Results(searcher or self.impact.searcher, query, top)
+
+    def _groups(self, query):
+        return keyword_groups(query, self.impact.fields)
+
+    def _postings(self, leaves: Tuple[Tuple[str, str], ...]) -> ImpactPostings:
+        stored = self.impact.block_postings(leaves)
+        if stored is not None:
+            return ImpactPostings(*stored)
+        return ImpactPostings.merge([self.impact.fields[fieldname].postings(text) for fieldname, text in leaves])
+
+    def _top_k_or(self, lists: List[ImpactPostings], k: int, static_rank=None) -> List[Tuple[float, int]]:
+        # Ascending by max score; upper[i] bounds the sum of lists[0..i]
+        lists.sort(key=lambda p: p.max_score)
+        n = len(lists)
+        upper = []
+        total = 0.0
+        for p in lists:
+            total += p.max_score
+            upper.append(total)
+
+        values, additive, max_value = _blend(static_rank)
+        pos = [0] * n
+        block = [0] * n
+        heap = []
+        threshold = text_threshold = float("-inf")
+        first_essential = 0
+
+        while first_essential < n:
+            # Next candidate: smallest current docnum among essential lists
+            candidate = None
+            for i in range(first_essential, n):
+                p = pos[i]
+                if p < len(lists[i].ids):
+                    docnum = lists[i].ids[p]
+                    if candidate is None or docnum < candidate:
+                        candidate = docnum
+            if candidate is None:
+                break
+
+            score = 0.0
+            for i in range(first_essential, n):
+                p = pos[i]
+                ids = lists[i].ids
+                if p < len(ids) and ids[p] == candidate:
+                    score += lists[i].scores[p]
+                    pos[i] = p + 1
+
+            # The text score the candidate needs to beat the k-th final score
+            need = threshold
+            if values is not None:
+                value = values[candidate]
+                need = threshold - value if additive else threshold / value
+
+            # Probe non-essential lists, largest first, while the doc can still qualify
+            for i in range(first_essential - 1, -1, -1):
+                postings = lists[i]
+                rest = upper[i - 1] if i > 0 else 0.0
+                if score + postings.max_score + rest <= need:
+                    break
+                b = block[i]
+                block_last = postings.block_last
+                while b < len(block_last) and block_last[b] < candidate:
+                    b += 1
+                block[i] = b
+                if b == len(block_last) or score + postings.block_max[b] + rest <= need:
+                    continue
+                p = bisect_left(postings.ids, candidate, max(pos[i], b * BLOCK_SIZE))
+                pos[i] = p
+                if p < len(postings.ids) and postings.ids[p] == candidate:
+                    score += postings.scores[p]
+
+            if values is not None:
+                score = score + value if additive else score * value
+            if len(heap) < k:
+                heappush(heap, (score, -candidate))
+                if len(heap) == k:
+                    threshold = heap[0][0]
+            elif score > threshold:
+                heapreplace(heap, (score, -candidate))
+                threshold = heap[0][0]
+            else:
+                continue
+
+            # Lists that cannot lift any document past the threshold, even
+            # with the largest static value, stop generating candidates
+            text_threshold = _text_threshold(threshold, additive, max_value)
+            while first_essential < n and upper[first_essential] <= text_threshold:
+                first_essential += 1
+
+        return self._sorted(heap)
+
+    def _top_k_and(self, lists: List[ImpactPostings], k: int, static_rank=None) -> List[Tuple[float, int]]:
+        # Drive from the shortest list; the others are probed
+        lists = sorted(lists, key=len)
+        lead, others = lists[0], lists[1:]
+        other_max = sum(p.max_score for p in others)
+
+        values, additive, _ = _blend(static_rank)
+        pos = [0] * len(others)
+        block = [0] * len(others)
+        heap = []
+        threshold = need = float("-inf")
+
+        for lead_pos, candidate in enumerate(lead.ids):
+            score = lead.scores[lead_pos]
+            if values is not None:
+                value = values[candidate]
+                need = threshold - value if additive else threshold / value
+            else:
+                need = threshold
+            if score + other_max <= need:
+                continue
+
+            # Upper bound from the blocks the candidate falls in
+            bound = score
+            exhausted = False
+            for j, postings in enumerate(others):
+                b = block[j]
+                block_last = postings.block_last
+                while b < len(block_last) and block_last[b] < candidate:
+                    b += 1
+                block[j] = b
+                if b == len(block_last):
+                    exhausted = True
+                    break
+                bound += postings.block_max[b]
+            if exhausted:
+                break
+            if bound <= need:
+                continue
+
+            for j, postings in enumerate(others):
+                p = bisect_left(postings.ids, candidate, max(pos[j], block[j] * BLOCK_SIZE))
+                pos[j] = p
+                if p == len(postings.ids) or postings.ids[p] != candidate:
+                    break
+                score += postings.scores[p]
+            else:
+                if values is not None:
+                    score = score + value if additive else score * value
+                if len(heap) < k:
+                    heappush(heap, (score, -candidate))
+                    if len(heap) == k:
+                        threshold = heap[0][0]
+                elif score > threshold:
+                    heapreplace(heap, (score, -candidate))
+                    threshold = heap[0][0]
+
+        return self._sorted(heap)
+
+    def _sorted(self, heap) -> List[Tuple[float, int]]:
+        # Highest score first, ties by ascending docnum like Whoosh's TopCollector
+        heap.sort(reverse=True)
+        return [(score, -negdoc) for score, negdoc in heap]
+
+
+def _blend(static_rank):
+    """(values, additive, largest value) of a StaticRank, or Nones without one"""
+    if static_rank is None:
+        return None, None, None
+    return static_rank.values, static_rank.additive, static_rank.max_value
+
+
+def _text_threshold(threshold: float, additive, max_value) -> float:
+    """The text score no document can beat the threshold without"""
+    if max_value is None:
+        return threshold
+    # Multiplicative values are priors raised to a power, so always positive
+    return threshold - max_value if additive else threshold / max_value
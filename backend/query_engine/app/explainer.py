@@ -1,6 +1,7 @@
-import math
 from whoosh.scoring import BM25F
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from .collection_stats import CollectionStats
+from .collectors import TermScore, term_text
 
 
 class SearchExplainer:
@@ -9,37 +10,85 @@ class SearchExplainer:
     Provides educational transparency into the ranking algorithm.
     """
 
-    def __init__(self, searcher, index):
+    def __init__(self, searcher, index, stats: Optional[CollectionStats] = None):
         self.searcher = searcher
         self.index = index
         self.weighting = BM25F()
+        self.stats = stats if stats is not None else CollectionStats(searcher)
 
-    def explain_result(self, hit, query_terms: List[str], position: int) -> Dict[str, Any]:
+    def explain_result(self, hit, position: int, term_scores: List[TermScore]) -> Dict[str, Any]:
         """
         Generate detailed explanation for why a result ranked at its position.
 
         Args:
             hit: Whoosh search result Hit object
-            query_terms: List of terms from the parsed query
             position: Result position in ranking (1-indexed)
+            term_scores: Per-term scores captured by TermScoreCollector
 
         Returns:
             Dictionary with detailed score breakdown
         """
+        return self._build_explanation(hit.docnum, position, term_scores)
+
+    def explain_document(self, docnum: int, query, position: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Explain a single document's score for a query on demand.
+
+        Args:
+            docnum: Whoosh document number
+            query: Whoosh Query object the document was ranked with
+            position: Result position, if known
+
+        Returns:
+            Dictionary with detailed score breakdown
+        """
+        return self._build_explanation(docnum, position, self.score_terms(docnum, query))
+
+    def score_terms(self, docnum: int, query) -> List[TermScore]:
+        """Score each query term against one document using its postings"""
+        term_scores = []
+        reader = self.searcher.reader()
+
+        # Query.existing_terms() reuses its fieldname argument as a loop
+        # variable, so walk the leaves directly
+        terms = set()
+        for leaf in query.leaves():
+            for fieldname, text in leaf.expanded_terms(reader, phrases=True):
+                if fieldname in self.stats.fields and (fieldname, text) in reader:
+                    terms.add((fieldname, term_text(text)))
+
+        for fieldname, text in sorted(terms):
+            matcher = self.searcher.postings(fieldname, text)
+            if matcher.is_active() and matcher.id() < docnum:
+                matcher.skip_to(docnum)
+            if matcher.is_active() and matcher.id() == docnum:
+                term_scores.append((fieldname, term_text(text), matcher.weight(), matcher.score()))
+
+        return term_scores
+
+    def _build_explanation(self, docnum: int, position: Optional[int],
+                           term_scores: List[TermScore]) -> Dict[str, Any]:
+        text_score = sum(score for _, _, _, score in term_scores)
         explanation = {
             'position': position,
-            'total_score': round(hit.score, 4),
-            'breakdown': self._calculate_score_breakdown(hit, query_terms),
-            'matching_terms': self._get_matching_terms(hit, query_terms),
-            'field_contributions': self._get_field_contributions(hit, query_terms),
-            'document_stats': self._get_document_stats(hit),
+            'total_score': round(text_score, 4),
+            'breakdown': self._calculate_score_breakdown(docnum, term_scores),
+            'matching_terms': self._get_matching_terms(term_scores),
+            'field_contributions': self._get_field_contributions(term_scores),
+            'document_stats': self._get_document_stats(docnum),
             'formula_explanation': self._get_formula_explanation()
         }
 
+        # The ranker's weighting may blend a static score into the total
+        static_rank = getattr(self.searcher.weighting, 'static_rank', None)
+        if static_rank is not None:
+            explanation['static_rank'] = static_rank.explain(docnum, text_score)
+            explanation['total_score'] = explanation['static_rank']['final_score']
+
         return explanation
 
-    def _calculate_score_breakdown(self, hit, query_terms: List[str]) -> Dict[str, float]:
-        """Calculate individual components of BM25 score"""
+    def _calculate_score_breakdown(self, docnum: int, term_scores: List[TermScore]) -> Dict[str, float]:
+        """Split the BM25F score into its idf, tf and length components"""
         breakdown = {
             'term_frequency_component': 0.0,
             'idf_component': 0.0,
@@ -47,34 +96,21 @@ class SearchExplainer:
             'field_boost': 0.0
         }
 
-        # BM25 parameters (default Whoosh values)
-        k1 = 1.2  # Term frequency saturation parameter
-        b = 0.75  # Length normalization parameter
-
-        doc_count = self.searcher.doc_count_all()
-
-        for term in query_terms:
-            term_lower = term.lower()
-
-            # Calculate IDF (Inverse Document Frequency)
-            df = self.searcher.doc_frequency("content", term_lower)
-            if df > 0:
-                idf = math.log((doc_count - df + 0.5) / (df + 0.5) + 1.0)
-                breakdown['idf_component'] += idf
+        for fieldname, text, _, score in term_scores:
+            idf = self.stats.idf(fieldname, text)
+            breakdown['idf_component'] += idf
+            if idf > 0:
+                # score = idf * saturated tf, so the remainder is the tf part
+                breakdown['term_frequency_component'] += score / idf
 
-        # Estimate length normalization impact
-        # This is a simplified calculation since Whoosh doesn't expose all internals
-        try:
-            content_length = len(hit.get('content', '').split())
-            avg_length = self._estimate_average_doc_length()
-            if avg_length > 0:
-                length_ratio = content_length / avg_length
-                breakdown['length_normalization'] = round(1.0 / (1.0 + b * (length_ratio - 1.0)), 4)
-        except:
-            breakdown['length_normalization'] = 1.0
+        norm = self.stats.length_norm(docnum, "content")
+        breakdown['length_normalization'] = 1.0 / norm if norm > 0 else 1.0
 
-        # Field boost (title vs content)
-        breakdown['field_boost'] = 2.0 if self._has_title_match(hit, query_terms) else 1.0
+        # How much the title field multiplied the content-only score
+        fields = self._get_field_contributions(term_scores)
+        content_score = fields.get('content', 0.0)
+        total_score = sum(fields.values())
+        breakdown['field_boost'] = total_score / content_score if content_score > 0 else 1.0
 
         # Round all values
         for key in breakdown:
@@ -82,76 +118,62 @@ class SearchExplainer:
 
         return breakdown
 
-    def _get_matching_terms(self, hit, query_terms: List[str]) -> List[Dict[str, Any]]:
-        """Extract which query terms matched in the document"""
-        matching = []
-
-        content_text = hit.get('content', '').lower()
-        title_text = hit.get('title', '').lower()
-
-        for term in query_terms:
-            term_lower = term.lower()
-
-            # Count occurrences
-            content_count = content_text.count(term_lower)
-            title_count = title_text.count(term_lower)
-
-            if content_count > 0 or title_count > 0:
-                # Calculate document frequency
-                df = self.searcher.doc_frequency("content", term_lower)
-                doc_count = self.searcher.doc_count_all()
-
-                # Calculate IDF
-                idf = 0.0
-                if df > 0:
-                    idf = math.log((doc_count - df + 0.5) / (df + 0.5) + 1.0)
+    def _get_matching_terms(self, term_scores: List[TermScore]) -> List[Dict[str, Any]]:
+        """Per-term frequencies and contributions as seen by the matcher"""
+        by_term: Dict[str, Dict[str, Any]] = {}
+
+        for fieldname, text, weight, score in term_scores:
+            entry = by_term.setdefault(text, {
+                'term': text,
+                'content_frequency': 0,
+                'title_frequency': 0,
+                'score': 0.0
+            })
+            if fieldname in ('content', 'title'):
+                entry[f'{fieldname}_frequency'] = int(weight)
+            entry['score'] += score
 
-                matching.append({
-                    'term': term,
-                    'content_frequency': content_count,
-                    'title_frequency': title_count,
-                    'document_frequency': df,
-                    'total_documents': doc_count,
-                    'idf_score': round(idf, 4),
-                    'rarity': self._calculate_rarity(df, doc_count)
-                })
+        matching = []
+        doc_count = self.stats.doc_count_all
+        for text, entry in by_term.items():
+            # Content is the larger field, so its statistics describe rarity best
+            fieldname = 'content' if entry['content_frequency'] else 'title'
+            df, idf = self.stats.term_stats(fieldname, text)
+            entry.update({
+                'document_frequency': df,
+                'total_documents': doc_count,
+                'idf_score': round(idf, 4),
+                'rarity': self._calculate_rarity(df, doc_count),
+                'score': round(entry['score'], 4)
+            })
+            matching.append(entry)
 
         # Sort by IDF score (rarest terms first)
         matching.sort(key=lambda x: x['idf_score'], reverse=True)
         return matching
 
-    def _get_field_contributions(self, hit, query_terms: List[str]) -> Dict[str, float]:
-        """Calculate how much each field contributed to the score"""
+    def _get_field_contributions(self, term_scores: List[TermScore]) -> Dict[str, float]:
+        """Sum the score each field contributed"""
         contributions = {
             'title': 0.0,
             'content': 0.0
         }
 
-        title_text = hit.get('title', '').lower()
-        content_text = hit.get('content', '').lower()
-
-        # Title gets 2x boost in BM25F
-        title_matches = sum(1 for term in query_terms if term.lower() in title_text)
-        content_matches = sum(1 for term in query_terms if term.lower() in content_text)
-
-        total_matches = title_matches * 2.0 + content_matches
+        for fieldname, _, _, score in term_scores:
+            contributions[fieldname] = contributions.get(fieldname, 0.0) + score
 
-        if total_matches > 0:
-            contributions['title'] = round((title_matches * 2.0 / total_matches) * hit.score, 4)
-            contributions['content'] = round((content_matches / total_matches) * hit.score, 4)
+        return {fieldname: round(score, 4) for fieldname, score in contributions.items()}
 
-        return contributions
-
-    def _get_document_stats(self, hit) -> Dict[str, Any]:
+    def _get_document_stats(self, docnum: int) -> Dict[str, Any]:
         """Get statistics about the document"""
-        content = hit.get('content', '')
-        title = hit.get('title', '')
+        content_length = self.stats.doc_field_length(docnum, "content")
+        avg_content_length = self.stats.avg_field_length("content")
 
         return {
-            'content_length': len(content.split()),
-            'title_length': len(title.split()),
-            'avg_content_length': self._estimate_average_doc_length(),
-            'length_ratio': round(len(content.split()) / max(self._estimate_average_doc_length(), 1), 2)
+            'content_length': content_length,
+            'title_length': self.stats.doc_field_length(docnum, "title"),
+            'avg_content_length': round(avg_content_length, 2),
+            'length_ratio': round(content_length / max(avg_content_length, 1), 2)
         }
 
     def _get_formula_explanation(self) -> Dict[str, str]:
@@ -169,34 +191,6 @@ class SearchExplainer:
             'explanation': 'BM25 balances term frequency, term rarity, and document length to rank relevance'
         }
 
-    def _has_title_match(self, hit, query_terms: List[str]) -> bool:
-        """Check if any query term appears in title"""
-        title = hit.get('title', '').lower()
-        return any(term.lower() in title for term in query_terms)
-
-    def _estimate_average_doc_length(self) -> float:
-        """Estimate average document length across the index"""
-        # This is an approximation since Whoosh doesn't expose this directly
-        # In production, this would be cached or pre-calculated
-        try:
-            with self.index.reader() as reader:
-                total_tokens = 0
-                doc_count = 0
-
-                # Sample up to 100 documents
-                for docnum in range(min(100, reader.doc_count_all())):
-                    try:
-                        doc = reader.stored_fields(docnum)
-                        content = doc.get('content', '')
-                        total_tokens += len(content.split())
-                        doc_count += 1
-                    except:
-                        continue
-
-                return total_tokens / max(doc_count, 1)
-        except:
-            return 100.0  # Fallback default
-
     def _calculate_rarity(self, df: int, total_docs: int) -> str:
         """Categorize term rarity"""
         if df == 0:
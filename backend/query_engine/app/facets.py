@@ -0,0 +1,166 @@
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .collectors import term_text
+
+# Facets /search can count, and those reported as a full histogram in value
+# order rather than as the most frequent values
+FACETS = ("domain", "crawled_month")
+HISTOGRAMS = ("crawled_month",)
+
+
+class Column:
+    """
+    One value per document: ordinals into a sorted list of distinct values,
+    aligned with docnums (-1 where a document has no value).
+    """
+
+    def __init__(self, values: List[str], ordinals: array):
+        self.values = values
+        self.ordinals = ordinals
+
+    def value(self, docnum: int) -> Optional[str]:
+        ordinal = self.ordinals[docnum]
+        return self.values[ordinal] if ordinal >= 0 else None
+
+
+def term_column(reader, fieldname: str) -> Column:
+    """Column of a single-valued indexed field, read from its postings"""
+    ordinals = array("i", [-1]) * reader.doc_count_all()
+    values = []
+    if fieldname in reader.schema:
+        for text in reader.lexicon(fieldname):
+            for docnum in reader.postings(fieldname, text).all_ids():
+                ordinals[docnum] = len(values)
+            values.append(term_text(text))
+    return Column(values, ordinals)
+
+
+def month_column(reader, fieldname: str = "crawled_at") -> Column:
+    """Year and month ("2024-05") of a DATETIME field, from its full-precision terms"""
+    ordinals = array("i", [-1]) * reader.doc_count_all()
+    months: Dict[str, int] = {}
+    if fieldname in reader.schema:
+        field = reader.schema[fieldname]
+        # Sortable terms come in value order, so months are numbered in order
+        for text in field.sortable_terms(reader, fieldname):
+            moment = field.from_bytes(text)
+            ordinal = months.setdefault(f"{moment.year:04d}-{moment.month:02d}", len(months))
+            for docnum in reader.postings(fieldname, text).all_ids():
+                ordinals[docnum] = ordinal
+    return Column(list(months), ordinals)
+
+
+# Derived columns; any other name is read as an indexed field
+BUILDERS: Dict[str, Callable[[object], Column]] = {
+    "crawled_month": month_column
+}
+
+
+class ColumnCache:
+    """
+    Per-document columns (domain, URL, crawl month, ...) built from the
+    inverted index, never from stored fields, for facet counting and
+    grouping.
+
+    Like FilterCache, columns are built per segment and keyed by segment
+    id, so a new index generation only reads the segments it added; the
+    merged docnum-aligned column is cached per (generation, column).
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._segment_columns: "OrderedDict[Tuple[str, str], Column]" = OrderedDict()
+        self._columns: "OrderedDict[Tuple[int, str], Column]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._columns)
+
+    def column(self, searcher, name: str) -> Column:
+        """The column for every docnum of the searcher's generation"""
+        reader = searcher.reader()
+        key = (reader.generation(), name)
+        with self._lock:
+            cached = self._columns.get(key)
+            if cached is not None:
+                self._columns.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+            leaves = reader.leaf_readers()
+            segments = [(self._segment_column(leaf, name), offset) for leaf, offset in leaves]
+            if len(segments) == 1:
+                column = segments[0][0]
+            else:
+                column = self._merge(segments, reader.doc_count_all())
+
+            self._columns[key] = column
+            while len(self._columns) > self.max_entries:
+                self._columns.popitem(last=False)
+            return column
+
+    def clear(self):
+        with self._lock:
+            self._segment_columns.clear()
+            self._columns.clear()
+
+    def _segment_column(self, leaf, name: str) -> Column:
+        segment = leaf.segment() if hasattr(leaf, "segment") else None
+        key = (segment.segment_id() if segment is not None else "", name)
+        cached = self._segment_columns.get(key)
+        if cached is not None:
+            self._segment_columns.move_to_end(key)
+            return cached
+
+        builder = BUILDERS.get(name)
+        column = builder(leaf) if builder is not None else term_column(leaf, name)
+        self._segment_columns[key] = column
+        while len(self._segment_columns) > self.max_entries * 8:
+            self._segment_columns.popitem(last=False)
+        return column
+
+    @staticmethod
+    def _merge(segments: List[Tuple[Column, int]], doc_count: int) -> Column:
+        """Renumber segment ordinals into one sorted value list"""
+        values = sorted(set().union(*(column.values for column, _ in segments)))
+        index = {value: i for i, value in enumerate(values)}
+        ordinals = array("i", [-1]) * doc_count
+        for column, offset in segments:
+            remap = [index[value] for value in column.values]
+            for docnum, ordinal in enumerate(column.ordinals, offset):
+                if ordinal >= 0:
+                    ordinals[docnum] = remap[ordinal]
+        return Column(values, ordinals)
+
+
+def count_facets(columns: Dict[str, Column], docnums, limit: int = 10) -> Dict[str, List[Dict[str, object]]]:
+    """
+    Count the values of each column over docnums, one pass for all of them.
+
+    Histogram facets list every value in order; the others list the limit
+    most frequent values.
+    """
+    counts = {name: [0] * len(column.values) for name, column in columns.items()}
+    pairs = [(column.ordinals, counts[name]) for name, column in columns.items()]
+    for docnum in docnums:
+        for ordinals, tally in pairs:
+            ordinal = ordinals[docnum]
+            if ordinal >= 0:
+                tally[ordinal] += 1
+
+    facets = {}
+    for name, column in columns.items():
+        tally = counts[name]
+        if name in HISTOGRAMS:
+            order = [i for i in range(len(tally)) if tally[i]]
+        else:
+            order = sorted((i for i in range(len(tally)) if tally[i]), key=lambda i: -tally[i])[:limit]
+        facets[name] = [{"value": column.values[i], "count": tally[i]} for i in order]
+    return facets
@@ -0,0 +1,106 @@
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from whoosh.idsets import BitSet
+
+
+# (cache key, Whoosh query) - the key is the normalized operator value,
+# e.g. "site:python.org", so equal filters share one cached bitset
+FilterSpec = Tuple[str, object]
+
+
+class FilterCache:
+    """
+    Caches the document sets matched by non-scoring filters (site:, inurl:,
+    filetype:, daterange:) so repeated operators never re-run their queries.
+
+    Bitsets are kept per segment, keyed by segment id and filter key, so a
+    new index generation only recomputes filters for segments it added.
+    The combined top-level set is cached per (generation, filter keys).
+    Safe to share between threads running queries on pooled searchers.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._segment_sets: "OrderedDict[Tuple[str, str], BitSet]" = OrderedDict()
+        self._combined: "OrderedDict[Tuple[int, Tuple[str, ...]], BitSet]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._combined)
+
+    def mask_for(self, searcher, specs: List[FilterSpec]) -> Optional[BitSet]:
+        """
+        Get the set of global docnums allowed by every filter in specs.
+
+        Returns:
+            BitSet of allowed docnums, or None if there are no filters
+        """
+        if not specs:
+            return None
+
+        generation = searcher.reader().generation()
+        key = (generation, tuple(sorted(k for k, _ in specs)))
+        with self._lock:
+            cached = self._get(self._combined, key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+            mask = None
+            for filter_key, query in specs:
+                docs = self._filter_docs(searcher, filter_key, query)
+                mask = docs if mask is None else mask.intersection(docs)
+
+            self._put(self._combined, key, mask)
+            return mask
+
+    def clear(self):
+        with self._lock:
+            self._segment_sets.clear()
+            self._combined.clear()
+
+    def _filter_docs(self, searcher, filter_key: str, query) -> BitSet:
+        size = searcher.doc_count_all()
+        if searcher.is_atomic():
+            subsearchers = [(searcher, 0)]
+        else:
+            subsearchers = searcher.subsearchers
+
+        combined = BitSet(size=size)
+        for subsearcher, offset in subsearchers:
+            segment_set = self._segment_docs(subsearcher, filter_key, query)
+            if offset:
+                combined.update(docnum + offset for docnum in segment_set)
+            else:
+                combined.update(segment_set)
+        return combined
+
+    def _segment_docs(self, subsearcher, filter_key: str, query) -> BitSet:
+        reader = subsearcher.reader()
+        segment = reader.segment() if hasattr(reader, "segment") else None
+        segment_id = segment.segment_id() if segment is not None else ""
+        key = (segment_id, filter_key)
+
+        cached = self._get(self._segment_sets, key)
+        if cached is not None:
+            return cached
+
+        docs = BitSet(subsearcher.docs_for_query(query), size=subsearcher.doc_count_all())
+        self._put(self._segment_sets, key, docs)
+        return docs
+
+    def _get(self, cache, key):
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+    def _put(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
@@ -0,0 +1,357 @@
+import os
+import json
+import shutil
+import tempfile
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from whoosh.searching import Results
+
+from .dynamic_pruning import BLOCK_SIZE, keyword_groups
+
+FORMAT_VERSION = 2
+ARRAYS = ("terms", "term_offsets", "offsets", "docids", "impacts", "block_offsets", "block_last", "block_max")
+
+
+def block_maxima(offsets: np.ndarray, docids: np.ndarray, impacts: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    Split every term's postings into blocks of BLOCK_SIZE.
+
+    Returns:
+        (block_offsets, block_last, block_max): term i's blocks are
+        ``block_offsets[i]:block_offsets[i + 1]``, with the docnum of each
+        block's last posting and its highest impact
+    """
+    counts = -(-np.diff(offsets) // BLOCK_SIZE)
+    block_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=block_offsets[1:])
+    if not block_offsets[-1]:
+        return block_offsets, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64)
+    # Blocks tile the postings without gaps, so each ends where the next starts
+    within = np.arange(block_offsets[-1]) - np.repeat(block_offsets[:-1], counts)
+    starts = np.repeat(offsets[:-1], counts) + within * BLOCK_SIZE
+    ends = np.append(starts[1:], len(docids))
+    return block_offsets, docids[ends - 1], np.maximum.reduceat(impacts, starts)
+
+
+class FieldImpacts:
+    """
+    CSR postings for one field.
+
+    Term i's bytes are ``terms[term_offsets[i]:term_offsets[i + 1]]`` (terms
+    are in lexicon order) and its postings are
+    ``docids[offsets[i]:offsets[i + 1]]`` with the exact BM25F score of each
+    posting in the same slice of ``impacts``. Its blocks (see block_maxima)
+    are ``block_offsets[i]:block_offsets[i + 1]`` of ``block_last`` and
+    ``block_max``, for MaxScore.
+    """
+
+    def __init__(self, terms: np.ndarray, term_offsets: np.ndarray, offsets: np.ndarray,
+                 docids: np.ndarray, impacts: np.ndarray, block_offsets: np.ndarray = None,
+                 block_last: np.ndarray = None, block_max: np.ndarray = None):
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.offsets = offsets
+        self.docids = docids
+        self.impacts = impacts
+        if block_offsets is None:
+            block_offsets, block_last, block_max = block_maxima(offsets, docids, impacts)
+        self.block_offsets = block_offsets
+        self.block_last = block_last
+        self.block_max = block_max
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def term_id(self, text: str) -> int:
+        """Binary search the term blob; -1 if the term is not in the field"""
+        key = text.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            term = self.terms[self.term_offsets[mid]:self.term_offsets[mid + 1]].tobytes()
+            if term < key:
+                lo = mid + 1
+            elif term > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def postings(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.term_id(text)
+        if i < 0:
+            return self.docids[:0], self.impacts[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docids[start:end], self.impacts[start:end]
+
+    def blocks(self, text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """postings() plus the term's block_last and block_max"""
+        i = self.term_id(text)
+        if i < 0:
+            return self.docids[:0], self.impacts[:0], self.block_last[:0], self.block_max[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        block_start, block_end = self.block_offsets[i], self.block_offsets[i + 1]
+        return (self.docids[start:end], self.impacts[start:end],
+                self.block_last[block_start:block_end], self.block_max[block_start:block_end])
+
+    def lexicon(self) -> List[bytes]:
+        return [self.terms[self.term_offsets[i]:self.term_offsets[i + 1]].tobytes() for i in range(len(self))]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+
+class ImpactIndex:
+    """
+    In-memory impact index over the title and content postings.
+
+    Every posting's BM25F score is precomputed for one index generation, so
+    a keyword query is a few vectorized scatter-adds into a dense score
+    array followed by a partial sort, with no per-posting Python work.
+
+    Postings are also split into blocks with their maximum impact, which
+    the "maxscore" engine reads instead of scoring postings at query time.
+    The query parser turns each word into an OR of its title and content
+    terms, so those two fields are also stored merged (``combined``), with
+    a document's impacts summed.
+
+    The arrays live in ``<path>/gen-<generation>/`` as .npy files and are
+    opened memory-mapped, so every worker serving the same generation
+    shares one copy through the page cache. The first process to open a new
+    generation builds the files; the rest load them.
+    """
+
+    # Fields whose postings are also stored merged
+    COMBINED = ("title", "content")
+
+    def __init__(self, searcher, generation: int, fields: Dict[str, FieldImpacts],
+                 combined: Optional[FieldImpacts] = None):
+        self.searcher = searcher
+        self.generation = generation
+        self.fields = fields
+        self.combined = combined
+        self.doc_count_all = searcher.doc_count_all()
+
+    @classmethod
+    def open_or_build(cls, searcher, path: str, fields=("title", "content")) -> "ImpactIndex":
+        """Load the side files for the searcher's generation, building them if missing"""
+        generation = searcher.reader().generation()
+        directory = os.path.join(path, f"gen-{generation}")
+        if not cls._is_complete(directory, searcher):
+            cls.build(searcher, path, fields)
+        return cls.load(searcher, directory)
+
+    @classmethod
+    def load(cls, searcher, directory: str) -> "ImpactIndex":
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        fields = {}
+        for fieldname in meta["fields"] + (["combined"] if meta["combined"] else []):
+            arrays = [np.load(os.path.join(directory, f"{fieldname}.{name}.npy"), mmap_mode="r")
+                      for name in ARRAYS]
+            fields[fieldname] = FieldImpacts(*arrays)
+        combined = fields.pop("combined", None)
+        return cls(searcher, meta["generation"], fields, combined)
+
+    @classmethod
+    def build(cls, searcher, path: str, fields=("title", "content")) -> str:
+        """
+        Write the side files for the searcher's current generation.
+
+        Files are written to a private temporary directory and renamed into
+        place, so concurrent builders never expose a half-written index.
+        Older generations are removed once the new one is published.
+
+        Returns:
+            Directory holding the generation's arrays
+        """
+        generation = searcher.reader().generation()
+        directory = os.path.join(path, f"gen-{generation}")
+        os.makedirs(path, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".gen-{generation}-", dir=path)
+
+        try:
+            schema = searcher.schema
+            scorable = [f for f in fields if f in schema and schema[f].scorable]
+            built = {fieldname: cls._build_field(searcher, fieldname) for fieldname in scorable}
+            combined = all(f in built for f in cls.COMBINED)
+            if combined:
+                built["combined"] = cls._combine([built[f] for f in cls.COMBINED], searcher.doc_count_all())
+            for fieldname, impacts in built.items():
+                for name in ARRAYS:
+                    np.save(os.path.join(staging, f"{fieldname}.{name}.npy"), getattr(impacts, name))
+
+            meta = {
+                "version": FORMAT_VERSION,
+                "generation": generation,
+                "doc_count_all": searcher.doc_count_all(),
+                "fields": scorable,
+                "combined": combined
+            }
+            with open(os.path.join(staging, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                # Another worker published this generation first
+                shutil.rmtree(staging, ignore_errors=True)
+        except:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        for name in os.listdir(path):
+            if name.startswith("gen-") and name != f"gen-{generation}":
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        return directory
+
+    @staticmethod
+    def _is_complete(directory: str, searcher) -> bool:
+        try:
+            with open(os.path.join(directory, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return meta.get("version") == FORMAT_VERSION and meta.get("doc_count_all") == searcher.doc_count_all()
+
+    @staticmethod
+    def _build_field(searcher, fieldname: str) -> FieldImpacts:
+        reader = searcher.reader()
+        weighting = searcher.weighting
+        doc_count_all = searcher.doc_count_all()
+
+        terms = bytearray()
+        term_offsets = array("q", [0])
+        offsets = array("q", [0])
+        docids = array("i")
+        weights = array("d")
+        idfs = array("d")
+        B = K1 = avgfl = None
+
+        for btext in reader.lexicon(fieldname):
+            text = btext.decode("utf-8")
+            matcher = reader.postings(fieldname, text)
+            while matcher.is_active():
+                docids.append(matcher.id())
+                weights.append(matcher.weight())
+                matcher.next()
+
+            # Take idf and parameters from the scorer BM25F itself would use
+            scorer = weighting.scorer(searcher, fieldname, text)
+            idfs.append(scorer.idf)
+            B, K1, avgfl = scorer.B, scorer.K1, scorer.avgfl
+
+            terms.extend(btext)
+            term_offsets.append(len(terms))
+            offsets.append(len(docids))
+
+        offsets = np.frombuffer(offsets, dtype=np.int64)
+        docids = np.frombuffer(docids, dtype=np.int32)
+        tf = np.frombuffer(weights, dtype=np.float64)
+        if len(docids):
+            idf = np.repeat(np.frombuffer(idfs, dtype=np.float64), np.diff(offsets))
+            fl = np.array([searcher.doc_field_length(docnum, fieldname, 1) for docnum in range(doc_count_all)],
+                          dtype=np.float64)[docids]
+            # Same expression and operation order as whoosh.scoring.bm25
+            impacts = idf * ((tf * (K1 + 1)) / (tf + K1 * ((1 - B) + B * fl / avgfl)))
+        else:
+            impacts = np.zeros(0, dtype=np.float64)
+
+        return FieldImpacts(np.frombuffer(bytes(terms), dtype=np.uint8),
+                            np.frombuffer(term_offsets, dtype=np.int64),
+                            offsets, docids, impacts)
+
+    @staticmethod
+    def _combine(parts: List[FieldImpacts], doc_count_all: int) -> FieldImpacts:
+        """Merge fields' postings by term text, summing a document's impacts in field order"""
+        lexicons = [part.lexicon() for part in parts]
+        merged = sorted(set().union(*lexicons))
+        term_ids = {term: i for i, term in enumerate(merged)}
+
+        # One (term id, docnum) key per posting, sorted stably so duplicates
+        # keep field order
+        keys = np.concatenate([
+            np.repeat(np.array([term_ids[term] for term in lexicon], dtype=np.int64), np.diff(part.offsets))
+            * doc_count_all + part.docids
+            for part, lexicon in zip(parts, lexicons)
+        ])
+        impacts = np.concatenate([part.impacts for part in parts])
+        order = np.argsort(keys, kind="stable")
+        keys, starts = np.unique(keys[order], return_index=True)
+        impacts = np.add.reduceat(impacts[order], starts) if len(keys) else impacts
+
+        offsets = np.zeros(len(merged) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // doc_count_all, minlength=len(merged)), out=offsets[1:])
+        term_offsets = np.zeros(len(merged) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in merged], out=term_offsets[1:])
+        return FieldImpacts(np.frombuffer(b"".join(merged), dtype=np.uint8), term_offsets, offsets,
+                            (keys % doc_count_all).astype(np.int32), impacts)
+
+    def block_postings(self, leaves) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Stored postings and blocks for a group of (fieldname, text) leaves
+        whose scores are summed: a single term, or one text in exactly the
+        combined fields. None for any other group.
+        """
+        if len(leaves) == 1:
+            fieldname, text = leaves[0]
+            return self.fields[fieldname].blocks(text)
+        if self.combined is not None and len({text for _, text in leaves}) == 1 \
+                and sorted(fieldname for fieldname, _ in leaves) == sorted(self.COMBINED):
+            return self.combined.blocks(leaves[0][1])
+        return None
+
+    def supports(self, query) -> bool:
+        """True for Terms on indexed fields, and And/Or trees of them"""
+        return keyword_groups(query, self.fields) is not None
+
+    def search(self, query, limit: int, static_rank=None, searcher=None) -> Results:
+        mode, groups = keyword_groups(query, self.fields)
+        scores = np.zeros(self.doc_count_all, dtype=np.float64)
+
+        if mode == "or":
+            matched = np.zeros(self.doc_count_all, dtype=bool)
+            for leaves in groups:
+                self._accumulate(leaves, scores, matched)
+        else:
+            counts = np.zeros(self.doc_count_all, dtype=np.int32)
+            for leaves in groups:
+                in_group = np.zeros(self.doc_count_all, dtype=bool)
+                self._accumulate(leaves, scores, in_group)
+                counts += in_group
+            matched = counts == len(groups)
+
+        candidates = np.flatnonzero(matched)
+        scores = scores[candidates]
+        if static_rank is not None:
+            # The same add or multiply StaticRankBM25F.final() does per hit
+            values = np.frombuffer(static_rank.values, dtype=np.float64)[candidates]
+            scores = scores + values if static_rank.additive else scores * values
+        return Results(searcher or self.searcher, query, self._top_k(candidates, scores, limit))
+
+    def _accumulate(self, leaves, scores: np.ndarray, matched: np.ndarray):
+        for fieldname, text in leaves:
+            docids, impacts = self.fields[fieldname].postings(text)
+            # Docids are unique within a term, so fancy-index add is exact
+            scores[docids] += impacts
+            matched[docids] = True
+
+    def _top_k(self, docnums: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        if k <= 0:
+            return []
+        if k < len(scores):
+            # Keep everything tied with the k-th score so ties break by docnum
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth
+            docnums, scores = docnums[keep], scores[keep]
+        # Highest score first, ties by ascending docnum like Whoosh's TopCollector
+        order = np.lexsort((docnums, -scores))[:k]
+        return list(zip(scores[order].tolist(), docnums[order].tolist()))
+
+    @property
+    def nbytes(self) -> int:
+        combined = self.combined.nbytes if self.combined is not None else 0
+        return sum(field.nbytes for field in self.fields.values()) + combined
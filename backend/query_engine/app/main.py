@@ -1,13 +1,20 @@
 import time
 import sys
+import json
+import asyncio
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
 
 # Add backend to path for imports
 backend_path = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 
@@ -16,19 +23,65 @@ try:
 except ImportError:
     from backend.config import config
 
-from .ranking import BM25Ranker
+from .ranking import BM25Ranker, query_stage
+from .facets import FACETS
+from .collectors import SearchCancelled
+from .warmup import Warmup
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
 
 try:
     from services.graph_service import CrawlGraphService
+    from services.graph_analytics import GraphAnalytics
+    from services.loader import LoaderLock, claim_worker_slot
+    from services import graph_export
 except ImportError:
     from backend.services.graph_service import CrawlGraphService 
+    from backend.services.graph_analytics import GraphAnalytics
+    from backend.services.loader import LoaderLock, claim_worker_slot
+    from backend.services import graph_export
+
+try:
+    from services.metrics import metrics, read_textfiles, merge_expositions, Timeline
+    from services.query_log import QueryLog, stage_timings_ms, worker_path
+    from services.profiling import RequestProfiler
+except ImportError:
+    from backend.services.metrics import metrics, read_textfiles, merge_expositions, Timeline
+    from backend.services.query_log import QueryLog, stage_timings_ms, worker_path
+    from backend.services.profiling import RequestProfiler
+
+@asynccontextmanager
+async def lifespan(app):
+    # Serve /health straight away; /ready waits for the caches to be warm
+    warmup_task = asyncio.create_task(warmup.run(search_executor))
+    export_task = asyncio.create_task(export_worker_metrics()) if WORKER_TEXTFILE is not None else None
+    yield
+    warmup_task.cancel()
+    if export_task is not None:
+        export_task.cancel()
+        WORKER_TEXTFILE.unlink(missing_ok=True)
+    # Flush queued query log entries
+    query_log.close()
+
+async def export_worker_metrics():
+    # Other workers' /metrics read this worker's samples from its textfile
+    while True:
+        try:
+            await asyncio.to_thread(metrics.write_textfile, WORKER_TEXTFILE)
+        except OSError:
+            pass
+        await asyncio.sleep(config.METRICS["WORKER_TEXTFILE_SECONDS"])
 
 app = FastAPI(
     title="Nayuta Query Engine",
     description="API for Nayuta Search Engine's query processing",
     version="0.1.0",
     docs_url="/api/docs",
-    redoc_url=None
+    redoc_url=None,
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -39,16 +92,104 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "nayuta_http_request_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # Streaming responses are timed up to their first byte
+    start_time = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start_time,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=response.status_code
+    )
+    return response
+
+@app.middleware("http")
+async def refresh_searcher(request: Request, call_next):
+    # Handlers that use the main searcher run on the event loop without
+    # awaiting, so no other request is using it here: a safe point to move
+    # it (and static rank) to a new index generation
+    ranker.maybe_refresh()
+    return await call_next(request)
+
 # Construct absolute path to index
 INDEX_PATH = Path(__file__).parent.parent.parent / "indexer" / "whoosh_index"
 
+# With several workers (see serve.py), whichever holds this lock computes
+# graph analytics and static rank; the others attach to its files
+loader = LoaderLock(str(INDEX_PATH) + ".loader")
+
+# Each worker also writes its own query log and metrics textfile, numbered
+# by a slot it holds; a single worker keeps the plain names
+worker = None
+if config.QUERY_ENGINE["WORKERS"] > 1:
+    worker = claim_worker_slot(str(INDEX_PATH) + ".worker", config.QUERY_ENGINE["WORKERS"])
+    metrics.labels = {"worker": str(worker)}
+WORKER_TEXTFILE = Path(config.METRICS["TEXTFILE_DIR"]) / f"query-engine-{worker}.prom" if worker is not None else None
+
 try:
-    ranker = BM25Ranker(index_path=str(INDEX_PATH))
+    ranker = BM25Ranker(
+        index_path=str(INDEX_PATH),
+        engine=config.QUERY_ENGINE["RETRIEVAL_ENGINE"],
+        pool_size=config.QUERY_ENGINE["SEARCHER_POOL_SIZE"]
+    )
     graph_service = CrawlGraphService(ranker.index)
+    graph_analytics = GraphAnalytics(graph_service, loader=loader)
+    if config.QUERY_ENGINE["STATIC_RANK_WEIGHT"]:
+        # Static rank reuses the snapshot's PageRank rather than computing its own
+        ranker.enable_static_rank(
+            graph_analytics.pagerank_scores,
+            config.QUERY_ENGINE["STATIC_RANK_WEIGHT"],
+            config.QUERY_ENGINE["STATIC_RANK_FORMULA"],
+            loader=loader
+        )
 except Exception as e:
     raise RuntimeError(f"Failed to initialize services: {str(e)}")
 
+metrics.add_collector(ranker.cache_metrics)
+
+query_log = QueryLog(
+    worker_path(config.LOGGING["QUERY_LOG"], worker),
+    slow_path=worker_path(config.LOGGING["SLOW_QUERY_LOG"], worker),
+    sample_rate=config.LOGGING["QUERY_LOG_SAMPLE_RATE"],
+    slow_ms=config.LOGGING["SLOW_QUERY_MS"],
+    max_bytes=config.LOGGING["MAX_SIZE_MB"] * 1024 * 1024,
+    backup_count=config.LOGGING["BACKUP_COUNT"],
+    queue_size=config.LOGGING["QUERY_LOG_QUEUE_SIZE"]
+)
+
+profiler = RequestProfiler(
+    max_per_minute=config.QUERY_ENGINE["PROFILE_MAX_PER_MINUTE"],
+    top=config.QUERY_ENGINE["PROFILE_TOP_FUNCTIONS"]
+)
+
+# One thread per pooled searcher for batch and WebSocket queries
+search_executor = ThreadPoolExecutor(
+    max_workers=config.QUERY_ENGINE["SEARCHER_POOL_SIZE"],
+    thread_name_prefix="search"
+)
+
+warmup = Warmup(
+    ranker,
+    graph_service,
+    graph_analytics,
+    query_log_path=config.LOGGING["QUERY_LOG"],
+    top_queries=config.QUERY_ENGINE["WARMUP_TOP_QUERIES"],
+    top_terms=config.QUERY_ENGINE["WARMUP_TOP_TERMS"],
+    wait_seconds=config.QUERY_ENGINE["WARMUP_WAIT_SECONDS"]
+)
+
+# Batch filters map onto the advanced query operators
+BATCH_FILTERS = ("site", "filetype", "inurl", "intitle", "daterange")
+
 class SearchResult(BaseModel):
+    docnum: Optional[int] = None
     url: str
     title: str
     snippet: str
@@ -60,37 +201,291 @@ class SearchResponse(BaseModel):
     query_time: float
     total_hits: int
     parsed_query: Optional[Dict[str, Any]] = None
+    facets: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    groups: Optional[List[Dict[str, Any]]] = None
+    profile: Optional[Dict[str, Any]] = None
+
+class BatchQuery(BaseModel):
+    q: str
+    limit: int = 10
+    offset: int = 0
+    filters: Optional[Dict[str, str]] = None
+    engine: Optional[str] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery]
+
+def dump_json(payload) -> bytes:
+    """Serialize a response body directly, without per-item model validation"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=str)
+    return json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+
+def log_query(endpoint, q, params, hits, elapsed, timeline=None, error=None):
+    entry = {
+        "endpoint": endpoint,
+        "q": q,
+        "params": params,
+        "hits": hits,
+        "latency_ms": round(elapsed * 1000, 3),
+        "stages": stage_timings_ms(timeline)
+    }
+    if error is not None:
+        entry["error"] = error
+    query_log.record(entry)
+
+def require_admin(request: Request, action: str):
+    token = config.SECURITY["ADMIN_TOKEN"]
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not token or not secrets.compare_digest(supplied, token):
+        raise HTTPException(status_code=403, detail=f"{action} requires an admin token")
+
+def authorize_profile(request: Request):
+    """Gate profile=true to admins, one request at a time, within the rate limit"""
+    require_admin(request, "Profiling")
+    if not profiler.acquire():
+        raise HTTPException(status_code=429, detail="Profiling is rate limited; try again later")
+
+@contextmanager
+def maybe_profile(profile: bool, timeline=None):
+    """Profile the block if requested (after authorize_profile), yielding the report or None"""
+    if not profile:
+        yield None
+        return
+    with profiler.profile(timeline) as report:
+        yield report
+
+def with_profile(payload, report):
+    return payload if report is None else dict(payload, profile=report)
+
+def graph_snapshot():
+    """
+    The materialized graph analytics, scheduling a recompute if the index
+    has moved on. Raises 503 until a first snapshot exists.
+    """
+    graph_analytics.schedule()
+    snapshot = graph_analytics.snapshot()
+    if snapshot is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Graph analytics are being computed",
+            headers={"Retry-After": "5"}
+        )
+    return snapshot
+
+def format_results(results):
+    return [
+        {
+            "docnum": res.get("docnum"),
+            "url": res["url"],
+            "title": res.get("title", ""),
+            "snippet": res.get("snippet", ""),
+            "score": res.get("score", 0.0),
+            "explanation": res.get("explanation")
+        } for res in results
+    ]
 
 @app.get("/search", response_model=SearchResponse, tags=["Search"])
 async def search(
+    request: Request,
     q: str,
     limit: int = 10,
     offset: int = 0,
-    explain: bool = False
+    explain: bool = False,
+    engine: Optional[str] = None,
+    fields: Optional[str] = None,
+    facets: Optional[str] = None,
+    facet_limit: int = 10,
+    collapse: Optional[str] = None,
+    collapse_size: int = 1,
+    collapse_counts: bool = False,
+    profile: bool = False
 ):
-    """Main search endpoint with optional result explanation"""
+    """
+    Main search endpoint with optional result explanation.
+
+    fields is a comma-separated projection (e.g. ``url,title,score``);
+    snippets and explanations are only computed when requested. facets
+    (e.g. ``domain,crawled_month``) adds value counts over every matching
+    document, up to facet_limit values per facet (months are a full
+    histogram). collapse=domain keeps the collapse_size best results per
+    domain, limit and offset then counting domains; results stay a flat
+    list in group order and groups gives how many of the results are each
+    domain's and, with collapse_counts=true (which costs a full scoring
+    pass), its matching document count. Responses are serialized
+    directly; SearchResponse documents the full shape.
+    profile=true (admins only, rate limited) adds the request's hot
+    functions and stage timeline.
+    """
+    if engine is not None and engine not in ranker.ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine must be one of {', '.join(ranker.ENGINES)}")
+    projection = None
+    if fields:
+        projection = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in projection if name not in ranker.RESULT_FIELDS]
+        if unknown or not projection:
+            raise HTTPException(status_code=400, detail=f"fields must be among {', '.join(ranker.RESULT_FIELDS)}")
+    facet_names = None
+    if facets:
+        facet_names = list(dict.fromkeys(name.strip() for name in facets.split(",") if name.strip()))
+        if not facet_names or any(name not in FACETS for name in facet_names):
+            raise HTTPException(status_code=400, detail=f"facets must be among {', '.join(FACETS)}")
+    if collapse is not None:
+        if collapse not in ranker.COLLAPSE_FIELDS:
+            raise HTTPException(status_code=400,
+                                detail=f"collapse must be one of {', '.join(ranker.COLLAPSE_FIELDS)}")
+        if not 1 <= collapse_size <= 100:
+            raise HTTPException(status_code=400, detail="collapse_size must be between 1 and 100")
+    if profile:
+        authorize_profile(request)
+    params = {"limit": limit, "offset": offset, "explain": explain, "engine": engine, "fields": fields}
+    if facet_names:
+        params["facets"] = facets
+        params["facet_limit"] = facet_limit
+    if collapse is not None:
+        params["collapse"] = collapse
+        params["collapse_size"] = collapse_size
+        params["collapse_counts"] = collapse_counts
+    start_time = time.perf_counter()
+    timeline = Timeline()
     try:
-        start_time = time.perf_counter()
-        results, parsed_query = ranker.query(q, limit=limit, offset=offset, explain=explain)
+        with maybe_profile(profile, timeline) as report:
+            groups = None
+            if collapse is not None:
+                plan = ranker.planner.plan(q, ranker.stats)
+                collapsed, parsed_query = ranker.collapse(
+                    plan, collapse, limit=limit, offset=offset, per_group=collapse_size,
+                    counts=collapse_counts, explain=explain, fields=projection, timeline=timeline
+                )
+                results = [result for group in collapsed for result in group["results"]]
+                groups = [{"value": group["value"], "count": group["count"], "results": len(group["results"])}
+                          for group in collapsed]
+            else:
+                results, parsed_query = ranker.query(
+                    q, limit=limit, offset=offset, explain=explain, engine=engine, fields=projection,
+                    timeline=timeline
+                )
+            facet_counts = None
+            if facet_names:
+                # The plan comes straight from the planner's cache
+                plan = ranker.planner.plan(q, ranker.stats)
+                facet_counts = ranker.facets(plan, facet_names, facet_limit, timeline=timeline)
         elapsed = time.perf_counter() - start_time
+        # Profiled requests are slowed by the profiler, so they stay out of the log
+        if not profile:
+            log_query("/search", q, params, len(results), elapsed, timeline)
 
-        return {
-            "results": [
-                {
-                    "url": res["url"],
-                    "title": res.get("title", ""),
-                    "snippet": res.get("snippet", ""),
-                    "score": res.get("score", 0.0),
-                    "explanation": res.get("explanation")
-                } for res in results
-            ],
+        return Response(dump_json(with_profile({
+            "results": results if projection else format_results(results),
             "query_time": elapsed,
             "total_hits": len(results),
-            "parsed_query": parsed_query
-        }
+            "parsed_query": parsed_query,
+            **({"facets": facet_counts} if facet_counts is not None else {}),
+            **({"groups": groups} if groups is not None else {})
+        }, report)), media_type="application/json")
+    except Exception as e:
+        if not profile:
+            log_query("/search", q, params, 0, time.perf_counter() - start_time, timeline, str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/search/batch", tags=["Search"])
+async def search_batch(request: BatchSearchRequest):
+    """
+    Run many queries in one request.
+
+    Queries are planned up front (duplicates share one plan and the same
+    collection statistics), then executed concurrently on pooled searchers.
+    The response is NDJSON, one line per query in request order, each sent
+    as soon as it and every query before it has finished.
+    """
+    if len(request.queries) > config.QUERY_ENGINE["BATCH_MAX_QUERIES"]:
+        raise HTTPException(status_code=400, detail=f"At most {config.QUERY_ENGINE['BATCH_MAX_QUERIES']} queries per batch")
+
+    query_strings = []
+    for item in request.queries:
+        if item.engine is not None and item.engine not in ranker.ENGINES:
+            raise HTTPException(status_code=400, detail=f"engine must be one of {', '.join(ranker.ENGINES)}")
+        operators = []
+        for key, value in (item.filters or {}).items():
+            if key not in BATCH_FILTERS:
+                raise HTTPException(status_code=400, detail=f"filters must be among {', '.join(BATCH_FILTERS)}")
+            if not value or len(value.split()) != 1:
+                raise HTTPException(status_code=400, detail=f"filter {key} needs a single value")
+            operators.append(f"{key}:{value}")
+        query_strings.append(" ".join([item.q] + operators))
+
+    generation = ranker.stats.generation
+    plans = [ranker.planner.plan(query_str, ranker.stats) for query_str in query_strings]
+
+    def run(index, item, plan, query_str):
+        start_time = time.perf_counter()
+        timeline = Timeline()
+        try:
+            with ranker.searcher_pool.searcher(generation) as searcher:
+                results, parsed_query = ranker.execute(
+                    plan, limit=item.limit, offset=item.offset, engine=item.engine, searcher=searcher,
+                    timeline=timeline
+                )
+            line = {
+                "index": index,
+                "q": item.q,
+                "results": format_results(results),
+                "total_hits": len(results),
+                "parsed_query": parsed_query
+            }
+        except Exception as e:
+            line = {"index": index, "q": item.q, "error": str(e)}
+        line["query_time"] = time.perf_counter() - start_time
+        # Logged with filters folded into q, so replaying it against /search is equivalent
+        log_query("/search/batch", query_str, {"limit": item.limit, "offset": item.offset, "engine": item.engine},
+                  line.get("total_hits", 0), line["query_time"], timeline, line.get("error"))
+        return line
+
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(search_executor, run, index, item, plan, query_str)
+        for index, (item, plan, query_str) in enumerate(zip(request.queries, plans, query_strings))
+    ]
+
+    async def stream():
+        for future in futures:
+            yield dump_json(await future) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/explain/{docnum}", tags=["Search"])
+async def explain_result(docnum: int, q: str):
+    """Score breakdown for a single result, computed on demand"""
+    try:
+        return ranker.explain(docnum, q)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/related", tags=["Search"])
+async def related_documents(url: str, limit: int = 10, exact: bool = False):
+    """
+    Pages similar to the indexed page at url ("more like this"), found
+    through MinHash signatures in an LSH table rather than a query.
+    similarity estimates the Jaccard similarity of the pages' terms;
+    exact=true re-ranks the best candidates by the exact value.
+    """
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    start_time = time.perf_counter()
+    try:
+        results, candidates = ranker.related(url, limit, exact)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"{url} is not indexed")
+    return {
+        "url": url,
+        "results": results,
+        "candidates": candidates,
+        "exact": exact,
+        "query_time": time.perf_counter() - start_time
+    }
+
 @app.get("/autocomplete", tags=["Search"])
 async def autocomplete(prefix: str, limit: int = 5):
     """Autocomplete suggestions endpoint"""
@@ -109,64 +504,417 @@ async def health_check():
         "version": "0.1.0"
     }
 
+@app.get("/ready", tags=["System"])
+async def readiness_check():
+    """Readiness: 503 until startup warmup has finished, for load balancer probes"""
+    status = warmup.status()
+    if not status["ready"]:
+        return Response(dump_json(status), status_code=503, media_type="application/json")
+    return status
+
+@app.get("/metrics", tags=["System"])
+async def get_metrics():
+    """Latency histograms, counters and cache statistics in Prometheus text format"""
+    # This worker's live values replace its own textfile
+    own = (WORKER_TEXTFILE.name,) if WORKER_TEXTFILE is not None else ()
+    body = merge_expositions(metrics.render(), read_textfiles(config.METRICS["TEXTFILE_DIR"], exclude=own))
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+GRAPH_VIEWS = ("full", "top", "ego", "domains")
+GRAPH_FORMATS = ("json", "ndjson", "binary")
+GRAPH_PAGE_SIZE = 10000
+
 @app.get("/graph", tags=["Graph"])
-async def get_graph_data():
-    """Get web graph data for visualization"""
-    try:
-        graph_data = graph_service.build_graph()
-        return graph_data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_graph_data(
+    request: Request,
+    view: str = "full",
+    format: str = "json",
+    offset: int = 0,
+    limit: Optional[int] = None,
+    url: Optional[str] = None,
+    radius: int = 1,
+    direction: str = "both",
+    titles: bool = True,
+    profile: bool = False
+):
+    """
+    Get web graph data for visualization.
+
+    Views:
+
+    - full: every crawled page; with limit, one page of them (and their
+      links to other crawled pages) starting at offset
+    - top: the limit (default 500) pages with the highest PageRank and the
+      links among them
+    - ego: pages within radius links of url, followed out, in or both ways
+    - domains: the graph collapsed to domains, links counted per domain pair
+
+    format is json, ndjson (streamed node and edge lines) or binary (see
+    services/graph_export.py). titles=false leaves full titles out. Without
+    any parameter the full graph is returned as before, including links to
+    pages that were not crawled.
+    """
+    if view not in GRAPH_VIEWS:
+        raise HTTPException(status_code=400, detail=f"view must be one of {', '.join(GRAPH_VIEWS)}")
+    if format not in GRAPH_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(GRAPH_FORMATS)}")
+    if view == "domains" and format != "json":
+        raise HTTPException(status_code=400, detail="The domains view is only available as json")
+    if view == "ego" and (not url or direction not in ("out", "in", "both") or not 0 <= radius <= 3):
+        raise HTTPException(status_code=400, detail="The ego view needs url, radius 0-3 and direction out, in or both")
+    if profile:
+        authorize_profile(request)
+
+    if view == "full" and format == "json" and limit is None and offset == 0:
+        try:
+            with maybe_profile(profile) as report:
+                graph_data = graph_service.build_graph()
+            return with_profile(graph_data, report)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    with maybe_profile(profile) as report:
+        if view == "domains":
+            snapshot = graph_snapshot()
+            return with_profile(dict(snapshot["domain_graph"], snapshot=graph_analytics.status(snapshot)), report)
+
+        graph = graph_service.link_graph()
+        snapshot = graph_analytics.snapshot()
+        pagerank = graph_analytics.pagerank_by_node(graph, snapshot)
+        extra = {"view": view}
+        if view == "full" and format == "ndjson" and limit is None:
+            pages = graph_service.iter_graph_pages(GRAPH_PAGE_SIZE)
+            return StreamingResponse(
+                graph_export.iter_ndjson(graph, pages, pagerank, titles, dump_json),
+                media_type="application/x-ndjson"
+            )
+        if view == "full":
+            nodes, sources, targets, total = graph_service.graph_page(offset, limit or GRAPH_PAGE_SIZE)
+            next_offset = offset + len(nodes)
+            extra.update(offset=offset, total_nodes=total, next_offset=next_offset if next_offset < total else None)
+        elif view == "top":
+            if pagerank is None:
+                snapshot = graph_snapshot()
+                pagerank = graph_analytics.pagerank_by_node(graph, snapshot)
+            nodes, sources, targets = graph_service.top_subgraph(pagerank, 500 if limit is None else limit)
+            extra["snapshot"] = graph_analytics.status(snapshot)
+        else:
+            ego = graph_service.ego_network(url, radius, 500 if limit is None else limit, direction)
+            if ego is None:
+                raise HTTPException(status_code=404, detail=f"{url} is not in the graph")
+            nodes, sources, targets, truncated = ego
+            extra.update(url=url, radius=radius, truncated=truncated)
+
+        if format == "binary":
+            body = graph_export.encode_binary(graph, nodes, sources, targets, pagerank, titles)
+            return Response(body, media_type="application/octet-stream")
+        if format == "ndjson":
+            return StreamingResponse(
+                graph_export.iter_ndjson(graph, [(nodes, sources, targets)], pagerank, titles, dump_json),
+                media_type="application/x-ndjson"
+            )
+        payload = graph_export.to_json(graph, nodes, sources, targets, pagerank, titles)
+    return with_profile(dict(payload, **extra), report)
 
 @app.get("/graph/pagerank", tags=["Graph"])
-async def get_pagerank(iterations: int = 20):
-    """Calculate PageRank for all documents"""
+async def get_pagerank(
+    request: Request,
+    iterations: Optional[int] = None,
+    tol: Optional[float] = None,
+    personalize: Optional[str] = None,
+    profile: bool = False
+):
+    """
+    PageRank for all documents.
+
+    Served from the analytics snapshot unless a parameter is given, in which
+    case it is computed for this request: iterations caps the power
+    iterations, which stop early once scores move by less than tol, and
+    personalize is a comma-separated list of domains the random surfer
+    teleports to.
+    """
+    if profile:
+        authorize_profile(request)
+    if iterations is None and tol is None and not personalize:
+        with maybe_profile(profile) as report:
+            snapshot = graph_snapshot()
+        return with_profile({
+            "pagerank": snapshot["pagerank"]["scores"],
+            "iterations": snapshot["pagerank"]["iterations"],
+            "converged": snapshot["pagerank"]["converged"],
+            "snapshot": graph_analytics.status(snapshot)
+        }, report)
+
+    domains = [d.strip() for d in personalize.split(",") if d.strip()] if personalize else None
+    iterations = 100 if iterations is None else iterations
+    tol = 1e-6 if tol is None else tol
     try:
-        pagerank = graph_service.calculate_pagerank(iterations=iterations)
-        # Return sorted by score
-        sorted_pagerank = sorted(
-            [{"url": url, "score": score} for url, score in pagerank.items()],
-            key=lambda x: x["score"],
-            reverse=True
-        )
-        return {"pagerank": sorted_pagerank}
+        with maybe_profile(profile) as report:
+            result, nodes = graph_service.pagerank(iterations=iterations, tol=tol, domains=domains)
+            urls = graph_service.link_graph().urls
+            # Return sorted by score
+            sorted_pagerank = sorted(
+                [{"url": urls[node], "score": score} for node, score in zip(nodes.tolist(), result.scores.tolist())],
+                key=lambda x: x["score"],
+                reverse=True
+            )
+        return with_profile({
+            "pagerank": sorted_pagerank,
+            "iterations": result.iterations,
+            "converged": result.converged
+        }, report)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/graph/stats", tags=["Graph"])
-async def get_graph_stats():
-    """Get comprehensive graph statistics"""
-    try:
-        stats = graph_service.get_graph_statistics()
-        return stats
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_graph_stats(request: Request, profile: bool = False):
+    """Graph statistics, degree distributions and per-domain link counts from the analytics snapshot"""
+    if profile:
+        authorize_profile(request)
+    with maybe_profile(profile) as report:
+        snapshot = graph_snapshot()
+    return with_profile(dict(
+        snapshot["stats"],
+        degree_distribution=snapshot["degree_distribution"],
+        domain_stats=snapshot["domains"],
+        snapshot=graph_analytics.status(snapshot)
+    ), report)
+
+@app.get("/graph/path", tags=["Graph"])
+async def get_graph_path(
+    request: Request,
+    source: str,
+    target: str,
+    k: int = 1,
+    max_hops: Optional[int] = None,
+    profile: bool = False
+):
+    """
+    Shortest link paths from source to target: up to k loop-free paths,
+    shortest first, none longer than max_hops.
+    """
+    if not 1 <= k <= 20:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 20")
+    if max_hops is not None and max_hops < 0:
+        raise HTTPException(status_code=400, detail="max_hops must not be negative")
+    if profile:
+        authorize_profile(request)
+    with maybe_profile(profile) as report:
+        paths = graph_service.get_paths(source, target, k, max_hops)
+    if paths is None:
+        raise HTTPException(status_code=404, detail="source or target is not in the graph")
+    return with_profile({
+        "source": source,
+        "target": target,
+        "found": bool(paths),
+        "paths": [{"hops": len(path) - 1, "urls": path} for path in paths]
+    }, report)
+
+@app.get("/graph/reachable", tags=["Graph"])
+async def get_graph_reachable(
+    request: Request,
+    url: str,
+    max_hops: int = 2,
+    direction: str = "out",
+    limit: int = 100,
+    profile: bool = False
+):
+    """
+    Pages within max_hops links of url, following links out of it or into
+    it, nearest first, with counts per distance.
+    """
+    if direction not in ("out", "in"):
+        raise HTTPException(status_code=400, detail="direction must be out or in")
+    if not 0 <= max_hops <= 10:
+        raise HTTPException(status_code=400, detail="max_hops must be between 0 and 10")
+    if profile:
+        authorize_profile(request)
+    with maybe_profile(profile) as report:
+        reachable = graph_service.get_reachable(url, max_hops, direction, max(limit, 0))
+    if reachable is None:
+        raise HTTPException(status_code=404, detail=f"{url} is not in the graph")
+    return with_profile(reachable, report)
+
+@app.get("/graph/hits", tags=["Graph"])
+async def get_hits(request: Request, limit: int = 20, profile: bool = False):
+    """Top HITS hubs and authorities from the analytics snapshot"""
+    if profile:
+        authorize_profile(request)
+    with maybe_profile(profile) as report:
+        snapshot = graph_snapshot()
+    hits = snapshot["hits"]
+    return with_profile({
+        "hubs": hits["hubs"][:limit],
+        "authorities": hits["authorities"][:limit],
+        "iterations": hits["iterations"],
+        "converged": hits["converged"],
+        "snapshot": graph_analytics.status(snapshot)
+    }, report)
+
+@app.get("/graph/components", tags=["Graph"])
+async def get_components(request: Request, kind: str = "weak", limit: int = 10, profile: bool = False):
+    """
+    Connected components of the crawled pages from the analytics snapshot.
+    kind is weak (links followed either way) or strong (mutually reachable).
+    """
+    if kind not in ("weak", "strong"):
+        raise HTTPException(status_code=400, detail="kind must be weak or strong")
+    if profile:
+        authorize_profile(request)
+    with maybe_profile(profile) as report:
+        snapshot = graph_snapshot()
+    components = snapshot["components"][kind]
+    return with_profile(dict(components, largest=components["largest"][:limit],
+                             snapshot=graph_analytics.status(snapshot)), report)
+
+@app.get("/graph/domains/graph", tags=["Graph"])
+async def get_domain_graph(request: Request, profile: bool = False):
+    """The link graph collapsed to domains, edges weighted by link count, from the analytics snapshot"""
+    if profile:
+        authorize_profile(request)
+    with maybe_profile(profile) as report:
+        snapshot = graph_snapshot()
+    return with_profile(dict(snapshot["domain_graph"], snapshot=graph_analytics.status(snapshot)), report)
+
+@app.get("/graph/analytics", tags=["Graph"])
+async def get_graph_analytics_status(request: Request, profile: bool = False):
+    """Generation, age and job state of the graph analytics snapshot"""
+    if profile:
+        authorize_profile(request)
+    with maybe_profile(profile) as report:
+        graph_analytics.schedule()
+        status = graph_analytics.status()
+    return with_profile(status, report)
+
+@app.post("/graph/analytics/recompute", tags=["Graph"], status_code=202)
+async def recompute_graph_analytics(request: Request):
+    """Recompute the graph analytics snapshot in the background (admin only)"""
+    require_admin(request, "Recomputing graph analytics")
+    graph_analytics.schedule(force=True)
+    return graph_analytics.status()
 
 @app.get("/graph/domains", tags=["Graph"])
-async def get_domain_clusters():
+async def get_domain_clusters(request: Request, profile: bool = False):
     """Get documents grouped by domain"""
+    if profile:
+        authorize_profile(request)
     try:
-        clusters = graph_service.get_domain_clusters()
-        return {"clusters": clusters}
+        with maybe_profile(profile) as report:
+            clusters = ranker.domain_clusters()
+        return with_profile({"clusters": clusters}, report)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_search(websocket: WebSocket, query_id, q: str, limit: int, received: float,
+                        cancel: threading.Event):
+    """
+    Run one search-as-you-type query and send its stages as they finish:
+    "results" (urls, titles, scores), then "snippets", then "count".
+    Cancelled as soon as a newer query arrives on the same socket.
+    """
+    await asyncio.sleep(config.QUERY_ENGINE["WS_DEBOUNCE_MS"] / 1000)
+
+    loop = asyncio.get_running_loop()
+    messages: asyncio.Queue = asyncio.Queue()
+    ranker.maybe_refresh()
+    plan = ranker.planner.plan(q, ranker.stats)
+    generation = ranker.stats.generation
+
+    def emit(message):
+        loop.call_soon_threadsafe(messages.put_nowait, message)
+
+    def run():
+        try:
+            with ranker.searcher_pool.searcher(generation) as searcher:
+                hits = ranker.search_page(plan, limit=limit, searcher=searcher, cancel=cancel)
+                terms = ranker.highlight_terms(plan, searcher)
+                emit({
+                    "type": "results",
+                    "results": [
+                        {"docnum": hit.docnum, "url": hit["url"], "title": hit.get("title", ""), "score": hit.score}
+                        for hit in hits
+                    ]
+                })
+                snippets = []
+                with query_stage(None, "highlight"):
+                    for hit in hits:
+                        if cancel.is_set():
+                            raise SearchCancelled()
+                        snippets.append({"docnum": hit.docnum, "snippet": ranker.snippet(hit, terms)})
+                emit({"type": "snippets", "snippets": snippets})
+                emit({"type": "count", "total_hits": ranker.count(plan, searcher, cancel)})
+        except SearchCancelled:
+            pass
+        except Exception as e:
+            emit({"type": "error", "detail": str(e)})
+        finally:
+            emit(None)
+
+    loop.run_in_executor(search_executor, run)
+    while True:
+        message = await messages.get()
+        if message is None:
+            break
+        message.update({
+            "id": query_id,
+            "q": q,
+            "latency_ms": round((time.perf_counter() - received) * 1000, 2)
+        })
+        await websocket.send_json(message)
+
 @app.websocket("/ws/search")
 async def websocket_search(websocket: WebSocket):
+    """
+    Search-as-you-type.
+
+    Clients send the current input as plain text or as JSON
+    {"q": ..., "limit": ..., "id": ...}. Input is debounced on the server
+    and a new message cancels the query still running for the previous
+    one. Each query answers with "results", "snippets" and "count"
+    messages tagged with its id and the latency since it was received.
+    """
     await websocket.accept()
+    current = None
+    sequence = 0
     try:
         while True:
-            query = await websocket.receive_text()
-            results = ranker.query(query, limit=5)
-            await websocket.send_json({
-                "results": [
-                    {"url": res["url"], "title": res.get("title", "")}
-                    for res in results
-                ]
-            })
+            text = await websocket.receive_text()
+            received = time.perf_counter()
+            sequence += 1
+
+            try:
+                message = json.loads(text)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                message = {"q": text}
+
+            if current is not None:
+                task, cancel = current
+                cancel.set()
+                task.cancel()
+                current = None
+
+            q = str(message.get("q", "")).strip()
+            if not q:
+                continue
+            try:
+                limit = max(1, min(int(message.get("limit", 5)), 50))
+            except (TypeError, ValueError):
+                limit = 5
+
+            cancel = threading.Event()
+            task = asyncio.create_task(
+                stream_search(websocket, message.get("id", sequence), q, limit, received, cancel)
+            )
+            current = (task, cancel)
     except WebSocketDisconnect:
+        if current is not None:
+            current[1].set()
+            current[0].cancel()
         print("Client disconnected")
 
 if __name__ == "__main__":
+    # A single process; python -m query_engine.app.serve runs several workers
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host=config.QUERY_ENGINE["HOST"], port=config.QUERY_ENGINE["PORT"])
\ No newline at end of file
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from whoosh.query import And, Or, Term, Phrase, Every, NullQuery
+
+from .collection_stats import CollectionStats
+
+ADVANCED_OPERATORS = ['site:', 'filetype:', 'intitle:', 'inurl:', 'daterange:', '"', '-']
+
+
+class QueryPlan:
+    """
+    Executable form of a query string.
+
+    The scoring query only contains clauses that contribute to the score,
+    ordered rarest first. Everything else is a filter spec: ``filters`` are
+    docnum sets a hit must be in, ``restrictions`` are sets it must not be in.
+    """
+
+    def __init__(self, query, filters: List[Tuple[str, Any]], restrictions: List[Tuple[str, Any]],
+                 parsed: Optional[Dict[str, Any]] = None, clauses: Optional[List[Dict[str, Any]]] = None):
+        self.query = query
+        self.filters = filters
+        self.restrictions = restrictions
+        self.parsed = parsed
+        self.clauses = clauses or []
+
+
+class QueryPlanner:
+    """
+    Turns query strings into QueryPlans, using collection statistics to
+    estimate how selective each clause is.
+
+    Plans are memoized in an LRU keyed by the whitespace-normalized query
+    string and dropped whenever the index generation changes, since the
+    estimates depend on document frequencies.
+    """
+
+    def __init__(self, query_parser, advanced_parser, max_plans: int = 1024):
+        self.query_parser = query_parser
+        self.advanced_parser = advanced_parser
+        self.max_plans = max_plans
+        self._plans: "OrderedDict[Tuple[str, bool], QueryPlan]" = OrderedDict()
+        self._generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._plans)
+
+    def plan(self, query_str: str, stats: CollectionStats, use_advanced: bool = True) -> QueryPlan:
+        if stats.generation != self._generation:
+            self._plans.clear()
+            self._generation = stats.generation
+
+        key = (' '.join(query_str.split()), use_advanced)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+            self.hits += 1
+            return plan
+
+        self.misses += 1
+        plan = self._build_plan(key[0], stats, use_advanced)
+        self._plans[key] = plan
+        while len(self._plans) > self.max_plans:
+            self._plans.popitem(last=False)
+        return plan
+
+    def _build_plan(self, query_str: str, stats: CollectionStats, use_advanced: bool) -> QueryPlan:
+        has_operators = any(op in query_str.lower() for op in ADVANCED_OPERATORS)
+        if not (use_advanced and has_operators):
+            query = self.query_parser.parse(query_str)
+            clauses = self._order_clauses(self._split_conjunction(query), stats)
+            return QueryPlan(self._combine(clauses), [], [], None, self._describe(clauses))
+
+        parser = self.advanced_parser
+        parsed = parser.parse(query_str)
+
+        # Scoring clauses: free text and intitle:
+        scoring = []
+        if parsed['base_terms']:
+            try:
+                scoring.extend(self._split_conjunction(parser.base_parser.parse(' '.join(parsed['base_terms']))))
+            except:
+                pass
+        if parsed['intitle']:
+            title_query = parser.build_title_query(parsed['intitle'])
+            if title_query is not None:
+                scoring.extend(self._split_conjunction(title_query))
+
+        # Phrases only decide membership, so they join the filter mask
+        filters = parser.build_filters(parsed)
+        for phrase in parsed['exact_phrases']:
+            phrase_query = parser.build_phrase_query(phrase)
+            if phrase_query is None:
+                # Only stopwords, which are not indexed, so nothing can match
+                filters.append((f'phrase:{" ".join(phrase.lower().split())}', NullQuery))
+            else:
+                filters.append((f'phrase:{" ".join(phrase_query.words)}', phrase_query))
+
+        restrictions = []
+        excluded = sorted({term.lower() for term in parsed['excluded_terms']})
+        if excluded:
+            restrictions.append((f'exclude:{",".join(excluded)}', Or([Term('content', t) for t in excluded])))
+
+        # A phrase-only query still needs something to rank by
+        if not scoring and parsed['exact_phrases']:
+            try:
+                scoring.extend(self._split_conjunction(parser.base_parser.parse(' '.join(parsed['exact_phrases']))))
+            except:
+                pass
+
+        clauses = self._order_clauses(scoring, stats)
+        query = self._combine(clauses) if clauses else Every()
+        return QueryPlan(query, filters, restrictions, parsed, self._describe(clauses))
+
+    def _split_conjunction(self, query) -> List[Any]:
+        query = query.normalize()
+        if query is NullQuery:
+            return []
+        if isinstance(query, And):
+            return list(query.subqueries)
+        return [query]
+
+    def _order_clauses(self, clauses: List[Any], stats: CollectionStats) -> List[Tuple[int, Any]]:
+        """Pair each clause with its estimated match count, rarest first"""
+        estimated = [(self._estimate(clause, stats), clause) for clause in clauses]
+        estimated.sort(key=lambda pair: pair[0])
+        return estimated
+
+    def _estimate(self, query, stats: CollectionStats) -> int:
+        """Upper bound on the number of documents a clause can match"""
+        if isinstance(query, Term):
+            return stats.doc_frequency(query.fieldname, query.text)
+        if isinstance(query, And):
+            return min((self._estimate(q, stats) for q in query.subqueries), default=0)
+        if isinstance(query, Or):
+            return min(stats.doc_count_all, sum(self._estimate(q, stats) for q in query.subqueries))
+        if isinstance(query, Phrase):
+            return min((stats.doc_frequency(query.fieldname, w) for w in query.words), default=0)
+        # Prefix, wildcard and fuzzy clauses could match anything
+        return stats.doc_count_all
+
+    def _combine(self, clauses: List[Tuple[int, Any]]):
+        if not clauses:
+            return NullQuery
+        if len(clauses) == 1:
+            return clauses[0][1]
+        return And([clause for _, clause in clauses])
+
+    def _describe(self, clauses: List[Tuple[int, Any]]) -> List[Dict[str, Any]]:
+        return [{'clause': str(clause), 'estimated_hits': estimate} for estimate, clause in clauses]
@@ -1,89 +1,540 @@
 import os
-from whoosh.index import open_dir
+import time
+from contextlib import contextmanager
+from whoosh.filedb.filestore import FileStorage
 from whoosh.qparser import MultifieldParser, FuzzyTermPlugin, PrefixPlugin
-from whoosh.highlight import ContextFragmenter, HtmlFormatter
-from whoosh.scoring import BM25F
-from whoosh import sorting
+from whoosh.highlight import Highlighter, PinpointFragmenter, HtmlFormatter
+from whoosh.collectors import FilterCollector, TermsCollector, TopCollector
+from whoosh.query import NullQuery
 from .explainer import SearchExplainer
+from .collection_stats import CollectionStats
+from .collectors import TermScoreCollector, CancellableCollector, CollapseCollector, SearchCancelled, term_text
+from .filters import FilterCache
+from .facets import ColumnCache, count_facets
+from .planner import QueryPlanner
+from .dynamic_pruning import MaxScoreEngine
+from .impact_index import ImpactIndex
+from .static_rank import StaticRankBM25F, StaticRankUpdater
+from .searcher_pool import SearcherPool
+from .snippets import SnippetCache
 from .advanced_parser import AdvancedQueryParser
 
+try:
+    from services.metrics import metrics, active_timeline
+    from services.similarity_index import SimilarityIndex, term_set, jaccard
+except ImportError:
+    from backend.services.metrics import metrics, active_timeline
+    from backend.services.similarity_index import SimilarityIndex, term_set, jaccard
+
+QUERY_STAGE_SECONDS = metrics.histogram(
+    "nayuta_query_stage_seconds", "Time spent in each stage of a search query", ("stage",)
+)
+QUERIES = metrics.counter("nayuta_queries_total", "Queries executed, by the engine that answered", ("engine",))
+AUTOCOMPLETE_SECONDS = metrics.histogram("nayuta_autocomplete_seconds", "Autocomplete lookup latency")
+
+
+def record_stage(timeline, stage, seconds, start=None):
+    """Observe a stage duration, also adding it to the request's Timeline if there is one"""
+    QUERY_STAGE_SECONDS.observe(seconds, stage=stage)
+    timeline = timeline if timeline is not None else active_timeline()
+    if timeline is not None:
+        timeline.add(stage, seconds, None if start is None else start - timeline.start)
+
+
+@contextmanager
+def query_stage(timeline, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(timeline, stage, time.perf_counter() - start, start)
+
+
 class BM25Ranker:
-    def __init__(self, index_path):
+    # "whoosh" runs Whoosh's collector; "maxscore" uses block-max MaxScore
+    # and "impact" exhaustive NumPy scoring for plain keyword queries, both
+    # over the impact index and falling back to Whoosh for everything else
+    ENGINES = ("whoosh", "maxscore", "impact")
+    # Keys of a formatted result, and the values accepted by fields=
+    RESULT_FIELDS = ("docnum", "url", "title", "snippet", "score", "explanation")
+    # Columns results can be collapsed on
+    COLLAPSE_FIELDS = ("domain",)
+    # How often maybe_refresh() looks for a new index generation
+    REFRESH_SECONDS = 1.0
+
+    def __init__(self, index_path, engine="whoosh", impact_path=None, pool_size=4):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown retrieval engine: {engine}")
         self.index_path = index_path
+        self.engine = engine
         self.index = self._open_index()
-        self.searcher = self.index.searcher(weighting=BM25F)
+        # BM25F plus an optional per-hit static rank blend
+        self.weighting = StaticRankBM25F()
+        self.searcher = self.index.searcher(weighting=self.weighting)
+        # The searcher replaced by the last refresh, closed by the next one
+        self._retired = None
+        self._refresh_checked = time.monotonic()
+        # Extra searchers for queries run concurrently off the main thread
+        self.searcher_pool = SearcherPool(self.index, self.weighting, pool_size)
         self.query_parser = MultifieldParser(["title", "content"], schema=self.index.schema)
         self.advanced_parser = AdvancedQueryParser(self.index.schema)
-        self.explainer = SearchExplainer(self.searcher, self.index)
+        self.stats = CollectionStats(self.searcher)
+        self.explainer = SearchExplainer(self.searcher, self.index, self.stats)
+        self.filter_cache = FilterCache()
+        self.column_cache = ColumnCache()
+        self.planner = QueryPlanner(self.query_parser, self.advanced_parser)
+        # Builds fragments from the character offsets stored in the content
+        # postings instead of re-analyzing each hit's text
+        self.fragmenter = PinpointFragmenter(maxchars=200, surround=20, autotrim=True)
+        self.snippet_cache = SnippetCache()
+        # Side files shared by every worker serving this index
+        self.impact_path = impact_path or str(index_path).rstrip("/\\") + ".impact"
+        self.impact = None
+        self.maxscore = None
+        if engine != "whoosh":
+            self._impact_index()
+        # MinHash signatures for related(), kept up to date segment by segment
+        self.similarity_path = str(index_path).rstrip("/\\") + ".lsh"
+        self.similarity = None
+        self.static_rank_path = str(index_path).rstrip("/\\") + ".static"
+        self.static_rank = None
+        self.static_rank_updater = None
         self._setup_autocomplete()
 
     def _open_index(self):
         if not os.path.exists(self.index_path):
             raise FileNotFoundError(f"Whoosh index not found at {self.index_path}")
-        return open_dir(self.index_path)
+        # Compound segment files are mapped rather than read, so pages are
+        # loaded on demand and shared with other processes serving the index
+        return FileStorage(str(self.index_path), supports_mmap=True).open_index()
+
+    def maybe_refresh(self):
+        """refresh(), at most once every REFRESH_SECONDS; called as requests start"""
+        now = time.monotonic()
+        if now - self._refresh_checked < self.REFRESH_SECONDS:
+            return False
+        self._refresh_checked = now
+        return self.refresh()
+
+    def refresh(self):
+        """
+        Move the main searcher (and everything derived from it, static rank
+        included) to the index's newest generation, if there is one, and
+        start blending static scores published since the last call.
+
+        The main searcher is only used by requests running on the event
+        loop, one at a time, so call this from there between requests;
+        concurrent work borrows searchers from searcher_pool. The old
+        searcher is not refreshed in place, which would close the segment
+        readers the new one does not reuse, but kept open until the next
+        refresh in case anything still holds it.
+        """
+        if self.searcher.up_to_date():
+            self._apply_static_rank()
+            return False
+        if self._retired is not None:
+            self._retired.close()
+        self._retired = self.searcher
+        self.searcher = self.index.searcher(weighting=self.weighting)
+        self.stats = CollectionStats(self.searcher)
+        self.explainer = SearchExplainer(self.searcher, self.index, self.stats)
+        if self.impact is not None:
+            self.impact = None
+            self._impact_index()
+        self._apply_static_rank()
+        if self.static_rank_updater is not None:
+            self.static_rank_updater.schedule()
+        return True
+
+    def enable_static_rank(self, compute_pagerank, weight, formula="log", loader=None):
+        """
+        Blend query-independent scores into ranking.
+
+        Scores are computed in the background from compute_pagerank() (a
+        mapping of URL to PageRank) and recomputed whenever the index moves
+        to a new generation. Until they are ready, ranking is plain BM25F;
+        once they are, the next refresh() starts blending them.
+        They are shared through ``<index>.static/``; with a loader lock,
+        workers that do not hold it attach to the scores the loader saved.
+        """
+        self.static_rank_updater = StaticRankUpdater(
+            self.index, compute_pagerank, self._publish_static_rank, weight, formula,
+            path=self.static_rank_path, loader=loader
+        )
+        self.static_rank_updater.schedule()
+
+    def _publish_static_rank(self, static_rank):
+        # Runs on the updater's thread, so only hand the scores over; the
+        # weighting searches share is swapped in refresh(), between requests
+        self.static_rank = static_rank
+
+    def _apply_static_rank(self):
+        # Static scores are docnum-aligned, so only use them for their own generation
+        static_rank = self.static_rank
+        if static_rank is not None and static_rank.generation == self.stats.generation:
+            self.weighting.static_rank = static_rank
+        else:
+            self.weighting.static_rank = None
+
+    def _impact_index(self):
+        """The impact index for the current generation, built on first use"""
+        if self.impact is None or self.impact.generation != self.stats.generation:
+            self.impact = ImpactIndex.open_or_build(self.searcher, self.impact_path)
+        return self.impact
+
+    def _maxscore(self, impact):
+        """The MaxScore engine over an impact index"""
+        maxscore = self.maxscore
+        if maxscore is None or maxscore.impact is not impact:
+            self.maxscore = maxscore = MaxScoreEngine(impact)
+        return maxscore
+
+    def _similarity_index(self):
+        """The similarity index for the current generation, building signatures for new segments"""
+        if self.similarity is None or self.similarity.generation != self.stats.generation:
+            self.similarity = SimilarityIndex.open_or_build(self.searcher, self.similarity_path, self.similarity)
+        return self.similarity
+
+    def related(self, url, limit=10, exact=False, candidates=50, timeline=None):
+        """
+        Documents similar to the indexed page at url, best first, looked up
+        in the LSH index rather than by running a query.
+
+        Similarity is the Jaccard similarity of the pages' title and
+        content terms, estimated from MinHash signatures. With exact, the
+        best candidates by estimate (at least candidates of them) are
+        re-ranked by their exact similarity, computed from stored fields.
+
+        Returns:
+            (list of {"docnum", "url", "title", "similarity"}, number of
+            documents sharing an LSH bucket with the page)
+
+        Raises:
+            KeyError: If url is not indexed
+        """
+        searcher = self.searcher
+        docnum = searcher.document_number(url=url)
+        if docnum is None:
+            raise KeyError(url)
+
+        with query_stage(timeline, "related"):
+            index = self._similarity_index()
+            neighbours, considered = index.neighbours(
+                searcher.reader(), docnum, max(limit, candidates) if exact else limit
+            )
+            if exact:
+                schema = searcher.schema
+                source = term_set(schema, searcher.stored_fields(docnum))
+                scored = [(candidate, jaccard(source, term_set(schema, searcher.stored_fields(candidate))))
+                          for candidate, _ in neighbours]
+                neighbours = sorted(scored, key=lambda pair: (-pair[1], pair[0]))[:limit]
+
+        with query_stage(timeline, "format"):
+            results = []
+            for candidate, similarity in neighbours:
+                stored = searcher.stored_fields(candidate)
+                results.append({
+                    "docnum": candidate,
+                    "url": stored.get("url", ""),
+                    "title": stored.get("title", ""),
+                    "similarity": similarity
+                })
+        return results, considered
 
     def _setup_autocomplete(self):
         self.query_parser.add_plugin(PrefixPlugin())
         self.query_parser.add_plugin(FuzzyTermPlugin())
 
-    def query(self, query_str, limit=10, offset=0, explain=False, use_advanced=True):
-        # Check if query contains advanced operators
-        has_operators = any(op in query_str.lower() for op in ['site:', 'filetype:', 'intitle:', 'inurl:', 'daterange:', '"', '-'])
+    def query(self, query_str, limit=10, offset=0, explain=False, use_advanced=True, engine=None, fields=None,
+              timeline=None):
+        with query_stage(timeline, "plan"):
+            plan = self.planner.plan(query_str, self.stats, use_advanced)
+        return self.execute(plan, limit, offset, explain, engine, fields=fields, timeline=timeline)
 
-        if use_advanced and has_operators:
-            # Use advanced parser
-            parsed_dict, parsed_query = self.advanced_parser.parse_and_build(query_str)
-        else:
-            # Use simple parser
-            parsed_query = self.query_parser.parse(query_str)
-            parsed_dict = None
-
-        results = self.searcher.search(
-            parsed_query,
-            limit=limit + offset,  # Get more results to handle offset
-            terms=True,
-            scored=True,
-            sortedby=sorting.ScoreFacet()
-        )
+    def execute(self, plan, limit=10, offset=0, explain=False, engine=None, searcher=None, cancel=None,
+                fields=None, timeline=None):
+        """
+        Run a QueryPlan and format a page of results.
+
+        Planning touches shared caches and should stay on one thread; pass
+        a searcher borrowed from searcher_pool to execute plans concurrently
+        (explanations need the main searcher). Setting the optional cancel
+        event aborts collection with SearchCancelled. fields limits each
+        result to those RESULT_FIELDS, skipping the work for the rest.
+        Stage durations go to the metrics registry and, if given, to the
+        request's Timeline.
+        """
+        explain = explain and (fields is None or "explanation" in fields)
+        with query_stage(timeline, "search"):
+            results, term_scores = self._search(plan, limit + offset, explain, engine, searcher, cancel)
+        results.highlighter = self.highlighter()
 
         # Manually handle offset by slicing results
         results = results[offset:offset + limit] if offset > 0 else results[:limit]
 
-        # Extract query terms for explanation
-        query_terms = self._extract_query_terms(query_str)
+        terms = self.highlight_terms(plan, searcher) if fields is None or "snippet" in fields else None
+        formatted = self._format_results(results, term_scores, explain, offset, fields, terms, timeline)
+        return formatted, plan.parsed
+
+    def collapse(self, plan, field="domain", limit=10, offset=0, per_group=1, counts=False, explain=False,
+                 searcher=None, cancel=None, fields=None, timeline=None):
+        """
+        Run a QueryPlan keeping only the best per_group hits for each value
+        of field (one of COLLAPSE_FIELDS), e.g. one result per domain.
+
+        limit and offset count groups. Groups and their hits are collected
+        inside the Whoosh collector in one pass over the matches, so pages
+        are never over-fetched; with one hit per group it skips blocks like
+        a top-k search. counts=True adds each group's exact number of
+        matching documents, which needs every match scored. The retrieval
+        engine is always Whoosh.
+
+        Returns:
+            (groups, parsed query) where each group is {"value", "count",
+            "results"}, count being every matching document with that
+            value (None without counts), best group first
+        """
+        if field not in self.COLLAPSE_FIELDS:
+            raise ValueError(f"Cannot collapse on {field}")
+        searcher = searcher or self.searcher
+        explain = explain and (fields is None or "explanation" in fields)
+        with query_stage(timeline, "search"):
+            results, term_scores = self._search(plan, limit + offset, explain, "whoosh", searcher, cancel,
+                                                collapse=(field, per_group, counts))
+        results.highlighter = self.highlighter()
+
+        groups = results.groups[offset:offset + limit]
+        start = sum(len(group.hits) for group in results.groups[:offset])
+        page = results[start:start + sum(len(group.hits) for group in groups)]
+        terms = self.highlight_terms(plan, searcher) if fields is None or "snippet" in fields else None
+        formatted = self._format_results(page, term_scores, explain, start, fields, terms, timeline)
+
+        values = self.column_cache.column(searcher, field).values
+        collapsed = []
+        for group in groups:
+            collapsed.append({
+                "value": values[group.key] if group.key >= 0 else None,
+                "count": group.count,
+                "results": formatted[:len(group.hits)]
+            })
+            formatted = formatted[len(group.hits):]
+        return collapsed, plan.parsed
+
+    def search_page(self, plan, limit=10, offset=0, engine=None, searcher=None, cancel=None):
+        """Run a QueryPlan and return the page of Hits without formatting them"""
+        with query_stage(None, "search"):
+            results, _ = self._search(plan, limit + offset, False, engine, searcher, cancel)
+        results.highlighter = self.highlighter()
+        return results[offset:offset + limit]
+
+    def highlight_terms(self, plan, searcher=None):
+        """Snippet cache key for a plan: its generation and content terms"""
+        reader = (searcher or self.searcher).reader()
+        terms = set()
+        for leaf in plan.query.leaves():
+            for fieldname, text in leaf.expanded_terms(reader, phrases=True):
+                if fieldname == "content":
+                    terms.add(term_text(text))
+        return reader.generation(), tuple(sorted(terms))
+
+    def count(self, plan, searcher=None, cancel=None):
+        """Exact number of documents matching a plan, filters included"""
+        total = 0
+        with query_stage(None, "count"):
+            for _ in self._matching_docs(plan, searcher or self.searcher, cancel):
+                total += 1
+        return total
+
+    def facets(self, plan, names, limit=10, searcher=None, cancel=None, timeline=None):
+        """
+        Count facet values (see facets.FACETS) over every document matching
+        a plan, filters included. Values come from cached per-segment
+        columns, so no stored field is read.
+
+        Returns:
+            Dictionary mapping each facet to a list of {"value", "count"}
+        """
+        searcher = searcher or self.searcher
+        with query_stage(timeline, "facets"):
+            columns = {name: self.column_cache.column(searcher, name) for name in names}
+            return count_facets(columns, self._matching_docs(plan, searcher, cancel), limit)
+
+    def _matching_docs(self, plan, searcher, cancel=None):
+        """Docnums matching a plan and its filters, unscored"""
+        allow = self.filter_cache.mask_for(searcher, plan.filters)
+        restrict = self.filter_cache.mask_for(searcher, plan.restrictions)
+        for i, docnum in enumerate(searcher.docs_for_query(plan.query)):
+            if cancel is not None and not i % 1024 and cancel.is_set():
+                raise SearchCancelled()
+            if allow is not None and docnum not in allow:
+                continue
+            if restrict is not None and docnum in restrict:
+                continue
+            yield docnum
+
+    def domain_clusters(self, searcher=None):
+        """URLs of every live document grouped by domain, from the url and domain columns"""
+        searcher = searcher or self.searcher
+        domains = self.column_cache.column(searcher, "domain")
+        urls = self.column_cache.column(searcher, "url")
+        clusters = {}
+        for docnum in searcher.reader().all_doc_ids():
+            domain, url = domains.ordinals[docnum], urls.ordinals[docnum]
+            if domain >= 0 and url >= 0:
+                clusters.setdefault(domains.values[domain], []).append(urls.values[url])
+        return clusters
+
+    def _search(self, plan, limit, explain=False, engine=None, searcher=None, cancel=None, collapse=None):
+        """
+        Run a plan and return (Results, captured term scores). collapse is
+        an optional (column, hits per group, counts) triple; limit then
+        counts groups.
+        """
+        searcher = searcher or self.searcher
+        pooled = searcher is not self.searcher
+        engine = engine or self.engine
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown retrieval engine: {engine}")
 
-        return self._format_results(results, query_terms, explain), parsed_dict
+        # Explanations need the Whoosh matcher; filters need its collector
+        static_rank = self.weighting.static_rank
+        # The impact index and static rank are aligned with the docnums of
+        # stats.generation; a pooled searcher that could not be pinned to it
+        # gets plain Whoosh scoring (StaticRankBM25F skips the blend too)
+        aligned = not pooled or searcher.reader().generation() == self.stats.generation
+        if not aligned:
+            static_rank = None
+        if aligned and not explain and not collapse and not plan.filters and not plan.restrictions:
+            if engine != "whoosh":
+                impact = self.impact if pooled else self._impact_index()
+                if impact is not None and impact.generation == self.stats.generation \
+                        and impact.supports(plan.query):
+                    QUERIES.inc(engine=engine)
+                    if engine == "maxscore":
+                        return self._maxscore(impact).search(plan.query, limit, static_rank, searcher), {}
+                    return impact.search(plan.query, limit, static_rank, searcher), {}
 
-    def _format_results(self, results, query_terms, explain=False):
+        parsed_query = plan.query
+
+        # Non-scoring constraints become cached docnum masks
+        allow = self.filter_cache.mask_for(searcher, plan.filters)
+        restrict = self.filter_cache.mask_for(searcher, plan.restrictions)
+        if allow is not None and len(allow) == 0:
+            parsed_query = NullQuery
+
+        if collapse:
+            field, per_group, counts = collapse
+            column = self.column_cache.column(searcher, field)
+            collector = CollapseCollector(column.ordinals, len(column.values), limit, per_group, counts)
+        elif static_rank is not None:
+            # TopCollector replaces the matcher, dropping subqueries that
+            # cannot reach the k-th score; blended scores make that unsafe
+            collector = TopCollector(limit=limit, replace=0)
+        else:
+            collector = searcher.collector(limit=limit, scored=True)
+        # CollapseCollector records matched terms itself, for kept hits only
+        collector = self._wrap_collector(collector, explain, cancel, allow, restrict, terms=not collapse)
+        QUERIES.inc(engine="whoosh")
+        searcher.search_with_collector(parsed_query, collector)
+        results = collector.results()
+        return results, getattr(results, "term_scores", {})
+
+    @staticmethod
+    def _wrap_collector(collector, explain, cancel, allow, restrict, terms=True):
+        if cancel is not None:
+            collector = CancellableCollector(collector, cancel)
+        if explain:
+            # Capture per-term scores as the matcher computes them
+            collector = TermScoreCollector(collector)
+        elif terms:
+            collector = TermsCollector(collector)
+        if allow or restrict:
+            # Filtering wraps last so it sees the docs first
+            collector = FilterCollector(collector, allow or None, restrict or None)
+        return collector
+
+    def explain(self, docnum, query_str, use_advanced=True):
+        """Compute the score breakdown for one document on demand"""
+        if not 0 <= docnum < self.stats.doc_count_all or self.searcher.reader().is_deleted(docnum):
+            raise KeyError(f"Document {docnum} not found")
+        plan = self.planner.plan(query_str, self.stats, use_advanced)
+        explanation = self.explainer.explain_document(docnum, plan.query)
+        explanation["url"] = self.searcher.stored_fields(docnum).get("url", "")
+        return explanation
+
+    def _format_results(self, results, term_scores, explain=False, offset=0, fields=None, terms=None,
+                        timeline=None):
+        # Snippets (highlighting) and explanations dominate formatting cost,
+        # so they are timed as stages of their own
+        with_snippet = fields is None or "snippet" in fields
+        start = time.perf_counter()
+        highlight_seconds = explain_seconds = 0.0
         formatted = []
-        for position, hit in enumerate(results, 1):
-            snippet = hit.highlights("content", top=1)
+        for position, hit in enumerate(results, offset + 1):
+            snippet = None
+            if with_snippet:
+                snippet_start = time.perf_counter()
+                snippet = self.snippet(hit, terms)
+                highlight_seconds += time.perf_counter() - snippet_start
+
             result_data = {
+                "docnum": hit.docnum,
                 "url": hit["url"],
                 "title": hit.get("title", ""),
-                "snippet": snippet if snippet else self._generate_snippet(hit["content"]),
+                "snippet": snippet,
                 "score": hit.score
             }
 
             # Add explanation if requested
             if explain:
+                explain_start = time.perf_counter()
                 result_data["explanation"] = self.explainer.explain_result(
-                    hit, query_terms, position
+                    hit, position, term_scores.get(hit.docnum, [])
                 )
+                explain_seconds += time.perf_counter() - explain_start
 
+            if fields is not None:
+                result_data = {key: result_data[key] for key in fields if key in result_data}
             formatted.append(result_data)
+
+        total_seconds = time.perf_counter() - start
+        if with_snippet:
+            record_stage(timeline, "highlight", highlight_seconds, start)
+        if explain:
+            record_stage(timeline, "explain", explain_seconds, start)
+        record_stage(timeline, "format", total_seconds - highlight_seconds - explain_seconds, start)
         return formatted
 
-    def _extract_query_terms(self, query_str):
-        """Extract individual terms from query string"""
-        # Simple tokenization - split on whitespace and remove special chars
-        terms = query_str.lower().split()
-        # Remove common operators and punctuation
-        cleaned_terms = [
-            term.strip('*"()[]{}') for term in terms
-            if term not in ['and', 'or', 'not', 'to']
-        ]
-        return [t for t in cleaned_terms if len(t) > 0]
+    def highlighter(self):
+        """
+        A Highlighter for one result set. HtmlFormatter numbers terms
+        (``term0``, ``term1``, ...) in a dict that grows as it formats, so
+        formatters are never shared between requests or threads.
+        """
+        return Highlighter(fragmenter=self.fragmenter, formatter=HtmlFormatter(tagname="b"))
+
+    def snippet(self, hit, terms=None):
+        """
+        Highlighted fragment of a hit's content, or its opening text.
+
+        Pass highlight_terms() for the hit's plan to use the snippet cache.
+        """
+        key = None
+        if terms is not None:
+            generation, words = terms
+            key = (generation, hit.docnum, words)
+            cached = self.snippet_cache.get(key)
+            if cached is not None:
+                return cached
+
+        # Number terms per snippet, so its markup depends only on the hit and
+        # the terms, like its cache key
+        hit.results.highlighter.formatter.clean()
+        snippet = hit.highlights("content", top=1)
+        snippet = snippet if snippet else self._generate_snippet(hit["content"])
+        if key is not None:
+            self.snippet_cache.put(key, snippet)
+        return snippet
 
     def _generate_snippet(self, content, max_length=150):
         if not content:
@@ -91,21 +542,40 @@ class BM25Ranker:
         clean_content = ' '.join(content.split())
         return (clean_content[:max_length] + '...') if len(clean_content) > max_length else clean_content
 
+    @AUTOCOMPLETE_SECONDS.timed()
     def autocomplete(self, prefix, limit=5):
-        with self.index.reader() as reader:
-            terms = []
-            for term in reader.terms("content"):
-                if term[1].startswith(prefix.lower()):
-                    terms.append(term[1])
-                    if len(terms) >= limit:
-                        break
-            return terms
+        # Seek straight to the prefix in the open searcher's term dictionary
+        # instead of opening a reader and scanning every term
+        terms = []
+        for term in self.searcher.reader().expand_prefix("content", prefix.lower()):
+            terms.append(term_text(term))
+            if len(terms) >= limit:
+                break
+        return terms
 
     def index_size(self):
-        return self.searcher.doc_count()
+        return self.stats.doc_count
+
+    def cache_metrics(self):
+        """Hit, miss and size samples of the ranker's caches, for the metrics registry"""
+        caches = {"plan": self.planner, "filter": self.filter_cache, "snippet": self.snippet_cache,
+                  "column": self.column_cache}
+        return [
+            ("nayuta_cache_hits_total", "counter", "Lookups answered from the cache",
+             [({"cache": name}, cache.hits) for name, cache in caches.items()]),
+            ("nayuta_cache_misses_total", "counter", "Lookups that missed the cache",
+             [({"cache": name}, cache.misses) for name, cache in caches.items()]),
+            ("nayuta_cache_entries", "gauge", "Entries currently held by the cache",
+             [({"cache": name}, len(cache)) for name, cache in caches.items()]),
+        ]
 
     def close(self):
+        if self.static_rank_updater is not None:
+            self.static_rank_updater.stop()
+        self.searcher_pool.close()
         self.searcher.close()
+        if self._retired is not None:
+            self._retired.close()
 
 if __name__ == "__main__":
     ranker = BM25Ranker("../indexer/whoosh_index")
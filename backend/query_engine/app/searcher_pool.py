@@ -0,0 +1,75 @@
+import queue
+import threading
+from contextlib import contextmanager
+from whoosh.index import TOC
+from whoosh.searching import Searcher
+
+
+class SearcherPool:
+    """
+    A fixed number of independent searchers over one index.
+
+    Whoosh searchers keep file positions and caches that must not be shared
+    between threads, so each concurrent query borrows its own searcher.
+    Searchers are opened lazily, share the ranker's weighting model, and are
+    moved to the requested generation when borrowed; once a newer commit
+    has cleaned that generation's files up, they move to the newest one
+    instead, so callers should check the generation they got.
+    """
+
+    def __init__(self, index, weighting, size: int = 4):
+        self.index = index
+        self.weighting = weighting
+        self.size = size
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def searcher(self, generation=None):
+        """Borrow a searcher, blocking while all of them are in use"""
+        searcher = self._acquire()
+        try:
+            if generation is not None and searcher.reader().generation() != generation:
+                searcher = self._move(searcher, generation)
+            yield searcher
+        finally:
+            self._idle.put(searcher)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return self.index.searcher(weighting=self.weighting)
+        return self._idle.get()
+
+    def _move(self, searcher, generation):
+        """
+        A searcher over generation, reusing searcher's segment readers;
+        Searcher.refresh() would jump to the newest generation instead
+        """
+        index = self.index
+        try:
+            toc = TOC.read(index.storage, index.indexname, gen=generation, schema=index._schema)
+        except IOError:
+            # Removed by a later commit
+            return searcher.refresh()
+        searcher.is_closed = True
+        try:
+            reader = index._reader(index.storage, toc.schema, toc.segments, toc.generation,
+                                   reuse=searcher.reader())
+        except IOError:
+            # Segments removed since the TOC was read; the old readers may be closed
+            return index.searcher(weighting=self.weighting)
+        return Searcher(reader, weighting=self.weighting, fromindex=index)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,144 @@
+"""
+Serve the query engine with several worker processes:
+
+    python -m query_engine.app.serve --workers 4
+
+Before any worker starts, this process acts as the loader once. It brings
+the derived structures up to date on disk: the link graph, the LSH
+signatures, the impact index (for the "impact" and "maxscore" engines),
+the graph analytics snapshot and the static rank scores. Workers then open
+every one of them memory-mapped, as they do the index's own segment files
+(term dictionaries and postings), so the pages are shared through the page
+cache instead of being rebuilt and copied by each process. What stays per
+worker is the interpreter, the app and its query caches.
+
+While serving, the worker holding the loader lock (``<index>.loader``)
+recomputes graph analytics and static rank for new index generations and
+the others attach to its files; the crawler updates the link graph and the
+LSH signatures after each commit.
+
+Each worker numbers its own query log and metrics textfile by a slot lock
+(``<index>.worker-<n>``); any worker's /metrics reports every worker's
+samples, labelled with its number.
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict
+
+backend_path = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(backend_path))
+
+try:
+    from config import config
+except ImportError:
+    from backend.config import config
+
+from .ranking import BM25Ranker
+
+try:
+    from services.graph_service import CrawlGraphService
+    from services.graph_analytics import GraphAnalytics
+    from services.loader import LoaderLock
+except ImportError:
+    from backend.services.graph_service import CrawlGraphService
+    from backend.services.graph_analytics import GraphAnalytics
+    from backend.services.loader import LoaderLock
+
+# The index main.py serves
+INDEX_PATH = backend_path / "indexer" / "whoosh_index"
+
+
+def prepare(index_path: str, engine: str = "whoosh", static_rank_weight: float = 0.0,
+            static_rank_formula: str = "log", wait_seconds: float = 300.0) -> Dict[str, float]:
+    """
+    Build or update every shared structure for the index's latest
+    generation, as the loader.
+
+    Returns:
+        Seconds taken per structure (empty if another process holds the
+        loader lock, i.e. workers are already serving the index)
+    """
+    loader = LoaderLock(str(index_path) + ".loader")
+    if not loader.is_loader():
+        return {}
+    timings: Dict[str, float] = {}
+
+    def step(name, work):
+        start = time.perf_counter()
+        work()
+        timings[name] = time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        ranker = BM25Ranker(str(index_path), engine=engine, pool_size=1)
+        # Opening the ranker builds the impact index for the "impact" and "maxscore" engines
+        timings["index"] = time.perf_counter() - start
+        try:
+            graph_service = CrawlGraphService(ranker.index)
+            graph_analytics = GraphAnalytics(graph_service, loader=loader)
+            step("link_graph", graph_service.link_graph)
+            step("similarity", ranker._similarity_index)
+
+            def analytics():
+                graph_analytics.schedule()
+                graph_analytics.wait()
+                if graph_analytics.last_error:
+                    raise RuntimeError(f"Graph analytics failed: {graph_analytics.last_error}")
+            step("graph_analytics", analytics)
+
+            if static_rank_weight:
+                ranker.enable_static_rank(graph_analytics.pagerank_scores, static_rank_weight,
+                                          static_rank_formula, loader=loader)
+
+                def static_rank():
+                    # Failures are retried in the background, so give up after wait_seconds
+                    updater = ranker.static_rank_updater
+                    updater.wait(wait_seconds)
+                    if updater.running():
+                        raise RuntimeError(f"Static rank not ready after {wait_seconds:g} s: {updater.last_error}")
+                step("static_rank", static_rank)
+        finally:
+            ranker.close()
+    finally:
+        # Hand the lock over to whichever worker asks first
+        loader.release()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the query engine with several worker processes')
+    parser.add_argument('--workers', type=int, default=config.QUERY_ENGINE["WORKERS"])
+    parser.add_argument('--host', default=config.QUERY_ENGINE["HOST"])
+    parser.add_argument('--port', type=int, default=config.QUERY_ENGINE["PORT"])
+    args = parser.parse_args()
+
+    import uvicorn
+
+    # Workers read the count from the environment, like the rest of config
+    os.environ["QUERY_WORKERS"] = str(args.workers)
+    # Textfiles of workers from an earlier run, which may have had more
+    for stale in Path(config.METRICS["TEXTFILE_DIR"]).glob("query-engine-*.prom"):
+        stale.unlink(missing_ok=True)
+
+    timings = prepare(
+        INDEX_PATH,
+        engine=config.QUERY_ENGINE["RETRIEVAL_ENGINE"],
+        static_rank_weight=config.QUERY_ENGINE["STATIC_RANK_WEIGHT"],
+        static_rank_formula=config.QUERY_ENGINE["STATIC_RANK_FORMULA"],
+        wait_seconds=config.QUERY_ENGINE["WARMUP_WAIT_SECONDS"]
+    )
+    if timings:
+        print("Shared structures ready: " + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in timings.items()))
+    else:
+        print(f"{INDEX_PATH} already has a loader; workers will attach to its files")
+    # Workers import the app themselves, so it is passed by name
+    uvicorn.run(f"{__package__}.main:app", host=args.host, port=args.port, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
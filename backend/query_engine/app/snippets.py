@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# (index generation, docnum, sorted content terms of the query)
+SnippetKey = Tuple[int, int, Tuple[str, ...]]
+
+
+class SnippetCache:
+    """
+    Bounded LRU of rendered snippets.
+
+    A snippet only depends on the document and the content terms it is
+    highlighted for, so popular queries and paging back and forth reuse
+    the highlighted fragment instead of rebuilding it. The generation in
+    the key keeps snippets from a previous index version from being served
+    for a reused docnum.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._snippets: "OrderedDict[SnippetKey, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._snippets)
+
+    def get(self, key: SnippetKey) -> Optional[str]:
+        with self._lock:
+            snippet = self._snippets.get(key)
+            if snippet is None:
+                self.misses += 1
+                return None
+            self._snippets.move_to_end(key)
+            self.hits += 1
+            return snippet
+
+    def put(self, key: SnippetKey, snippet: str):
+        with self._lock:
+            self._snippets[key] = snippet
+            self._snippets.move_to_end(key)
+            while len(self._snippets) > self.max_entries:
+                self._snippets.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._snippets.clear()
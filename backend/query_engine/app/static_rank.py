@@ -0,0 +1,277 @@
+import os
+import json
+import math
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from array import array
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from whoosh.scoring import BM25F
+
+logger = logging.getLogger(__name__)
+
+FORMULAS = ("log", "linear", "power")
+FORMAT_VERSION = 1
+# How often workers that are not the loader look for saved scores
+POLL_SECONDS = 1.0
+# Delay before retrying a failed computation, doubled per failure up to the max
+RETRY_SECONDS = 1.0
+MAX_RETRY_SECONDS = 60.0
+
+
+class StaticRank:
+    """
+    Query-independent document scores for one index generation, aligned
+    with docnums so blending a hit's score is a single array lookup.
+
+    PageRank is turned into a prior of ``pagerank / mean(pagerank)`` (1.0 for
+    an average page) and blended with the BM25F score by one of:
+
+    - ``log``:    score + weight * log(prior)
+    - ``linear``: score + weight * pagerank / max(pagerank)
+    - ``power``:  score * prior ** weight
+
+    The per-document term of the chosen formula is precomputed into
+    ``values``, so only an add or a multiply happens per hit.
+
+    Saved as ``<path>/gen-<generation>/`` and loaded memory-mapped, so
+    workers serving the same index share one copy of the arrays.
+    """
+
+    def __init__(self, generation: int, pagerank: array, values: array, weight: float, formula: str):
+        self.generation = generation
+        self.pagerank = pagerank
+        self.values = values
+        self.weight = weight
+        self.formula = formula
+        self.additive = formula != "power"
+        # Bounds a document's static term for MaxScore
+        self.max_value = max(values, default=0.0 if self.additive else 1.0)
+
+    @classmethod
+    def from_pagerank(cls, searcher, pagerank: Dict[str, float], weight: float,
+                      formula: str = "log") -> "StaticRank":
+        """
+        Align PageRank scores (keyed by URL) with the searcher's docnums.
+
+        Documents missing from the graph get the average prior, so they are
+        neither boosted nor penalized.
+        """
+        if formula not in FORMULAS:
+            raise ValueError(f"Unknown static rank formula: {formula}")
+
+        doc_count = searcher.doc_count_all()
+        # The mean rather than 1/N: scores may cover only part of the index
+        average = (sum(pagerank.values()) / len(pagerank) if pagerank else 0.0) or 1.0
+        scores = array("d", [average]) * doc_count
+        for docnum, fields in searcher.reader().iter_docs():
+            scores[docnum] = pagerank.get(fields.get("url", ""), average)
+
+        max_score = max(scores, default=0.0) or 1.0
+        values = array("d", bytes(8 * doc_count))
+        for docnum, score in enumerate(scores):
+            prior = max(score / average, 1e-12)
+            if formula == "log":
+                values[docnum] = weight * math.log(prior)
+            elif formula == "linear":
+                values[docnum] = weight * score / max_score
+            else:
+                values[docnum] = prior ** weight
+
+        return cls(searcher.reader().generation(), scores, values, weight, formula)
+
+    @classmethod
+    def load(cls, directory: str) -> "StaticRank":
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported static rank version in {directory}")
+        # memoryviews of the mapped arrays index to plain floats, as fast as array("d")
+        pagerank, values = (memoryview(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+                            for name in ("pagerank", "values"))
+        return cls(meta["generation"], pagerank, values, meta["weight"], meta["formula"])
+
+    @classmethod
+    def load_generation(cls, path: str, generation: int, weight: float, formula: str) -> Optional["StaticRank"]:
+        """Saved scores for generation, if they were computed with the same weight and formula"""
+        try:
+            static_rank = cls.load(os.path.join(path, f"gen-{generation}"))
+        except (OSError, ValueError, KeyError):
+            return None
+        if static_rank.weight != weight or static_rank.formula != formula:
+            return None
+        return static_rank
+
+    def save(self, path: str) -> str:
+        """
+        Write as ``<path>/gen-<generation>/``, staged in a temporary
+        directory, and remove older generations.
+        """
+        directory = os.path.join(path, f"gen-{self.generation}")
+        os.makedirs(path, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".gen-{self.generation}-", dir=path)
+        try:
+            for name in ("pagerank", "values"):
+                np.save(os.path.join(staging, f"{name}.npy"), np.asarray(getattr(self, name), dtype=np.float64))
+            meta = {"version": FORMAT_VERSION, "generation": self.generation, "weight": self.weight,
+                    "formula": self.formula, "docs": len(self.values)}
+            with open(os.path.join(staging, "meta.json"), "w") as f:
+                json.dump(meta, f)
+            if os.path.exists(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                # Another process published this generation first
+                shutil.rmtree(staging, ignore_errors=True)
+        except:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        for name in os.listdir(path):
+            if name.startswith("gen-") and name != f"gen-{self.generation}":
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        return directory
+
+    def blend(self, docnum: int, score: float) -> float:
+        if not 0 <= docnum < len(self.values):
+            return score
+        if self.additive:
+            return score + self.values[docnum]
+        return score * self.values[docnum]
+
+    def explain(self, docnum: int, score: float) -> Dict[str, Any]:
+        """Show how the static score changed a document's text score"""
+        final_score = self.blend(docnum, score)
+        pagerank = self.pagerank[docnum] if 0 <= docnum < len(self.pagerank) else 0.0
+        return {
+            'formula': self.formula,
+            'weight': self.weight,
+            'pagerank': round(pagerank, 6),
+            'text_score': round(score, 4),
+            'contribution': round(final_score - score, 4),
+            'final_score': round(final_score, 4)
+        }
+
+
+class StaticRankBM25F(BM25F):
+    """
+    BM25F that blends a StaticRank into every collected hit through
+    Whoosh's ``final()`` hook, which is called once per hit with the global
+    docnum. Blending is skipped until a StaticRank has been set, and for
+    searchers on any other generation than its own, whose docnums it does
+    not line up with.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.static_rank: Optional[StaticRank] = None
+
+    @property
+    def use_final(self):
+        return self.static_rank is not None
+
+    def final(self, searcher, docnum, score):
+        static_rank = self.static_rank
+        if static_rank is None or static_rank.generation != searcher.reader().generation():
+            return score
+        return static_rank.blend(docnum, score)
+
+
+class StaticRankUpdater:
+    """
+    Recomputes static scores in a background thread whenever the index
+    (and so the link graph) moves to a new generation.
+
+    With a path, scores are saved there and published from the mapped
+    files. With a loader lock too, only the process holding it computes;
+    the others wait for its files and attach to them. A failed computation
+    (say, graph analytics not ready yet) is retried with backoff until it
+    succeeds or stop() is called.
+
+    Args:
+        index: Whoosh index the graph is built from
+        compute_pagerank: Callable returning PageRank scores keyed by URL
+        publish: Called with each new StaticRank, from the background thread
+        weight: Blend weight; see StaticRank for the formulas
+        formula: One of FORMULAS
+        path: Optional directory the scores are shared through
+        loader: Optional LoaderLock electing the process that computes them
+    """
+
+    def __init__(self, index, compute_pagerank: Callable[[], Dict[str, float]],
+                 publish: Callable[[StaticRank], None], weight: float, formula: str = "log",
+                 path: Optional[str] = None, loader=None):
+        if formula not in FORMULAS:
+            raise ValueError(f"Unknown static rank formula: {formula}")
+        self.index = index
+        self.compute_pagerank = compute_pagerank
+        self.publish = publish
+        self.weight = weight
+        self.formula = formula
+        self.path = path
+        self.loader = loader
+        self.generation = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self) -> bool:
+        """Start a recompute unless one is running or the scores are current"""
+        with self._lock:
+            if self._stop.is_set() or (self._thread is not None and self._thread.is_alive()):
+                return False
+            if self.generation == self.index.latest_generation():
+                return False
+            self._thread = threading.Thread(target=self._run, name="static-rank", daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout: Optional[float] = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def stop(self):
+        """Stop recomputing and retrying; a computation in progress still finishes"""
+        self._stop.set()
+
+    def _run(self):
+        # Keep going until the scores match the newest generation, so a
+        # commit landing mid-computation is not missed
+        delay = RETRY_SECONDS
+        while not self._stop.is_set() and self.generation != self.index.latest_generation():
+            latest = self.index.latest_generation()
+            static_rank = None
+            if self.path is not None:
+                static_rank = StaticRank.load_generation(self.path, latest, self.weight, self.formula)
+            if static_rank is None and self.loader is not None and not self.loader.is_loader():
+                # Another worker computes the scores; wait for its files
+                self._stop.wait(POLL_SECONDS)
+                continue
+            if static_rank is None:
+                try:
+                    with self.index.searcher() as searcher:
+                        pagerank = self.compute_pagerank()
+                        static_rank = StaticRank.from_pagerank(searcher, pagerank, self.weight, self.formula)
+                        if self.path is not None:
+                            static_rank = StaticRank.load(static_rank.save(self.path))
+                except Exception as e:
+                    logger.exception("Static rank computation failed; retrying in %g s", delay)
+                    self.last_error = str(e)
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, MAX_RETRY_SECONDS)
+                    continue
+            delay = RETRY_SECONDS
+            self.last_error = None
+            self.generation = static_rank.generation
+            self.publish(static_rank)
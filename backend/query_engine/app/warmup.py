@@ -0,0 +1,179 @@
+import time
+import asyncio
+import heapq
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+try:
+    from services.query_log import read_entries
+except ImportError:
+    from backend.services.query_log import read_entries
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Brings a freshly started query engine up to steady-state latency before
+    it reports ready.
+
+    Steps, in order:
+
+    - terms: walk the title and content term dictionaries
+    - postings: read the postings of the most frequent terms
+    - queries: run the most frequent queries from the query log, filling
+      the plan, filter and snippet caches, then the most frequent term of
+      each field
+    - graph: load the link graph, then wait up to wait_seconds for the
+      analytics snapshot and static rank scores
+
+    Bulk work runs on pooled searchers in the search executor. Queries also
+    run on the main searcher, which /search uses and whose segment readers
+    load their own field lengths and columns; like /search they run on the
+    event loop thread, one per turn of the loop, so requests are served in
+    between. Planning stays on the event loop thread like every other
+    request. A failed step is recorded and skipped, so a bad log line
+    cannot keep a server unready.
+
+    Args:
+        ranker: The BM25Ranker to warm
+        graph_service: Optional CrawlGraphService to warm
+        graph_analytics: Optional GraphAnalytics whose snapshot must be current
+        query_log_path: Query log to take top queries from
+        top_queries: Number of logged queries to replay
+        top_terms: Number of terms per field whose postings are read
+        wait_seconds: How long the graph step waits for background jobs
+    """
+
+    FIELDS = ("title", "content")
+
+    def __init__(self, ranker, graph_service=None, graph_analytics=None, query_log_path=None,
+                 top_queries: int = 100, top_terms: int = 500, wait_seconds: float = 300.0):
+        self.ranker = ranker
+        self.graph_service = graph_service
+        self.graph_analytics = graph_analytics
+        self.query_log_path = query_log_path
+        self.top_queries = top_queries
+        self.top_terms = top_terms
+        self.wait_seconds = wait_seconds
+        self.ready = False
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._frequent_terms: Dict[str, List[bytes]] = {}
+        self._started = None
+        self._finished = None
+
+    async def run(self, executor):
+        """Run every step, then mark the server ready"""
+        loop = asyncio.get_running_loop()
+        self._started = time.perf_counter()
+        try:
+            await self._step("terms", loop.run_in_executor(executor, self.warm_terms))
+            await self._step("postings", loop.run_in_executor(executor, self.warm_postings))
+            await self._step("queries", self.warm_queries(loop, executor))
+            if self.graph_service is not None:
+                await self._step("graph", loop.run_in_executor(executor, self.warm_graph))
+                # Start blending the static scores published while waiting
+                self.ranker.refresh()
+        finally:
+            self._finished = time.perf_counter()
+            self.ready = True
+            logger.info("Warmup finished in %.0f ms", (self._finished - self._started) * 1000)
+
+    async def _step(self, name: str, work):
+        start = time.perf_counter()
+        try:
+            items = await work
+            self.steps[name] = {"items": items}
+        except Exception as e:
+            logger.exception("Warmup step %s failed", name)
+            self.steps[name] = {"error": str(e)}
+        self.steps[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    def warm_terms(self) -> int:
+        """Walk the term dictionaries, remembering the most frequent terms"""
+        count = 0
+        with self.ranker.searcher_pool.searcher() as searcher:
+            reader = searcher.reader()
+            for fieldname in self.FIELDS:
+                if fieldname not in searcher.schema:
+                    continue
+                frequent: List[Tuple[int, bytes]] = []
+                for text, terminfo in reader.iter_field(fieldname):
+                    count += 1
+                    entry = (terminfo.doc_frequency(), text)
+                    if len(frequent) < self.top_terms:
+                        heapq.heappush(frequent, entry)
+                    elif entry > frequent[0]:
+                        heapq.heapreplace(frequent, entry)
+                self._frequent_terms[fieldname] = [text for _, text in sorted(frequent, reverse=True)]
+        return count
+
+    def warm_postings(self) -> int:
+        """Decode the postings of the terms found by warm_terms()"""
+        count = 0
+        with self.ranker.searcher_pool.searcher() as searcher:
+            reader = searcher.reader()
+            for fieldname, terms in self._frequent_terms.items():
+                for text in terms:
+                    matcher = reader.postings(fieldname, text)
+                    for _ in matcher.all_ids():
+                        count += 1
+        return count
+
+    def frequent_queries(self) -> List[Tuple[str, int]]:
+        """Most frequent successful /search queries in the log, with their usual page size"""
+        if not self.query_log_path or self.top_queries <= 0:
+            return []
+        counts: Counter = Counter()
+        limits: Dict[str, int] = {}
+        for entry in read_entries(self.query_log_path):
+            if entry.get("error") or entry.get("endpoint", "/search") != "/search":
+                continue
+            counts[entry["q"]] += 1
+            limits.setdefault(entry["q"], (entry.get("params") or {}).get("limit") or 10)
+        return [(q, limits[q]) for q, _ in counts.most_common(self.top_queries)]
+
+    async def warm_queries(self, loop, executor) -> int:
+        queries = await loop.run_in_executor(executor, self.frequent_queries)
+        ranker = self.ranker
+        generation = ranker.stats.generation
+
+        def execute(plan, limit):
+            with ranker.searcher_pool.searcher(generation) as searcher:
+                ranker.execute(plan, limit=limit, searcher=searcher)
+
+        # Frequent terms make sure the main searcher is warmed without a log
+        terms = [(texts[0].decode("utf-8"), 10) for texts in self._frequent_terms.values() if texts]
+        for q, limit in queries + terms:
+            plan = ranker.planner.plan(q, ranker.stats)
+            await loop.run_in_executor(executor, execute, plan, limit)
+            ranker.execute(plan, limit=limit)
+            await asyncio.sleep(0)
+        return len(queries)
+
+    def warm_graph(self) -> int:
+        graph = self.graph_service.link_graph()
+        deadline = time.monotonic() + self.wait_seconds
+        if self.graph_analytics is not None:
+            self.graph_analytics.schedule()
+            self._wait("Graph analytics", self.graph_analytics.wait, self.graph_analytics.running, deadline)
+            if self.graph_analytics.last_error:
+                raise RuntimeError(f"Graph analytics failed: {self.graph_analytics.last_error}")
+        # Rankings shift once static rank scores land, so wait for them
+        updater = self.ranker.static_rank_updater
+        if updater is not None:
+            self._wait("Static rank", updater.wait, updater.running, deadline)
+        return graph.num_nodes
+
+    def _wait(self, name: str, wait, running, deadline: float):
+        """Wait for a background job until deadline, so a stuck one cannot keep the server unready"""
+        wait(max(deadline - time.monotonic(), 0.0))
+        if running():
+            raise TimeoutError(f"{name} still running after {self.wait_seconds:g} s")
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self._started is not None:
+            elapsed = round(((self._finished or time.perf_counter()) - self._started) * 1000, 1)
+        return {"ready": self.ready, "warmup_ms": elapsed, "steps": self.steps}
@@ -0,0 +1,424 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class HitsResult:
+    """Hub and authority scores (each summing to 1) and how the iteration ended"""
+
+    def __init__(self, hubs: np.ndarray, authorities: np.ndarray, iterations: int, delta: float,
+                 converged: bool):
+        self.hubs = hubs
+        self.authorities = authorities
+        self.iterations = iterations
+        self.delta = delta
+        self.converged = converged
+
+
+def csr(num_nodes: int, rows: np.ndarray, cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Offsets and columns of the edges (rows[i], cols[i]) grouped by row"""
+    rows = np.asarray(rows, dtype=np.int64)
+    order = np.argsort(rows, kind="stable")
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=offsets[1:])
+    return offsets, np.asarray(cols, dtype=np.int64)[order]
+
+
+def hits(num_nodes: int, sources: np.ndarray, targets: np.ndarray, tol: float = 1e-8,
+         max_iter: int = 100) -> HitsResult:
+    """
+    Kleinberg's HITS by power iteration over an edge list.
+
+    A page's authority is the summed hub score of the pages linking to it
+    and its hub score the summed authority of the pages it links to. Each
+    half-step is a weighted bincount over the edges, so an iteration costs
+    O(edges). Scores are normalized to sum to 1 and iteration stops once
+    their combined L1 change drops below tol.
+
+    Args:
+        num_nodes: Number of nodes; edges use ids 0..num_nodes-1
+        sources: Source node of each edge
+        targets: Target node of each edge
+        tol: Convergence threshold
+        max_iter: Upper bound on iterations
+
+    Returns:
+        HitsResult
+    """
+    if num_nodes == 0:
+        return HitsResult(np.zeros(0), np.zeros(0), 0, 0.0, True)
+
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    hubs = np.full(num_nodes, 1.0 / num_nodes)
+    authorities = np.full(num_nodes, 1.0 / num_nodes)
+    if len(sources) == 0:
+        return HitsResult(hubs, authorities, 0, 0.0, True)
+
+    delta = float("inf")
+    for iteration in range(1, max_iter + 1):
+        new_authorities = np.bincount(targets, weights=hubs[sources], minlength=num_nodes)
+        new_authorities /= new_authorities.sum()
+        new_hubs = np.bincount(sources, weights=new_authorities[targets], minlength=num_nodes)
+        new_hubs /= new_hubs.sum()
+        delta = float(np.abs(new_hubs - hubs).sum() + np.abs(new_authorities - authorities).sum())
+        hubs, authorities = new_hubs, new_authorities
+        if delta < tol:
+            return HitsResult(hubs, authorities, iteration, delta, True)
+    return HitsResult(hubs, authorities, max_iter, delta, False)
+
+
+def _neighbor_min(values: np.ndarray, offsets: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """For each row, the minimum of its own value and its neighbours' values"""
+    result = values.copy()
+    rows = np.flatnonzero(np.diff(offsets))
+    if len(rows):
+        # Empty rows between two non-empty ones add nothing to a segment
+        result[rows] = np.minimum(values[rows], np.minimum.reduceat(values[columns], offsets[rows]))
+    return result
+
+
+def weakly_connected_components(num_nodes: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Label each node with the smallest node id in its weakly connected
+    component (links followed in either direction).
+
+    Shiloach-Vishkin style: every round hooks each tree onto the smallest
+    label next to any of its members, then compresses the trees fully by
+    pointer jumping. Each round is a few O(edges) array operations, and
+    hooking to the smallest label merges trees quickly enough that real
+    link graphs need only a handful of rounds.
+    """
+    out_offsets, out_targets = csr(num_nodes, sources, targets)
+    in_offsets, in_sources = csr(num_nodes, targets, sources)
+    parent = np.arange(num_nodes, dtype=np.int64)
+    while True:
+        smallest = np.minimum(_neighbor_min(parent, out_offsets, out_targets),
+                              _neighbor_min(parent, in_offsets, in_sources))
+        if np.array_equal(smallest, parent):
+            return parent
+        # Hook roots, then members; labels only ever decrease, so no cycles form
+        np.minimum.at(parent, parent, smallest)
+        np.minimum(parent, smallest, out=parent)
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def _trim(num_nodes: int, sources: np.ndarray, targets: np.ndarray, rounds: int) -> np.ndarray:
+    """
+    Nodes left after repeatedly removing nodes with no in-links or no
+    out-links among the remaining nodes (each removed node is its own SCC).
+    """
+    alive = np.ones(num_nodes, dtype=bool)
+    for _ in range(rounds):
+        inside = alive[sources] & alive[targets]
+        has_out = np.bincount(sources[inside], minlength=num_nodes) > 0
+        has_in = np.bincount(targets[inside], minlength=num_nodes) > 0
+        keep = alive & has_out & has_in
+        if np.array_equal(keep, alive):
+            break
+        alive = keep
+    return alive
+
+
+def neighbors(offsets: np.ndarray, columns: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Every (row, column) entry of the given CSR rows, concatenating their
+    ranges without a Python loop.
+
+    Returns:
+        (row of each entry, column of each entry)
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = np.asarray(offsets[rows], dtype=np.int64)
+    counts = np.asarray(offsets[rows + 1], dtype=np.int64) - starts
+    total = int(counts.sum())
+    positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return np.repeat(rows, counts), np.asarray(columns[positions], dtype=np.int64)
+
+
+def _reachable(offsets: np.ndarray, columns: np.ndarray, start: int) -> np.ndarray:
+    """Nodes reachable from start, by breadth-first search one whole level per array operation"""
+    seen = np.zeros(len(offsets) - 1, dtype=bool)
+    seen[start] = True
+    frontier = np.array([start], dtype=np.int64)
+    while len(frontier):
+        _, reached = neighbors(offsets, columns, frontier)
+        frontier = np.unique(reached[~seen[reached]])
+        seen[frontier] = True
+    return seen
+
+
+def strongly_connected_components(num_nodes: int, sources: np.ndarray, targets: np.ndarray,
+                                  trim_rounds: int = 8) -> np.ndarray:
+    """
+    Label each node with the id of its strongly connected component
+    (0..components-1).
+
+    Nodes that cannot be on a cycle are trimmed first with vectorized
+    degree counts. Web graphs then have one giant component, which is found
+    as the intersection of a forward and a backward breadth-first search
+    from the best-connected node, each level a single array operation. The
+    rest goes through an iterative Tarjan over the CSR arrays, which visits
+    each remaining node and edge once, so the whole is O(nodes + edges).
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    alive = _trim(num_nodes, sources, targets, trim_rounds)
+    labels = np.empty(num_nodes, dtype=np.int64)
+    trimmed = np.flatnonzero(~alive)
+    labels[trimmed] = np.arange(len(trimmed))
+    count = len(trimmed)
+
+    remaining = np.flatnonzero(alive)
+    if len(remaining) == 0:
+        return labels
+
+    inside = alive[sources] & alive[targets]
+    offsets, columns = csr(num_nodes, sources[inside], targets[inside])
+    in_offsets, in_columns = csr(num_nodes, targets[inside], sources[inside])
+
+    # The pivot's component is whatever both reaches it and is reached from it
+    pivot = int(np.argmax(np.diff(offsets) * np.diff(in_offsets)))
+    giant = _reachable(offsets, columns, pivot) & _reachable(in_offsets, in_columns, pivot)
+    labels[giant] = count
+    count += 1
+    remaining = np.flatnonzero(alive & ~giant)
+    offsets, columns = offsets.tolist(), columns.tolist()
+
+    # index is -1 for unvisited nodes; trimmed and giant component nodes
+    # count as finished, so links into them are ignored
+    index = [0] * num_nodes
+    for node in remaining.tolist():
+        index[node] = -1
+    low = [0] * num_nodes
+    on_stack = bytearray(num_nodes)
+    component = labels.tolist()
+    stack = []
+    counter = 0
+
+    for root in remaining.tolist():
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, offsets[root])]
+        while work:
+            node, position = work[-1]
+            end = offsets[node + 1]
+            while position < end:
+                neighbor = columns[position]
+                position += 1
+                if index[neighbor] == -1:
+                    work[-1] = (node, position)
+                    index[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack[neighbor] = 1
+                    work.append((neighbor, offsets[neighbor]))
+                    break
+                if on_stack[neighbor] and index[neighbor] < low[node]:
+                    low[node] = index[neighbor]
+            else:
+                work.pop()
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        component[member] = count
+                        if member == node:
+                            break
+                    count += 1
+                if work:
+                    caller = work[-1][0]
+                    if low[node] < low[caller]:
+                        low[caller] = low[node]
+
+    return np.asarray(component, dtype=np.int64)
+
+
+def component_sizes(labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(component labels, sizes) ordered largest first, ties by label"""
+    components, sizes = np.unique(labels, return_counts=True)
+    order = np.lexsort((components, -sizes))
+    return components[order], sizes[order]
+
+
+def quotient_graph(groups: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+                   num_groups: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collapse nodes into groups (e.g. domains): one weighted edge per pair of
+    distinct groups, weighted by the number of node links between them.
+
+    Returns:
+        (source groups, target groups, link counts)
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    source_groups = groups[np.asarray(sources, dtype=np.int64)]
+    target_groups = groups[np.asarray(targets, dtype=np.int64)]
+    between = source_groups != target_groups
+    keys, counts = np.unique(source_groups[between] * num_groups + target_groups[between], return_counts=True)
+    return keys // num_groups, keys % num_groups, counts
+
+
+def _expand(offsets, columns, frontier, visited, blocked_nodes=None, blocked_links=None, forward=True):
+    """
+    One BFS level: the unvisited neighbours of frontier and, for each, the
+    frontier node it was first reached from. blocked_links holds keys
+    ``source * num_nodes + target`` of links that may not be used.
+    """
+    rows, reached = neighbors(offsets, columns, frontier)
+    keep = ~visited[reached]
+    if blocked_nodes is not None:
+        keep &= ~blocked_nodes[reached]
+    if blocked_links is not None and len(blocked_links):
+        num_nodes = len(offsets) - 1
+        keys = rows * num_nodes + reached if forward else reached * num_nodes + rows
+        keep &= ~np.isin(keys, blocked_links)
+    rows, reached = rows[keep], reached[keep]
+    reached, first = np.unique(reached, return_index=True)
+    return reached, rows[first]
+
+
+def shortest_path(out_offsets, out_targets, in_offsets, in_sources, source: int, target: int,
+                  max_hops: Optional[int] = None, blocked_nodes: Optional[np.ndarray] = None,
+                  blocked_links: Optional[np.ndarray] = None) -> Optional[List[int]]:
+    """
+    A shortest directed path from source to target, by bidirectional BFS.
+
+    Searches forward along out-links from source and backward along in-links
+    from target, always growing the smaller frontier by a whole level (one
+    array operation) and recording parent pointers in integer arrays. On
+    link graphs, where the number of pages within d links grows
+    exponentially, the two searches meet after touching roughly the square
+    root of what a one-sided search would.
+
+    Args:
+        out_offsets, out_targets: CSR out-links
+        in_offsets, in_sources: CSC in-links
+        source: Start node
+        target: End node
+        max_hops: Give up on paths longer than this
+        blocked_nodes: Boolean mask of nodes the path may not pass through
+        blocked_links: Sorted keys ``source * num_nodes + target`` of links
+            the path may not use
+
+    Returns:
+        Node ids from source to target, or None if there is no such path
+    """
+    if source == target:
+        return [source]
+    num_nodes = len(out_offsets) - 1
+    # Parent pointers: forward towards source, backward towards target; -1 unseen
+    forward_parent = np.full(num_nodes, -1, dtype=np.int64)
+    backward_parent = np.full(num_nodes, -1, dtype=np.int64)
+    forward_parent[source], backward_parent[target] = source, target
+    forward_seen = forward_parent >= 0
+    backward_seen = backward_parent >= 0
+    # Distance to target of backward-visited nodes (and from source of forward ones)
+    forward_depth = np.zeros(num_nodes, dtype=np.int32)
+    backward_depth = np.zeros(num_nodes, dtype=np.int32)
+    forward_level = backward_level = 0
+    forward_frontier = np.array([source], dtype=np.int64)
+    backward_frontier = np.array([target], dtype=np.int64)
+    hops = 0
+
+    while len(forward_frontier) and len(backward_frontier):
+        if max_hops is not None and hops >= max_hops:
+            return None
+        hops += 1
+        forward = len(forward_frontier) <= len(backward_frontier)
+        if forward:
+            reached, parents = _expand(out_offsets, out_targets, forward_frontier, forward_seen,
+                                       blocked_nodes, blocked_links, forward=True)
+            forward_level += 1
+            forward_parent[reached] = parents
+            forward_seen[reached] = True
+            forward_depth[reached] = forward_level
+            forward_frontier = reached
+            meets = reached[backward_seen[reached]]
+            other_depth = backward_depth
+        else:
+            reached, parents = _expand(in_offsets, in_sources, backward_frontier, backward_seen,
+                                       blocked_nodes, blocked_links, forward=False)
+            backward_level += 1
+            backward_parent[reached] = parents
+            backward_seen[reached] = True
+            backward_depth[reached] = backward_level
+            backward_frontier = reached
+            meets = reached[forward_seen[reached]]
+            other_depth = forward_depth
+        if len(meets):
+            # With the whole level expanded, the meeting node nearest the
+            # other end gives a shortest path
+            middle = int(meets[np.argmin(other_depth[meets])])
+            path = [middle]
+            while path[-1] != source:
+                path.append(int(forward_parent[path[-1]]))
+            path.reverse()
+            while path[-1] != target:
+                path.append(int(backward_parent[path[-1]]))
+            return path
+    return None
+
+
+def k_shortest_paths(out_offsets, out_targets, in_offsets, in_sources, source: int, target: int, k: int,
+                     max_hops: Optional[int] = None) -> List[List[int]]:
+    """
+    Up to k shortest simple paths from source to target, shortest first
+    (Yen's algorithm, with shortest_path() for each spur search).
+    """
+    import heapq
+
+    first = shortest_path(out_offsets, out_targets, in_offsets, in_sources, source, target, max_hops)
+    if first is None:
+        return []
+    num_nodes = len(out_offsets) - 1
+    found = [first]
+    candidates: List[Tuple[int, List[int]]] = []
+    seen = {tuple(first)}
+
+    while len(found) < k:
+        previous = found[-1]
+        for i in range(len(previous) - 1):
+            spur, root = previous[i], previous[:i + 1]
+            # Links already used from this root, and the root itself, are off limits
+            links = [path[i] * num_nodes + path[i + 1] for path in found if path[:i + 1] == root]
+            blocked_nodes = np.zeros(num_nodes, dtype=bool)
+            blocked_nodes[root[:-1]] = True
+            spur_path = shortest_path(
+                out_offsets, out_targets, in_offsets, in_sources, spur, target,
+                None if max_hops is None else max_hops - i, blocked_nodes, np.unique(np.array(links, dtype=np.int64))
+            )
+            if spur_path is not None:
+                path = root[:-1] + spur_path
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (len(path), path))
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates)[1])
+    return found
+
+
+def bfs_levels(offsets, columns, start: int, max_hops: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Nodes within max_hops links of start (following the CSR direction), in
+    BFS order, with their distance; start itself comes first at 0.
+    """
+    visited = np.zeros(len(offsets) - 1, dtype=bool)
+    visited[start] = True
+    levels = [np.array([start], dtype=np.int64)]
+    for _ in range(max_hops):
+        reached, _ = _expand(offsets, columns, levels[-1], visited)
+        if len(reached) == 0:
+            break
+        visited[reached] = True
+        levels.append(reached)
+    distances = np.repeat(np.arange(len(levels)), [len(level) for level in levels])
+    return np.concatenate(levels), distances
@@ -0,0 +1,362 @@
+"""
+Materialized graph analytics.
+
+PageRank, HITS hubs and authorities, degree distributions, connected
+components and per-domain link statistics are computed once per index generation by a background thread
+and written to a JSON snapshot next to the link graph. Graph endpoints serve
+the snapshot as it is, with its generation and age, instead of recomputing
+on every request; a restart picks the snapshot up from disk, and an older
+snapshot keeps being served while its replacement is computed. With several
+workers serving the index, only the elected loader computes; the others
+re-read the file once it has been replaced.
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .metrics import metrics
+from .graph_algorithms import component_sizes
+from .graph_service import graph_operation, graph_stage
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+# How often workers that are not the loader look for a newer snapshot file
+POLL_SECONDS = 1.0
+# How long pagerank_scores() waits for a current snapshot before settling for an older one
+PAGERANK_WAIT_SECONDS = 300.0
+
+ANALYTICS_RUNS = metrics.counter(
+    "nayuta_graph_analytics_runs_total", "Graph analytics recomputes by outcome", ("outcome",)
+)
+
+
+class GraphAnalytics:
+    """
+    Background scheduler and store for the graph analytics snapshot.
+
+    Args:
+        graph_service: CrawlGraphService the analytics are computed from
+        path: Snapshot file (default ``<index>.graph/analytics.json``)
+        top: Pages kept per HITS ranking and components kept per kind
+        loader: Optional LoaderLock; when another process holds it, the
+            snapshot is read from disk instead of computed (and force has
+            no effect)
+    """
+
+    def __init__(self, graph_service, path: Optional[str] = None, top: int = 100, loader=None):
+        self.graph_service = graph_service
+        self.path = path or os.path.join(graph_service.graph_path, "analytics.json")
+        self.top = top
+        self.loader = loader
+        self.last_error: Optional[str] = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._mtime: Optional[int] = None
+        self._pagerank_by_node = None
+        self._loaded = False
+        self._force = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def latest_generation(self) -> int:
+        return self.graph_service.index.latest_generation()
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """The newest snapshot, read from disk on first use; None if there is none yet"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._snapshot = self._snapshot or self._reload()
+                    self._loaded = True
+        return self._snapshot
+
+    def schedule(self, force: bool = False) -> bool:
+        """
+        Start a recompute unless one is running or the snapshot is current.
+        force recomputes even a current snapshot (a running job is left to
+        finish, then runs once more).
+        """
+        current = self.snapshot()
+        with self._lock:
+            if force:
+                self._force = True
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            if not self._force and current is not None and current["generation"] == self.latest_generation():
+                return False
+            self._thread = threading.Thread(target=self._run, name="graph-analytics", daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout: Optional[float] = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def running(self) -> bool:
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def _run(self):
+        # Keep going until the snapshot matches the newest generation, so a
+        # commit landing mid-computation is not missed
+        while True:
+            with self._lock:
+                current = self._snapshot
+                if not self._force and current is not None and current["generation"] == self.latest_generation():
+                    return
+                self._force = False
+            if self.loader is not None and not self.loader.is_loader():
+                snapshot = self._reload()
+                if snapshot is not None:
+                    self._snapshot = snapshot
+                    if snapshot["generation"] == self.latest_generation():
+                        return
+                time.sleep(POLL_SECONDS)
+                continue
+            try:
+                snapshot = self.compute()
+                self.save(snapshot, self.path)
+            except Exception as e:
+                logger.exception("Graph analytics computation failed")
+                self.last_error = str(e)
+                ANALYTICS_RUNS.inc(outcome="failed")
+                return
+            self.last_error = None
+            self._snapshot = snapshot
+            ANALYTICS_RUNS.inc(outcome="completed")
+
+    def status(self, snapshot: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generation and age of a snapshot (the current one by default), and the job state"""
+        snapshot = snapshot or self.snapshot()
+        latest = self.latest_generation()
+        status = {
+            "generation": None,
+            "latest_generation": latest,
+            "computed_at": None,
+            "age_seconds": None,
+            "compute_ms": None,
+            "stale": True,
+            "running": self.running(),
+            "error": self.last_error
+        }
+        if snapshot is not None:
+            status.update({
+                "generation": snapshot["generation"],
+                "computed_at": snapshot["computed_at"],
+                "age_seconds": round(time.time() - snapshot["computed_at"], 1),
+                "compute_ms": snapshot["compute_ms"],
+                "stale": snapshot["generation"] != latest
+            })
+        return status
+
+    def pagerank_scores(self, timeout: Optional[float] = PAGERANK_WAIT_SECONDS) -> Dict[str, float]:
+        """
+        PageRank by URL for the latest generation, waiting up to timeout
+        seconds for the snapshot to be computed if it is missing or behind
+        the index; after that an older snapshot is used if there is one.
+        """
+        snapshot = self.snapshot()
+        if snapshot is None or snapshot["generation"] != self.latest_generation():
+            self.schedule()
+            self.wait(timeout)
+            snapshot = self.snapshot()
+            if snapshot is None:
+                raise RuntimeError(f"Graph analytics unavailable: {self.last_error}")
+        return {item["url"]: item["score"] for item in snapshot["pagerank"]["scores"]}
+
+    def pagerank_by_node(self, graph, snapshot: Optional[Dict[str, Any]] = None):
+        """
+        The snapshot's PageRank as an array indexed by the graph's node ids
+        (0 for pages it does not score), built once per snapshot and graph.
+        """
+        snapshot = snapshot or self.snapshot()
+        if snapshot is None:
+            return None
+        cached = self._pagerank_by_node
+        if cached is not None and cached[0] is snapshot and cached[1] is graph:
+            return cached[2]
+        scores = np.zeros(graph.num_nodes)
+        items = snapshot["pagerank"]["scores"]
+        nodes = graph.node_ids([item["url"] for item in items])
+        found = nodes >= 0
+        scores[nodes[found]] = np.array([item["score"] for item in items], dtype=np.float64)[found]
+        self._pagerank_by_node = (snapshot, graph, scores)
+        return scores
+
+    # ------------------------------------------------------------------
+    # Computation
+    # ------------------------------------------------------------------
+
+    @graph_operation("analytics")
+    def compute(self) -> Dict[str, Any]:
+        """Compute a full snapshot for the link graph's current generation"""
+        start = time.perf_counter()
+        service = self.graph_service
+        graph = service.link_graph()
+        previous = self._snapshot
+        if previous is not None:
+            # The snapshot read at startup holds the last PageRank, so a
+            # restart warm-starts from it too
+            service.seed_pagerank(self.pagerank_by_node(graph, previous))
+        result, nodes = service.pagerank()
+        hits = service.hits()
+
+        with graph_stage("analytics_pagerank"):
+            order = np.argsort(-result.scores, kind="stable")
+            scores = [
+                {"url": graph.urls[node], "score": score}
+                for node, score in zip(nodes[order].tolist(), result.scores[order].tolist())
+            ]
+        with graph_stage("analytics_degrees"):
+            degrees = {
+                "in": _histogram(graph.in_degree()[nodes]),
+                "out": _histogram(graph.out_degree()[nodes])
+            }
+        with graph_stage("analytics_domains"):
+            domains = self.domain_stats(graph, nodes, result.scores)
+        components = {
+            "weak": self.component_summary(graph, *service.components(strong=False)),
+            "strong": self.component_summary(graph, *service.components(strong=True))
+        }
+
+        return {
+            "version": SNAPSHOT_VERSION,
+            "generation": graph.generation,
+            "computed_at": time.time(),
+            "compute_ms": round((time.perf_counter() - start) * 1000, 1),
+            "pagerank": {
+                "iterations": result.iterations,
+                "converged": result.converged,
+                "scores": scores
+            },
+            "hits": self.hits_summary(graph, *hits),
+            "stats": service.get_graph_statistics(hits),
+            "degree_distribution": degrees,
+            "components": components,
+            "domains": domains,
+            "domain_graph": service.domain_graph()
+        }
+
+    def hits_summary(self, graph, result, nodes) -> Dict[str, Any]:
+
+        def top(scores):
+            order = np.argsort(-scores, kind="stable")[:self.top]
+            return [{"url": graph.urls[node], "score": score}
+                    for node, score in zip(nodes[order].tolist(), scores[order].tolist())]
+
+        return {
+            "iterations": result.iterations,
+            "converged": result.converged,
+            "hubs": top(result.hubs),
+            "authorities": top(result.authorities)
+        }
+
+    def component_summary(self, graph, labels, nodes, sample: int = 10) -> Dict[str, Any]:
+        """Component count, size distribution and the largest components with sample pages"""
+        components, sizes = component_sizes(labels)
+        largest = []
+        if len(components):
+            # One stable sort groups every kept component's members in node order
+            kept = components[:self.top]
+            rank = np.full(int(labels.max()) + 1, len(kept), dtype=np.int64)
+            rank[kept] = np.arange(len(kept))
+            members = np.argsort(rank[labels], kind="stable")
+            starts = np.concatenate([[0], np.cumsum(sizes[:len(kept)])])
+            for i, size in enumerate(sizes[:len(kept)].tolist()):
+                sampled = members[starts[i]:starts[i] + min(size, sample)]
+                largest.append({"size": size, "urls": [graph.urls[node] for node in nodes[sampled].tolist()]})
+        return {
+            "count": len(components),
+            "largest_size": int(sizes[0]) if len(sizes) else 0,
+            "singletons": int(np.count_nonzero(sizes == 1)),
+            "size_distribution": _histogram(sizes),
+            "largest": largest
+        }
+
+    @staticmethod
+    def domain_stats(graph, nodes, scores) -> List[Dict[str, Any]]:
+        """
+        Pages, links within the domain, links to and from other domains and
+        summed PageRank per crawled domain, largest domains first.
+        """
+        num_domains = len(graph.domains)
+        domain_ids = np.asarray(graph.domain_ids)
+        pages = np.bincount(domain_ids[nodes], minlength=num_domains)
+        rank = np.bincount(domain_ids[nodes], weights=scores, minlength=num_domains)
+
+        source_domains = domain_ids[graph.edge_sources()]
+        target_domains = domain_ids[np.asarray(graph.out_targets)]
+        internal = source_domains == target_domains
+        internal_links = np.bincount(source_domains[internal], minlength=num_domains)
+        links_out = np.bincount(source_domains[~internal], minlength=num_domains)
+        links_in = np.bincount(target_domains[~internal], minlength=num_domains)
+
+        order = np.lexsort((np.arange(num_domains), -pages))
+        return [
+            {
+                "domain": graph.domains[i],
+                "pages": int(pages[i]),
+                "internal_links": int(internal_links[i]),
+                "links_out": int(links_out[i]),
+                "links_in": int(links_in[i]),
+                "pagerank": float(rank[i])
+            }
+            for i in order.tolist() if pages[i]
+        ]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _reload(self) -> Optional[Dict[str, Any]]:
+        """The snapshot file if it changed since it was last read, else None"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime == self._mtime:
+            return None
+        snapshot = self.load(self.path)
+        if snapshot is not None:
+            self._mtime = mtime
+        return snapshot
+
+    @staticmethod
+    def load(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    @staticmethod
+    def save(snapshot: Dict[str, Any], path: str):
+        """Write the snapshot atomically, so readers never see a partial file"""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, staging = tempfile.mkstemp(prefix=".analytics-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(staging, path)
+        except:
+            if os.path.exists(staging):
+                os.remove(staging)
+            raise
+
+
+def _histogram(values) -> List[List[int]]:
+    """[[value, count], ...] for each distinct value, ascending"""
+    distinct, counts = np.unique(values, return_counts=True)
+    return [[int(value), int(count)] for value, count in zip(distinct.tolist(), counts.tolist())]
@@ -0,0 +1,150 @@
+"""
+Wire formats for views of the link graph.
+
+A view is a set of LinkGraph node ids plus the links between them, also as
+node ids (stable across index generations, so pages of an export and
+separate views can be joined). Views are written as:
+
+- JSON: ``{"nodes": [...], "edges": [...]}`` with the fields the visualizer
+  uses, edges referencing nodes by URL
+- NDJSON: one ``{"type": "node", ...}`` or ``{"type": "edge", ...}`` object
+  per line, produced in chunks so a whole-graph export never sits in memory
+- binary: fixed-width little-endian arrays plus one UTF-8 string block,
+  several times smaller than JSON and decodable without a JSON parser
+
+Binary layout::
+
+    magic     4s    b"NYGB"
+    version   u16   1
+    flags     u16   bit 0: titles included
+    nodes     u32   n
+    edges     u32   e
+    domains   u32   d
+    strings   u32   byte length of the string block
+    node_id   u32[n]
+    domain    u32[n]  index into the domain strings
+    size      u32[n]  words of content (0 if not crawled)
+    pagerank  f32[n]  0 if unknown
+    source    u32[e]  node ids
+    target    u32[e]  node ids
+    crawled   u8[n]
+    strings   n URLs, then n titles if flagged, then d domains, "\\n"-joined
+"""
+
+import json
+import struct
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+MAGIC = b"NYGB"
+BINARY_VERSION = 1
+HEADER = struct.Struct("<4sHHIIII")
+FLAG_TITLES = 1
+LABEL_CHARS = 50
+
+
+def node_records(graph, nodes: np.ndarray, pagerank: Optional[np.ndarray] = None,
+                 titles: bool = True) -> List[Dict[str, Any]]:
+    """JSON node objects for node ids, in the order given"""
+    domain_ids = np.asarray(graph.domain_ids)[nodes].tolist()
+    sizes = np.asarray(graph.sizes)[nodes].tolist()
+    crawled = (np.asarray(graph.node_segment)[nodes] >= 0).tolist()
+    scores = pagerank[nodes].tolist() if pagerank is not None else [None] * len(nodes)
+    records = []
+    for node, domain_id, size, is_crawled, score in zip(nodes.tolist(), domain_ids, sizes, crawled, scores):
+        url, title = graph.urls[node], graph.titles[node] or 'Untitled'
+        record = {
+            'id': url,
+            'label': title[:LABEL_CHARS] + ('...' if len(title) > LABEL_CHARS else ''),
+            'domain': graph.domains[domain_id],
+            'size': size,
+            'url': url,
+            'crawled': is_crawled
+        }
+        if titles:
+            record['title'] = title
+        if score is not None:
+            record['pagerank'] = score
+        records.append(record)
+    return records
+
+
+def edge_records(graph, sources: np.ndarray, targets: np.ndarray) -> List[Dict[str, Any]]:
+    urls = graph.urls
+    return [
+        {'source': urls[source], 'target': urls[target], 'weight': 1}
+        for source, target in zip(sources.tolist(), targets.tolist())
+    ]
+
+
+def to_json(graph, nodes: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+            pagerank: Optional[np.ndarray] = None, titles: bool = True) -> Dict[str, Any]:
+    return {
+        'nodes': node_records(graph, nodes, pagerank, titles),
+        'edges': edge_records(graph, sources, targets)
+    }
+
+
+def iter_ndjson(graph, pages: Iterator, pagerank: Optional[np.ndarray] = None, titles: bool = True,
+                dumps=None) -> Iterator[bytes]:
+    """
+    NDJSON lines for an iterator of (nodes, sources, targets) pages: each
+    page's nodes, then its edges.
+    """
+    dumps = dumps or (lambda payload: json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    for nodes, sources, targets in pages:
+        lines = [dumps(dict(record, type='node')) for record in node_records(graph, nodes, pagerank, titles)]
+        lines.extend(dumps(dict(record, type='edge')) for record in edge_records(graph, sources, targets))
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+
+
+def encode_binary(graph, nodes: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+                  pagerank: Optional[np.ndarray] = None, titles: bool = True) -> bytes:
+    """Encode a view in the binary layout described in the module docstring"""
+    nodes = np.asarray(nodes, dtype=np.int64)
+    # Only the domains the view uses, renumbered
+    used, domain_index = np.unique(np.asarray(graph.domain_ids)[nodes], return_inverse=True)
+    strings = [graph.urls[node] for node in nodes.tolist()]
+    if titles:
+        strings.extend(graph.titles[node] for node in nodes.tolist())
+    strings.extend(graph.domains[domain] for domain in used.tolist())
+    string_block = "\n".join(strings).encode("utf-8")
+
+    scores = pagerank[nodes] if pagerank is not None else np.zeros(len(nodes))
+    parts = [
+        HEADER.pack(MAGIC, BINARY_VERSION, FLAG_TITLES if titles else 0, len(nodes), len(sources),
+                    len(used), len(string_block)),
+        nodes.astype("<u4").tobytes(),
+        np.asarray(domain_index).astype("<u4").tobytes(),
+        np.asarray(graph.sizes)[nodes].astype("<u4").tobytes(),
+        np.asarray(scores).astype("<f4").tobytes(),
+        np.asarray(sources).astype("<u4").tobytes(),
+        np.asarray(targets).astype("<u4").tobytes(),
+        (np.asarray(graph.node_segment)[nodes] >= 0).astype(np.uint8).tobytes(),
+        string_block
+    ]
+    return b"".join(parts)
+
+
+def decode_binary(data: bytes) -> Dict[str, Any]:
+    """Decode encode_binary() output into arrays and string lists"""
+    magic, version, flags, num_nodes, num_edges, num_domains, string_bytes = HEADER.unpack_from(data)
+    if magic != MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"Not a version {BINARY_VERSION} binary graph")
+    offset = HEADER.size
+    arrays = {}
+    for name, dtype, count in (("node_ids", "<u4", num_nodes), ("domain", "<u4", num_nodes),
+                               ("sizes", "<u4", num_nodes), ("pagerank", "<f4", num_nodes),
+                               ("sources", "<u4", num_edges), ("targets", "<u4", num_edges),
+                               ("crawled", "u1", num_nodes)):
+        arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += arrays[name].nbytes
+    block = data[offset:offset + string_bytes].decode("utf-8")
+    strings = block.split("\n") if block else []
+    arrays["urls"] = strings[:num_nodes]
+    titled = bool(flags & FLAG_TITLES)
+    arrays["titles"] = strings[num_nodes:2 * num_nodes] if titled else None
+    arrays["domains"] = strings[(2 if titled else 1) * num_nodes:]
+    return arrays
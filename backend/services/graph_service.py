@@ -1,18 +1,86 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Optional, Tuple
 from collections import defaultdict
-from urllib.parse import urlparse
-import os
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+from .graph_algorithms import (
+    bfs_levels, hits, k_shortest_paths, neighbors, quotient_graph,
+    strongly_connected_components, weakly_connected_components
+)
+from .link_graph import LinkGraph
+from .metrics import metrics, active_timeline
+from .pagerank import pagerank
+
+GRAPH_SECONDS = metrics.histogram(
+    "nayuta_graph_seconds", "Duration of graph computations", ("operation",)
+)
+
+
+@contextmanager
+def graph_stage(name: str):
+    """Time part of a graph operation into the active request Timeline"""
+    timeline = active_timeline()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timeline is not None:
+            timeline.add(name, time.perf_counter() - start, start - timeline.start)
+
+
+def graph_operation(name: str):
+    """Time a graph computation into the metrics and the active request Timeline"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            timeline = active_timeline()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                GRAPH_SECONDS.observe(seconds, operation=name)
+                if timeline is not None:
+                    timeline.add(name, seconds, start - timeline.start)
+        return wrapper
+    return decorator
 
 
 class CrawlGraphService:
     """
     Builds and analyzes the web graph of crawled pages.
     Provides data for visualization of links between crawled documents.
+
+    Every method runs over a LinkGraph: interned URL ids and CSR/CSC link
+    arrays saved next to the index (``<index>.graph/``) and brought up to
+    date incrementally when the index gains a new generation. The graph
+    store is opened on first use.
     """
 
-    def __init__(self, index):
+    def __init__(self, index, graph_path: str = None):
         self.index = index
-
+        self.graph_path = graph_path or str(index.storage.folder).rstrip("/\\") + ".graph"
+        self._graph = None
+        self._lock = threading.Lock()
+        # Last PageRank per personalization, by node id, to warm-start the next run
+        self._pagerank_starts = {}
+        self._subgraph = None
+
+    def link_graph(self):
+        """The LinkGraph for the index's latest generation"""
+
+        with self._lock:
+            graph = self._graph
+            if graph is None or graph.generation != self.index.latest_generation():
+                with graph_stage("link_graph"), self.index.searcher() as searcher:
+                    graph = self._graph = LinkGraph.open_or_build(searcher, self.graph_path)
+            return graph
+
+    @graph_operation("build_graph")
     def build_graph(self) -> Dict[str, Any]:
         """
         Build network graph from indexed documents.
@@ -20,53 +88,30 @@ class CrawlGraphService:
         Returns:
             Dictionary with nodes (pages) and edges (links)
         """
+        graph = self.link_graph()
+        urls, titles, domains = graph.urls, graph.titles, graph.domains
+        domain_ids = graph.domain_ids.tolist()
+        sizes = graph.sizes.tolist()
+        crawled = graph.crawled_nodes().tolist()
+
         nodes = []
-        edges = []
         domain_stats = defaultdict(int)
-
-        with self.index.searcher() as searcher:
-            # Get all documents
-            for docnum in range(searcher.doc_count_all()):
-                try:
-                    doc = searcher.stored_fields(docnum)
-
-                    url = doc.get('url', '')
-                    title = doc.get('title', 'Untitled')
-                    content = doc.get('content', '')
-
-                    # Extract domain
-                    domain = urlparse(url).netloc
-                    domain_stats[domain] += 1
-
-                    # Calculate node properties
-                    content_length = len(content.split())
-
-                    nodes.append({
-                        'id': url,
-                        'label': title[:50] + ('...' if len(title) > 50 else ''),
-                        'title': title,
-                        'domain': domain,
-                        'size': content_length,
-                        'url': url
-                    })
-
-                    # Extract links (if available in schema)
-                    if 'links' in doc:
-                        links = doc.get('links', '')
-                        if links:
-                            # Links are comma-separated
-                            outgoing_links = [l.strip() for l in links.split(',') if l.strip()]
-
-                            for target_url in outgoing_links:
-                                edges.append({
-                                    'source': url,
-                                    'target': target_url,
-                                    'weight': 1
-                                })
-
-                except Exception as e:
-                    # Skip documents that can't be processed
-                    continue
+        for node in crawled:
+            url, title, domain = urls[node], titles[node] or 'Untitled', domains[domain_ids[node]]
+            domain_stats[domain] += 1
+            nodes.append({
+                'id': url,
+                'label': title[:50] + ('...' if len(title) > 50 else ''),
+                'title': title,
+                'domain': domain,
+                'size': sizes[node],
+                'url': url
+            })
+
+        edges = [
+            {'source': urls[source], 'target': urls[target], 'weight': 1}
+            for source, target in zip(graph.edge_sources().tolist(), graph.out_targets.tolist())
+        ]
 
         return {
             'nodes': nodes,
@@ -79,155 +124,366 @@ class CrawlGraphService:
             }
         }
 
-    def calculate_pagerank(self, iterations: int = 20, damping: float = 0.85) -> Dict[str, float]:
+    def calculate_pagerank(self, iterations: int = 100, damping: float = 0.85, tol: float = 1e-6,
+                           domains: Optional[Iterable[str]] = None) -> Dict[str, float]:
         """
         Calculate PageRank scores for all documents.
 
         Args:
-            iterations: Number of iterations for PageRank algorithm
+            iterations: Maximum number of power iterations
             damping: Damping factor (default: 0.85)
+            tol: Stop early once scores change by less than this (L1)
+            domains: Personalize: teleport only to pages of these domains
 
         Returns:
             Dictionary mapping URLs to PageRank scores
         """
-        graph = self.build_graph()
-        nodes = {node['id']: node for node in graph['nodes']}
-        edges = graph['edges']
+        result, nodes = self.pagerank(iterations, damping, tol, domains)
+        urls = self.link_graph().urls
+        return {urls[node]: score for node, score in zip(nodes.tolist(), result.scores.tolist())}
 
-        # Build adjacency structures
-        outgoing = defaultdict(list)
-        incoming = defaultdict(list)
+    @graph_operation("pagerank")
+    def pagerank(self, iterations: int = 100, damping: float = 0.85, tol: float = 1e-6,
+                 domains: Optional[Iterable[str]] = None) -> Tuple[Any, Any]:
+        """
+        PageRank over the crawled pages (links to pages that were never
+        crawled are left out, so only indexed documents hold rank).
 
-        for edge in edges:
-            source = edge['source']
-            target = edge['target']
-            outgoing[source].append(target)
-            incoming[target].append(source)
+        Returns:
+            (PageRankResult, node ids of the scores)
+        """
 
-        # Initialize PageRank scores
-        num_nodes = len(nodes)
-        pagerank = {url: 1.0 / num_nodes for url in nodes.keys()}
+        graph = self.link_graph()
+        nodes, sources, targets = self.crawled_subgraph(graph)
+
+        key = tuple(sorted(set(domains or ())))
+        personalization = None
+        if key:
+            wanted = [i for i, domain in enumerate(graph.domains) if domain in key]
+            personalization = np.isin(np.asarray(graph.domain_ids)[nodes], wanted).astype(np.float64)
+
+        # Node ids are stable across graph updates, so the previous solution
+        # is a close starting point after a small change
+        start = None
+        previous = self._pagerank_starts.get(key)
+        if previous is not None and len(nodes):
+            start = np.zeros(len(nodes))
+            known = nodes < len(previous)
+            start[known] = previous[nodes[known]]
+            start[start <= 0] = start[start > 0].mean() if (start > 0).any() else 1.0
+
+        result = pagerank(len(nodes), sources, targets, damping, tol, iterations, personalization, start)
+        if len(self._pagerank_starts) >= 32:
+            self._pagerank_starts.clear()
+        scores_by_node = np.zeros(graph.num_nodes)
+        scores_by_node[nodes] = result.scores
+        self._pagerank_starts[key] = scores_by_node
+        return result, nodes
+
+    def seed_pagerank(self, scores_by_node, domains: Optional[Iterable[str]] = None):
+        """
+        Warm-start the next pagerank() for domains from scores_by_node
+        (indexed by node id), such as a saved snapshot's after a restart.
+        A start left by an earlier run in this process is kept instead.
+        """
 
-        # Iterate PageRank algorithm
-        for _ in range(iterations):
-            new_pagerank = {}
+        key = tuple(sorted(set(domains or ())))
+        self._pagerank_starts.setdefault(key, scores_by_node)
 
-            for url in nodes.keys():
-                # Calculate contribution from incoming links
-                rank_sum = 0.0
-                for source_url in incoming[url]:
-                    out_degree = len(outgoing[source_url])
-                    if out_degree > 0:
-                        rank_sum += pagerank[source_url] / out_degree
+    def crawled_subgraph(self, graph=None) -> Tuple[Any, Any, Any]:
+        """
+        The links between crawled pages, renumbered 0..n-1 (links to pages
+        that were never crawled are dropped).
 
-                # Apply PageRank formula
-                new_pagerank[url] = (1 - damping) / num_nodes + damping * rank_sum
+        Returns:
+            (node id of each compact id, edge sources, edge targets)
+        """
 
-            pagerank = new_pagerank
+        graph = graph or self.link_graph()
+        cached = self._subgraph
+        if cached is not None and cached[0] is graph:
+            return cached[1]
+        with graph_stage("crawled_subgraph"):
+            nodes = graph.crawled_nodes()
+            compact = np.full(graph.num_nodes, -1, dtype=np.int64)
+            compact[nodes] = np.arange(len(nodes))
+            sources, targets = compact[graph.edge_sources()], compact[np.asarray(graph.out_targets)]
+            inside = (sources >= 0) & (targets >= 0)
+            subgraph = (nodes, sources[inside], targets[inside])
+        self._subgraph = (graph, subgraph)
+        return subgraph
+
+    # ------------------------------------------------------------------
+    # Views: node ids plus the links among them, see graph_export
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def induced_links(graph, nodes) -> Tuple[Any, Any]:
+        """Links between the given nodes, as (sources, targets) node ids"""
+
+        selected = np.zeros(graph.num_nodes, dtype=bool)
+        selected[nodes] = True
+        sources, targets = neighbors(graph.out_offsets, graph.out_targets, nodes)
+        inside = selected[targets]
+        return sources[inside], targets[inside]
+
+    @graph_operation("graph_page")
+    def graph_page(self, offset: int = 0, limit: int = 1000) -> Tuple[Any, Any, Any, int]:
+        """
+        One page of the crawled pages in node id order, with their links to
+        other crawled pages (each link is on the page of its source).
 
-        return pagerank
+        Returns:
+            (nodes, link sources, link targets, total crawled pages)
+        """
+
+        graph = self.link_graph()
+        crawled = graph.crawled_nodes()
+        nodes = crawled[max(offset, 0):max(offset, 0) + max(limit, 0)]
+        if len(nodes) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return nodes, empty, empty, len(crawled)
+        # Only crawled pages have out-links, so the page's links are one CSR range
+        start, end = int(graph.out_offsets[nodes[0]]), int(graph.out_offsets[nodes[-1] + 1])
+        sources = graph.edge_sources()[start:end].astype(np.int64)
+        targets = np.asarray(graph.out_targets[start:end], dtype=np.int64)
+        inside = graph.crawled[targets]
+        return nodes, sources[inside], targets[inside], len(crawled)
+
+    def iter_graph_pages(self, page_size: int = 10000):
+        """Every crawled page and link between crawled pages, page by page"""
+        offset = 0
+        while True:
+            nodes, sources, targets, total = self.graph_page(offset, page_size)
+            if len(nodes) == 0:
+                return
+            yield nodes, sources, targets
+            offset += len(nodes)
+
+    @graph_operation("top_subgraph")
+    def top_subgraph(self, scores, limit: int = 500) -> Tuple[Any, Any, Any]:
+        """
+        The limit crawled pages with the highest scores (e.g. PageRank by
+        node id) and the links among them, best first.
+        """
 
-    def get_domain_clusters(self) -> Dict[str, List[str]]:
+        graph = self.link_graph()
+        crawled = graph.crawled_nodes()
+        scores = np.asarray(scores)[crawled]
+        limit = min(max(limit, 0), len(crawled))
+        top = np.argpartition(-scores, limit - 1)[:limit] if 0 < limit < len(crawled) else np.arange(limit)
+        nodes = crawled[top[np.lexsort((crawled[top], -scores[top]))]]
+        return (nodes,) + self.induced_links(graph, nodes)
+
+    @graph_operation("ego_network")
+    def ego_network(self, url: str, radius: int = 1, limit: int = 500,
+                    direction: str = "both") -> Optional[Tuple[Any, Any, Any, bool]]:
         """
-        Group documents by domain.
+        Pages within radius links of a URL, crawled or not, and the links
+        among them. Links are followed forwards ("out"), backwards ("in") or
+        both ways; the last ring is cut off once limit nodes are reached.
 
         Returns:
-            Dictionary mapping domains to lists of URLs
+            (nodes nearest first, link sources, link targets, truncated), or
+            None if the URL is not in the graph
         """
-        clusters = defaultdict(list)
 
-        with self.index.searcher() as searcher:
-            for docnum in range(searcher.doc_count_all()):
-                try:
-                    doc = searcher.stored_fields(docnum)
-                    url = doc.get('url', '')
-                    domain = urlparse(url).netloc
+        graph = self.link_graph()
+        center = graph.node_id(url)
+        if center < 0:
+            return None
+
+        seen = np.zeros(graph.num_nodes, dtype=bool)
+        seen[center] = True
+        rings = [np.array([center], dtype=np.int64)]
+        count, truncated = 1, False
+        for _ in range(radius):
+            reached = []
+            if direction in ("out", "both"):
+                reached.append(neighbors(graph.out_offsets, graph.out_targets, rings[-1])[1])
+            if direction in ("in", "both"):
+                reached.append(neighbors(graph.in_offsets, graph.in_sources, rings[-1])[1])
+            ring = np.unique(np.concatenate(reached))
+            ring = ring[~seen[ring]]
+            if count + len(ring) > limit:
+                ring, truncated = ring[:max(limit - count, 0)], True
+            if len(ring) == 0:
+                break
+            seen[ring] = True
+            rings.append(ring)
+            count += len(ring)
+            if truncated:
+                break
+
+        nodes = np.concatenate(rings)
+        return (nodes,) + self.induced_links(graph, nodes) + (truncated,)
+
+    @graph_operation("hits")
+    def hits(self, iterations: int = 100, tol: float = 1e-8) -> Tuple[Any, Any]:
+        """
+        HITS hub and authority scores over the crawled pages.
 
-                    clusters[domain].append(url)
-                except:
-                    continue
+        Returns:
+            (HitsResult, node ids of the scores)
+        """
 
-        return dict(clusters)
+        nodes, sources, targets = self.crawled_subgraph()
+        return hits(len(nodes), sources, targets, tol, iterations), nodes
 
-    def get_graph_statistics(self) -> Dict[str, Any]:
+    @graph_operation("components")
+    def components(self, strong: bool = False) -> Tuple[Any, Any]:
         """
-        Calculate comprehensive graph statistics.
+        Connected components of the crawled pages: weak (links followed
+        either way) or strong (mutually reachable).
 
         Returns:
-            Dictionary with various graph metrics
+            (component label of each node, node ids)
         """
-        graph = self.build_graph()
-        nodes = graph['nodes']
-        edges = graph['edges']
 
-        # Count node degrees
-        in_degree = defaultdict(int)
-        out_degree = defaultdict(int)
+        nodes, sources, targets = self.crawled_subgraph()
+        find = strongly_connected_components if strong else weakly_connected_components
+        return find(len(nodes), sources, targets), nodes
 
-        for edge in edges:
-            out_degree[edge['source']] += 1
-            in_degree[edge['target']] += 1
+    @graph_operation("domain_graph")
+    def domain_graph(self) -> Dict[str, Any]:
+        """
+        The link graph collapsed to domains: one edge per ordered pair of
+        domains, weighted by the links between their pages. Links to pages
+        that were not crawled count towards their domain.
 
-        # Calculate statistics
-        degrees = [out_degree[node['id']] + in_degree[node['id']] for node in nodes]
-        avg_degree = sum(degrees) / max(len(degrees), 1)
-        max_degree = max(degrees) if degrees else 0
+        Returns:
+            Dictionary with nodes (domains) and weighted edges
+        """
+
+        graph = self.link_graph()
+        domain_ids = np.asarray(graph.domain_ids)
+        num_domains = len(graph.domains)
+        pages = np.bincount(domain_ids[graph.crawled_nodes()], minlength=num_domains)
+        sources, targets, links = quotient_graph(domain_ids, graph.edge_sources(), graph.out_targets, num_domains)
+        linked = np.zeros(num_domains, dtype=bool)
+        linked[sources] = linked[targets] = True
+
+        domains = graph.domains
+        return {
+            'nodes': [
+                {'id': domains[i], 'pages': int(pages[i])}
+                for i in np.flatnonzero(linked | (pages > 0)).tolist()
+            ],
+            'edges': [
+                {'source': domains[source], 'target': domains[target], 'weight': weight}
+                for source, target, weight in zip(sources.tolist(), targets.tolist(), links.tolist())
+            ]
+        }
+
+    @graph_operation("statistics")
+    def get_graph_statistics(self, hits=None) -> Dict[str, Any]:
+        """
+        Calculate comprehensive graph statistics.
+
+        Args:
+            hits: (HitsResult, node ids) from hits(), computed if not given
+
+        Returns:
+            Dictionary with various graph metrics
+        """
+
+        graph = self.link_graph()
+        crawled, sources, _ = self.crawled_subgraph(graph)
+        num_nodes, num_edges = len(crawled), graph.num_edges
+        out_degree = graph.out_degree()[crawled]
+        in_degree = graph.in_degree()[crawled]
+        degrees = out_degree + in_degree
+        result, _ = hits or self.hits()
 
-        # Find hub and authority nodes
-        hubs = sorted(
-            [(node['id'], out_degree[node['id']]) for node in nodes],
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
+        def top(scores, degree):
+            order = np.argsort(-scores, kind="stable")[:10]
+            return [(graph.urls[node], float(score), int(value))
+                    for node, score, value in zip(crawled[order].tolist(), scores[order].tolist(), degree[order])]
 
-        authorities = sorted(
-            [(node['id'], in_degree[node['id']]) for node in nodes],
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
+        domain_ids = np.asarray(graph.domain_ids)[crawled]
+        domain_counts = np.bincount(domain_ids, minlength=len(graph.domains)) if num_nodes else []
 
         return {
-            'total_nodes': len(nodes),
-            'total_edges': len(edges),
-            'avg_degree': round(avg_degree, 2),
-            'max_degree': max_degree,
-            'density': round(len(edges) / max((len(nodes) * (len(nodes) - 1)), 1), 4),
-            'top_hubs': [{'url': url, 'out_degree': degree} for url, degree in hubs],
-            'top_authorities': [{'url': url, 'in_degree': degree} for url, degree in authorities],
-            'domains': graph['stats']['domains']
+            'total_nodes': num_nodes,
+            'total_edges': num_edges,
+            'avg_degree': round(float(degrees.mean()) if num_nodes else 0.0, 2),
+            'max_degree': int(degrees.max()) if num_nodes else 0,
+            # Only links between crawled pages can fill the n * (n - 1) possible pairs
+            'density': round(len(sources) / max((num_nodes * (num_nodes - 1)), 1), 4),
+            'top_hubs': [
+                {'url': url, 'hub_score': score, 'out_degree': degree}
+                for url, score, degree in top(result.hubs, out_degree)
+            ],
+            'top_authorities': [
+                {'url': url, 'authority_score': score, 'in_degree': degree}
+                for url, score, degree in top(result.authorities, in_degree)
+            ],
+            'domains': {graph.domains[i]: int(count) for i, count in enumerate(domain_counts) if count}
         }
 
-    def get_shortest_path(self, source_url: str, target_url: str) -> List[str]:
+    def get_shortest_path(self, source_url: str, target_url: str, max_hops: Optional[int] = None) -> List[str]:
         """
-        Find shortest path between two URLs using BFS.
+        Find shortest path between two URLs using bidirectional BFS.
 
         Args:
             source_url: Starting URL
             target_url: Destination URL
+            max_hops: Longest path worth finding (unlimited if None)
 
         Returns:
-            List of URLs representing the shortest path
+            List of URLs representing the shortest path (empty if none)
         """
-        graph = self.build_graph()
+        paths = self.get_paths(source_url, target_url, 1, max_hops)
+        return paths[0] if paths else []
 
-        # Build adjacency list
-        adjacency = defaultdict(list)
-        for edge in graph['edges']:
-            adjacency[edge['source']].append(edge['target'])
-
-        # BFS to find shortest path
-        queue = [(source_url, [source_url])]
-        visited = {source_url}
+    @graph_operation("shortest_path")
+    def get_paths(self, source_url: str, target_url: str, k: int = 1,
+                  max_hops: Optional[int] = None) -> Optional[List[List[str]]]:
+        """
+        Up to k shortest loop-free link paths between two URLs, shortest first.
 
-        while queue:
-            current, path = queue.pop(0)
+        Returns:
+            Paths as lists of URLs, or None if either URL is not in the graph
+        """
 
-            if current == target_url:
-                return path
+        graph = self.link_graph()
+        source, target = graph.node_id(source_url), graph.node_id(target_url)
+        if source < 0 or target < 0:
+            return None
+        paths = k_shortest_paths(graph.out_offsets, graph.out_targets, graph.in_offsets, graph.in_sources,
+                                 source, target, k, max_hops)
+        return [[graph.urls[node] for node in path] for path in paths]
+
+    @graph_operation("reachable")
+    def get_reachable(self, url: str, max_hops: int = 2, direction: str = "out",
+                      limit: int = 1000) -> Optional[Dict[str, Any]]:
+        """
+        Pages within max_hops links of a URL, following links forwards
+        ("out": pages it leads to) or backwards ("in": pages leading to it).
 
-            for neighbor in adjacency[current]:
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append((neighbor, path + [neighbor]))
+        Returns:
+            Dictionary with the nearest pages (up to limit) and their hop
+            counts, and the number of pages at each distance; None if the
+            URL is not in the graph
+        """
 
-        return []  # No path found
+        graph = self.link_graph()
+        start = graph.node_id(url)
+        if start < 0:
+            return None
+        if direction == "out":
+            nodes, hops = bfs_levels(graph.out_offsets, graph.out_targets, start, max_hops)
+        else:
+            nodes, hops = bfs_levels(graph.in_offsets, graph.in_sources, start, max_hops)
+        counts = np.bincount(hops)
+        return {
+            'url': url,
+            'direction': direction,
+            'total': int(len(nodes) - 1),
+            'by_hops': {int(hop): int(count) for hop, count in enumerate(counts.tolist()) if hop},
+            'pages': [
+                {'url': graph.urls[node], 'hops': int(hop)}
+                for node, hop in zip(nodes[1:limit + 1].tolist(), hops[1:limit + 1].tolist())
+            ],
+            'truncated': bool(len(nodes) - 1 > limit)
+        }
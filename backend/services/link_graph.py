@@ -0,0 +1,382 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from array import array
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+FORMAT_VERSION = 2
+ARRAYS = ("domain_ids", "sizes", "node_segment", "node_local",
+          "out_offsets", "out_targets", "in_offsets", "in_sources", "url_hashes", "url_order")
+STRINGS = ("urls", "titles", "domains")
+
+
+def _csr(rows: np.ndarray, cols: np.ndarray, num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Offsets and column ids of the edges (rows[i], cols[i]) grouped by row, columns sorted"""
+    order = np.lexsort((cols, rows))
+    counts = np.bincount(rows, minlength=num_nodes) if len(rows) else np.zeros(num_nodes, dtype=np.int64)
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, cols[order].astype(np.int32)
+
+
+def _one_line(text: str) -> str:
+    return " ".join(text.split()) if "\n" in text or "\r" in text else text
+
+
+def url_hash(url: str) -> int:
+    """Stable 64-bit hash of a URL (Python's hash() differs between processes)"""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _url_index(urls) -> Tuple[np.ndarray, np.ndarray]:
+    """URL hashes, sorted, and the node id of each"""
+    hashes = np.fromiter((url_hash(url) for url in urls), dtype=np.uint64, count=len(urls))
+    order = np.argsort(hashes, kind="stable").astype(np.int32)
+    return hashes[order], order
+
+
+class StringTable:
+    """
+    Read-only list of strings packed as UTF-8 into one buffer, with the
+    start of string i at ``offsets[i]``. Loaded memory-mapped, so processes
+    serving the same graph share the pages instead of each holding a list
+    of Python strings.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = memoryview(data)
+        self.offsets = memoryview(offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @staticmethod
+    def save(strings, path: str):
+        """Write strings as ``<path>.bin`` and ``<path>.offsets.npy``"""
+        offsets = array("q", [0])
+        with open(f"{path}.bin", "wb") as f:
+            for text in strings:
+                data = text.encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        np.save(f"{path}.offsets.npy", np.frombuffer(offsets, dtype=np.int64))
+
+    @classmethod
+    def load(cls, path: str) -> "StringTable":
+        offsets = np.load(f"{path}.offsets.npy", mmap_mode="r")
+        # np.memmap cannot map an empty file
+        data = np.memmap(f"{path}.bin", dtype=np.uint8, mode="r") if offsets[-1] else b""
+        return cls(data, offsets)
+
+
+class LinkGraph:
+    """
+    The crawl's link graph as integer arrays.
+
+    Every URL seen, crawled or only linked to, is interned to a node id.
+    Out-links of node i are ``out_targets[out_offsets[i]:out_offsets[i + 1]]``
+    (CSR) and in-links are ``in_sources[in_offsets[i]:in_offsets[i + 1]]``
+    (CSC); both are sorted and free of duplicates and self-links.
+
+    Crawled nodes remember the index segment and segment-local docnum they
+    came from (``node_segment`` is -1 for URLs that were only linked to).
+    That lets a new index generation be applied incrementally: only
+    documents in segments the graph has not seen are read, and node ids
+    stay stable, so per-node results can be carried over between versions.
+
+    Saved as ``<path>/gen-<generation>/``: .npy arrays and packed URL,
+    title and domain strings, all opened memory-mapped so every worker
+    serving the index shares one copy. URLs are looked up through their
+    hashes (``url_hashes``, sorted, with the node of each in ``url_order``)
+    rather than a dict.
+    """
+
+    def __init__(self, generation: int, segments: List[Tuple[str, int]], urls: List[str], titles: List[str],
+                 domains: List[str], arrays: Dict[str, np.ndarray]):
+        self.generation = generation
+        self.segments = [tuple(segment) for segment in segments]
+        self.urls = urls
+        self.titles = titles
+        self.domains = domains
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.urls)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.out_targets)
+
+    def node_id(self, url: str) -> int:
+        """Node id of a URL, or -1 if it is not in the graph"""
+        key = np.uint64(url_hash(url))
+        position = int(np.searchsorted(self.url_hashes, key))
+        while position < len(self.url_hashes) and self.url_hashes[position] == key:
+            node = int(self.url_order[position])
+            if self.urls[node] == url:
+                return node
+            position += 1
+        return -1
+
+    def node_ids(self, urls: List[str]) -> np.ndarray:
+        """Node id of each URL (-1 where it is not in the graph)"""
+        if not len(urls) or not self.num_nodes:
+            return np.full(len(urls), -1, dtype=np.int64)
+        keys = np.fromiter((url_hash(url) for url in urls), dtype=np.uint64, count=len(urls))
+        positions = np.minimum(np.searchsorted(self.url_hashes, keys), self.num_nodes - 1)
+        nodes = np.asarray(self.url_order)[positions].astype(np.int64)
+        for i in np.flatnonzero(np.asarray(self.url_hashes)[positions] != keys).tolist():
+            nodes[i] = -1
+        # Equal hashes almost always mean equal URLs; check, and resolve collisions one by one
+        for i, (url, node) in enumerate(zip(urls, nodes.tolist())):
+            if node >= 0 and self.urls[node] != url:
+                nodes[i] = self.node_id(url)
+        return nodes
+
+    @property
+    def crawled(self) -> np.ndarray:
+        return np.asarray(self.node_segment) >= 0
+
+    def crawled_nodes(self) -> np.ndarray:
+        """Ids of the nodes that are indexed documents, ascending"""
+        return np.flatnonzero(self.crawled)
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.out_offsets)
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.in_offsets)
+
+    def out_links(self, node: int) -> np.ndarray:
+        return self.out_targets[self.out_offsets[node]:self.out_offsets[node + 1]]
+
+    def in_links(self, node: int) -> np.ndarray:
+        return self.in_sources[self.in_offsets[node]:self.in_offsets[node + 1]]
+
+    def edge_sources(self) -> np.ndarray:
+        """Source node of each edge, aligned with out_targets"""
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), self.out_degree())
+
+    # ------------------------------------------------------------------
+    # Building and persistence
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def index_segments(searcher) -> List[Tuple[str, int]]:
+        """(segment id, deleted count) of each segment, in docnum order"""
+        return [(leaf.segment().segment_id(), leaf.segment().deleted_count())
+                for leaf, _ in searcher.reader().leaf_readers()]
+
+    @classmethod
+    def open_or_build(cls, searcher, path: str) -> "LinkGraph":
+        """
+        Load the saved graph for the searcher's index, bringing it up to
+        date (and saving the result) if the index has changed since.
+
+        Freshness is decided by segments, not the generation number: a
+        commit that adds nothing (a crawl where every fetch failed) moves
+        the generation on without changing a segment, and the saved graph
+        is then returned stamped with the new generation.
+        """
+        previous = cls.load_latest(path)
+        if previous is not None and previous.segments == cls.index_segments(searcher):
+            previous.generation = searcher.reader().generation()
+            return previous
+        graph = cls.build(searcher, previous)
+        # Serve the mapped files rather than the lists the build produced
+        return cls.load(graph.save(path))
+
+    @classmethod
+    def load_latest(cls, path: str) -> Optional["LinkGraph"]:
+        """The most recently saved graph under path, or None"""
+        try:
+            names = [name for name in os.listdir(path) if name.startswith("gen-")]
+        except OSError:
+            return None
+        for name in sorted(names, key=lambda n: int(n[4:]) if n[4:].isdigit() else -1, reverse=True):
+            try:
+                return cls.load(os.path.join(path, name))
+            except (OSError, ValueError, KeyError):
+                continue
+        return None
+
+    @classmethod
+    def load(cls, directory: str) -> "LinkGraph":
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported link graph version in {directory}")
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        strings = {name: StringTable.load(os.path.join(directory, name)) for name in STRINGS}
+        return cls(meta["generation"], meta["segments"], strings["urls"], strings["titles"],
+                   strings["domains"], arrays)
+
+    def save(self, path: str) -> str:
+        """
+        Write this graph as ``<path>/gen-<generation>/``, staging it in a
+        temporary directory first, and remove older generations.
+        """
+        directory = os.path.join(path, f"gen-{self.generation}")
+        os.makedirs(path, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".gen-{self.generation}-", dir=path)
+        try:
+            for name in ARRAYS:
+                np.save(os.path.join(staging, f"{name}.npy"), np.asarray(getattr(self, name)))
+            for name in STRINGS:
+                StringTable.save(getattr(self, name), os.path.join(staging, name))
+            meta = {
+                "version": FORMAT_VERSION,
+                "generation": self.generation,
+                "segments": self.segments,
+                "nodes": self.num_nodes,
+                "edges": self.num_edges
+            }
+            with open(os.path.join(staging, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+            if os.path.exists(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                # Another process published this generation first
+                shutil.rmtree(staging, ignore_errors=True)
+        except:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        for name in os.listdir(path):
+            if name.startswith("gen-") and name != f"gen-{self.generation}":
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        return directory
+
+    @classmethod
+    def build(cls, searcher, previous: Optional["LinkGraph"] = None) -> "LinkGraph":
+        """
+        Build the graph for the searcher's generation.
+
+        With a previous graph, segments it already covers (same id, same
+        deletions) are kept as they are and only the documents of new or
+        changed segments are read; otherwise every document is read.
+        """
+        reader = searcher.reader()
+        leaves = reader.leaf_readers()
+        segments = cls.index_segments(searcher)
+
+        if previous is not None:
+            urls = list(previous.urls)
+            titles = list(previous.titles)
+            domains = list(previous.domains)
+            domain_ids = array("i", np.asarray(previous.domain_ids, dtype=np.int32).tobytes())
+            sizes = array("i", np.asarray(previous.sizes, dtype=np.int32).tobytes())
+            node_local = array("i", np.asarray(previous.node_local, dtype=np.int32).tobytes())
+
+            # Old segment index -> new segment index, or -1 if it must be re-read
+            current = {segment: i for i, segment in enumerate(segments)}
+            remap = np.array([current.get(segment, -1) for segment in previous.segments] + [-1], dtype=np.int32)
+            old_segment = np.asarray(previous.node_segment, dtype=np.int32)
+            new_segment = remap[old_segment]  # -1 indexes the trailing -1
+            node_segment = array("i", new_segment.tobytes())
+
+            # Out-links of documents whose segment is gone are rebuilt below
+            sources = previous.edge_sources()
+            keep = new_segment[sources] >= 0
+            old_sources, old_targets = sources[keep], np.asarray(previous.out_targets)[keep]
+            for i in np.flatnonzero((old_segment >= 0) & (new_segment < 0)):
+                titles[i] = ""
+                sizes[i] = 0
+            kept = set(remap[remap >= 0].tolist())
+            reread = [i for i in range(len(segments)) if i not in kept]
+        else:
+            urls, titles, domains = [], [], []
+            domain_ids, sizes, node_segment, node_local = array("i"), array("i"), array("i"), array("i")
+            old_sources = old_targets = np.zeros(0, dtype=np.int32)
+            reread = list(range(len(segments)))
+
+        url_ids = {url: i for i, url in enumerate(urls)}
+        domain_index = {domain: i for i, domain in enumerate(domains)}
+
+        def intern(url: str) -> int:
+            node = url_ids.get(url)
+            if node is None:
+                node = url_ids[url] = len(urls)
+                urls.append(url)
+                titles.append("")
+                domain = urlparse(url).netloc
+                if domain not in domain_index:
+                    domain_index[domain] = len(domains)
+                    domains.append(domain)
+                domain_ids.append(domain_index[domain])
+                sizes.append(0)
+                node_segment.append(-1)
+                node_local.append(0)
+            return node
+
+        new_sources, new_targets = array("i"), array("i")
+        for segment_index in reread:
+            leaf, _ = leaves[segment_index]
+            for docnum, doc in leaf.iter_docs():
+                url = doc.get("url", "")
+                if not url:
+                    continue
+                node = intern(url)
+                titles[node] = _one_line(doc.get("title", "") or "")
+                sizes[node] = len((doc.get("content", "") or "").split())
+                node_segment[node] = segment_index
+                node_local[node] = docnum
+                for target in (doc.get("links", "") or "").split(","):
+                    target = target.strip()
+                    if target:
+                        new_sources.append(node)
+                        new_targets.append(intern(target))
+
+        num_nodes = len(urls)
+        sources = np.concatenate([old_sources, np.frombuffer(new_sources, dtype=np.int32)]).astype(np.int64)
+        targets = np.concatenate([old_targets, np.frombuffer(new_targets, dtype=np.int32)]).astype(np.int64)
+        # Collapse duplicate links and drop self-links
+        if len(sources):
+            keys = np.unique(sources * num_nodes + targets)
+            sources, targets = keys // num_nodes, keys % num_nodes
+            loops = sources == targets
+            sources, targets = sources[~loops], targets[~loops]
+
+        out_offsets, out_targets = _csr(sources, targets, num_nodes)
+        in_offsets, in_sources = _csr(targets, sources, num_nodes)
+        url_hashes, url_order = _url_index(urls)
+        arrays = {
+            "domain_ids": np.frombuffer(domain_ids, dtype=np.int32),
+            "sizes": np.frombuffer(sizes, dtype=np.int32),
+            "node_segment": np.frombuffer(node_segment, dtype=np.int32),
+            "node_local": np.frombuffer(node_local, dtype=np.int32),
+            "out_offsets": out_offsets,
+            "out_targets": out_targets,
+            "in_offsets": in_offsets,
+            "in_sources": in_sources,
+            "url_hashes": url_hashes,
+            "url_order": url_order
+        }
+        return cls(reader.generation(), segments, urls, titles, domains, arrays)
+
+    def docnums(self, searcher) -> np.ndarray:
+        """Global docnum of each node in the searcher's generation (-1 if not crawled)"""
+        offsets = np.array([offset for _, offset in searcher.reader().leaf_readers()] + [0], dtype=np.int64)
+        node_segment = np.asarray(self.node_segment)
+        docnums = offsets[node_segment] + np.asarray(self.node_local)
+        docnums[node_segment < 0] = -1
+        return docnums
@@ -0,0 +1,80 @@
+"""
+Loader election for workers serving the same index.
+
+Several worker processes can serve one index. Read-only structures derived
+from it (the link graph, graph analytics, static rank scores) are written
+once as memory-mapped files next to the index and attached to by every
+worker, so each must be computed by one process only: the loader. The
+loader is whichever process holds an exclusive lock on
+``<index>.loader``; the others wait for its files to appear. The lock
+goes away with the process, so if the loader dies another worker takes
+over the next time it checks.
+
+Files each worker writes for itself (its query log, its metrics textfile)
+are numbered by a worker slot claimed the same way.
+"""
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # No flock (Windows): every process acts as its own loader
+    fcntl = None
+
+
+class LoaderLock:
+    """
+    Non-blocking, process-wide lock electing the loader.
+
+    ``is_loader()`` tries to take the lock if this process does not hold it
+    yet and keeps it for the life of the process (or until ``release()``).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def is_loader(self) -> bool:
+        if fcntl is None:
+            return True
+        with self._lock:
+            if self._file is not None:
+                return True
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            f = open(self.path, "a")
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+            self._file = f
+            return True
+
+    def release(self):
+        with self._lock:
+            if self._file is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                self._file.close()
+                self._file = None
+
+
+# Slot locks claimed by this process, held until it exits
+_slots = []
+
+
+def claim_worker_slot(prefix: str, workers: int) -> int:
+    """
+    Lowest worker number below workers whose lock ``<prefix>-<n>`` no live
+    process holds, kept for the life of this process. A worker restarted
+    after a crash takes the number its predecessor had. Falls back to the
+    process id when every slot is taken or locks are unavailable.
+    """
+    if fcntl is not None:
+        for n in range(workers):
+            lock = LoaderLock(f"{prefix}-{n}")
+            if lock.is_loader():
+                _slots.append(lock)
+                return n
+    return os.getpid()
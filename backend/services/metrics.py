@@ -0,0 +1,311 @@
+"""
+In-process metrics for the query engine, graph service and crawler.
+
+Counters, gauges and histograms are cheap enough to update on every
+request (a dict lookup and a lock), and the registry renders them in the
+Prometheus text exposition format. Processes that do not serve HTTP, such
+as the crawler, write the same format to a .prom file that the API's
+/metrics endpoint appends (the Prometheus "textfile" convention). Server
+workers do the same, labelling their samples with their worker number, so
+any worker's /metrics covers all of them.
+"""
+
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; spans sub-millisecond cache hits to slow graph computations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (metric name, type, help, [(labels, value)]) produced by collector callbacks
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [count per bucket (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels) -> Callable:
+        """Decorator observing each call's duration"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+_active_timeline: ContextVar = ContextVar("active_timeline", default=None)
+
+
+def active_timeline() -> Optional["Timeline"]:
+    """The Timeline of the request being handled, if one was activated"""
+    return _active_timeline.get()
+
+
+class Timeline:
+    """
+    Durations of the stages of one request, in the order they ran.
+
+    Stages may repeat (e.g. one highlight per hit); durations() sums them.
+    Code that does not receive the timeline explicitly can add to it via
+    active_timeline() while activate() is in effect.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: List[Tuple[str, float, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, start - self.start, time.perf_counter() - start))
+
+    @contextmanager
+    def activate(self):
+        token = _active_timeline.set(self)
+        try:
+            yield self
+        finally:
+            _active_timeline.reset(token)
+
+    def add(self, name: str, seconds: float, offset: Optional[float] = None):
+        if offset is None:
+            offset = time.perf_counter() - self.start - seconds
+        self.stages.append((name, offset, seconds))
+
+    def durations(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for name, _, seconds in self.stages:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "stages": [
+                {"stage": name, "start_ms": round(offset * 1000, 3), "duration_ms": round(seconds * 1000, 3)}
+                for name, offset, seconds in sorted(self.stages, key=lambda stage: stage[1])
+            ]
+        }
+
+
+class MetricsRegistry:
+    """
+    Named metrics plus callbacks that report values owned elsewhere.
+
+    ``labels`` are added to every rendered sample, e.g. {"worker": "2"}.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+        self.labels: Dict[str, str] = {}
+
+    def _get_or_create(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Register a callback evaluated at render time, e.g. for cache counters"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(dict(self.labels, **labels))} {_format_value(value)}")
+
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception:
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(dict(self.labels, **labels))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically write the current values for another process to expose"""
+        path = str(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+def read_textfiles(directory, exclude: Iterable[str] = ()) -> str:
+    """Concatenate the .prom files other processes wrote to directory, except those named in exclude"""
+    directory = str(directory)
+    if not os.path.isdir(directory):
+        return ""
+    parts = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".prom") and name not in exclude:
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    parts.append(f.read())
+            except OSError:
+                continue
+    return "".join(parts)
+
+
+def merge_expositions(*texts: str) -> str:
+    """
+    Combine expositions that may declare the same metric families (one per
+    server worker, told apart by labels) so each family is declared once,
+    followed by every sample of it
+    """
+    headers: Dict[str, Dict[str, str]] = {}
+    samples: Dict[str, List[str]] = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith(("# HELP ", "# TYPE ")):
+                family = line.split(" ", 3)[2]
+                headers.setdefault(family, {}).setdefault(line[2:6], line)
+                samples.setdefault(family, [])
+            elif line and not line.startswith("#") and family is not None:
+                samples[family].append(line)
+    lines = []
+    for family, declared in headers.items():
+        lines.extend(declared.values())
+        lines.extend(samples[family])
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+metrics = MetricsRegistry()
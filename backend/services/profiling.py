@@ -0,0 +1,95 @@
+"""
+On-demand profiling of single requests.
+
+A request opted into profiling runs under cProfile with a Timeline
+activated, and gets back its hottest functions and stage timings. Only one
+request is profiled at a time and a token bucket caps how often, so an
+admin poking at a slow query cannot slow everyone else down.
+"""
+
+import time
+import cProfile
+import pstats
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from .metrics import Timeline
+
+
+class RequestProfiler:
+    """
+    Args:
+        max_per_minute: Profiled requests allowed per minute (burst included)
+        top: Functions listed in a report
+    """
+
+    def __init__(self, max_per_minute: int = 6, top: int = 15):
+        self.rate = max_per_minute / 60.0
+        self.capacity = float(max(max_per_minute, 1))
+        self.top = top
+        self._tokens = self.capacity if max_per_minute > 0 else 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+
+    def acquire(self) -> bool:
+        """
+        Reserve the profiler for one request. Fails when the rate limit is
+        exhausted or another request is being profiled; on success the
+        caller must enter profile() next, which releases it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1 or not self._running.acquire(blocking=False):
+                return False
+            self._tokens -= 1
+            return True
+
+    @contextmanager
+    def profile(self, timeline: Optional[Timeline] = None):
+        """
+        Profile the enclosed block. Yields a dict that holds the report
+        ("total_ms", "timeline", "hot_functions") once the block exits.
+        """
+        timeline = timeline or Timeline()
+        report: Dict[str, Any] = {}
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            with timeline.activate():
+                profiler.enable()
+                try:
+                    yield report
+                finally:
+                    profiler.disable()
+            report.update({
+                "total_ms": round((time.perf_counter() - start) * 1000, 3),
+                "timeline": timeline.as_dict()["stages"],
+                "hot_functions": self.hot_functions(profiler)
+            })
+        finally:
+            self._running.release()
+
+    def hot_functions(self, profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+        """Functions with the most self time, with their cumulative time"""
+        stats = pstats.Stats(profiler).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return [
+            {
+                "function": _describe(filename, line, name),
+                "calls": calls,
+                "self_ms": round(self_time * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3)
+            }
+            for (filename, line, name), (_, calls, self_time, cumulative, _) in ranked
+        ]
+
+
+def _describe(filename: str, line: int, name: str) -> str:
+    if filename == "~":  # Built-ins have no source location
+        return name
+    parts = filename.replace("\\", "/").split("/")
+    return f"{'/'.join(parts[-2:])}:{line}({name})"
@@ -0,0 +1,139 @@
+"""
+Asynchronous query logging.
+
+Request handlers hand each finished query to QueryLog.record(), which only
+does a sampling decision and a non-blocking queue put; JSON lines are
+written by a background listener thread through size-rotated files. Slow
+queries go to a separate log regardless of sampling. The format is what
+benchmarks/replay_query_log.py reads back.
+
+Several server workers never share a file: each writes worker_path(path,
+n), and read_entries() merges them back by timestamp.
+"""
+
+import json
+import heapq
+import queue
+import random
+import logging
+from datetime import datetime
+from logging.handlers import QueueListener, RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from .metrics import metrics
+
+LOG_ENTRIES = metrics.counter(
+    "nayuta_query_log_entries_total", "Query log entries by log and outcome", ("log", "outcome")
+)
+
+
+class QueryLog:
+    """
+    Sampled query log plus a slow-query log.
+
+    Args:
+        path: File for sampled queries
+        slow_path: File for queries slower than slow_ms (None disables it)
+        sample_rate: Fraction of queries written to path (0 disables it)
+        slow_ms: Latency threshold for the slow log
+        max_bytes: Size at which a log is rotated
+        backup_count: Rotated files kept per log
+        queue_size: Entries buffered per log before new ones are dropped
+    """
+
+    def __init__(self, path, slow_path=None, sample_rate: float = 1.0, slow_ms: float = 250.0,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3, queue_size: int = 10000):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._logs = {}
+        if path is not None and sample_rate > 0:
+            self._logs["query"] = self._open(path, max_bytes, backup_count, queue_size)
+        if slow_path is not None:
+            self._logs["slow"] = self._open(slow_path, max_bytes, backup_count, queue_size)
+
+    @staticmethod
+    def _open(path, max_bytes, backup_count, queue_size):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        records: "queue.Queue" = queue.Queue(queue_size)
+        listener = QueueListener(records, handler)
+        listener.start()
+        return records, listener
+
+    def record(self, entry: Dict[str, Any]):
+        """Queue one query entry; never blocks the caller"""
+        targets = []
+        if "query" in self._logs and (self.sample_rate >= 1 or random.random() < self.sample_rate):
+            targets.append("query")
+        if "slow" in self._logs and entry.get("latency_ms", 0.0) >= self.slow_ms:
+            targets.append("slow")
+        if not targets:
+            return
+
+        entry = dict(entry, ts=datetime.now().isoformat(timespec="milliseconds"))
+        record = logging.makeLogRecord({"msg": json.dumps(entry, default=str, separators=(",", ":"))})
+        for name in targets:
+            records, _ = self._logs[name]
+            try:
+                records.put_nowait(record)
+                LOG_ENTRIES.inc(log=name, outcome="queued")
+            except queue.Full:
+                LOG_ENTRIES.inc(log=name, outcome="dropped")
+
+    def close(self):
+        """Flush queued entries and close the files"""
+        for _, listener in self._logs.values():
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        self._logs = {}
+
+
+def worker_path(path, worker: Optional[int]) -> Path:
+    """The log worker number worker writes instead of path (logs/query-2.log), or path itself for None"""
+    path = Path(path)
+    return path if worker is None else path.with_name(f"{path.stem}-{worker}{path.suffix}")
+
+
+def read_entries(path, include_rotated: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Yield logged entries oldest first, from rotated files (path.N ... path.1)
+    before path itself. Workers' logs (see worker_path) are included,
+    merged by timestamp. Malformed lines are skipped.
+    """
+    path = Path(path)
+    logs = [path]
+    for worker_log in path.parent.glob(f"{path.stem}-*{path.suffix}"):
+        if worker_log.name[len(path.stem) + 1:len(worker_log.name) - len(path.suffix)].isdigit():
+            logs.append(worker_log)
+    if len(logs) == 1:
+        return _read_log(path, include_rotated)
+    return heapq.merge(*(_read_log(log, include_rotated) for log in logs), key=lambda entry: entry.get("ts", ""))
+
+
+def _read_log(path: Path, include_rotated: bool) -> Iterator[Dict[str, Any]]:
+    files = []
+    if include_rotated:
+        rotated = [p for p in path.parent.glob(path.name + ".*") if p.suffix[1:].isdigit()]
+        files.extend(sorted(rotated, key=lambda p: int(p.suffix[1:]), reverse=True))
+    if path.exists():
+        files.append(path)
+
+    for file_path in files:
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get("q"):
+                    yield entry
+
+
+def stage_timings_ms(timeline) -> Optional[Dict[str, float]]:
+    """Summed stage durations of a Timeline in milliseconds"""
+    if timeline is None:
+        return None
+    return {stage: round(seconds * 1000, 3) for stage, seconds in timeline.durations().items()}
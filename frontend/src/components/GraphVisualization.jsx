@@ -36,7 +36,7 @@ export default function GraphVisualization({ onClose }) {
 
   const fetchGraphData = async () => {
     try {
-      const response = await fetch('http://localhost:8000/graph');
+      const response = await fetch('http://localhost:8000/graph?view=top&limit=300');
       const data = await response.json();
       setGraphData(data);
       setIsLoading(false);